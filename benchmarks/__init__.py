@@ -0,0 +1,5 @@
+"""Benchmarks.
+
+Run any of them as a module from the project root, for example:
+python -m benchmarks.bench_app_manager
+"""
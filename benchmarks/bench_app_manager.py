@@ -0,0 +1,62 @@
+"""Benchmark for project layout discovery of AppManager."""
+
+import timeit
+from pathlib import Path
+
+from pyservice.files import files
+from pyservice.manager.manager import AppManager, ProjectLayout
+from pyservice.pyconfig.pyconfig import AppConfig
+
+
+def discover_by_scanning(origin_file: Path) -> tuple[Path, Path, Path]:
+    """Former discovery: full listing of every parent directory."""
+    root_module = None
+    current_dir = origin_file.parent
+    previous_dir = None
+    while True:
+        if current_dir.name == 'src':
+            root_module = previous_dir
+        dirs = files.get_list_of_directories_in_directory(
+            current_dir, mask='*')
+        for directory in dirs:
+            if directory.name in ['src', 'tests', 'test']:
+                app_dir = directory.parent
+                return app_dir.parent, app_dir, root_module
+        previous_dir = current_dir
+        current_dir = current_dir.parent
+
+
+def report(title: str, seconds: float, number: int):
+    per_call = seconds / number * 1e6
+    print(f'{title:<45} {per_call:>12.2f} us/call')
+
+
+def main():
+    origin_file = Path(__file__).resolve()
+    config = AppConfig(delete_logs_on_start=False)
+    number = 1000
+
+    seconds = timeit.timeit(
+        lambda: discover_by_scanning(origin_file), number=number)
+    report('discovery by scanning directories', seconds, number)
+
+    seconds = timeit.timeit(
+        lambda: ProjectLayout.discover(origin_file), number=number)
+    report('discovery by probing markers', seconds, number)
+
+    manager = AppManager(config, origin_file)
+    seconds = timeit.timeit(lambda: manager.app_ref, number=number)
+    report('app_ref of constructed manager', seconds, number)
+
+    seconds = timeit.timeit(
+        lambda: manager.directory_for_logs, number=number)
+    report('directory_for_logs of constructed manager', seconds, number)
+
+    construction_number = 50
+    seconds = timeit.timeit(
+        lambda: AppManager(config, origin_file), number=construction_number)
+    report('manager construction', seconds, construction_number)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,49 @@
+"""Benchmark for formats of log files of log_tools.get_logger.
+
+Throughput of writing records is measured for the text formatter and
+for JSON lines (encoded by orjson if it is installed and by json).
+"""
+
+import tempfile
+import time
+from pathlib import Path
+from unittest import mock
+
+from pyservice.log_tools import json_format
+from pyservice.log_tools import log_tools
+
+
+STATIC_FIELDS = {'app': 'bench-app', 'microservice': 'bench-app:01'}
+
+
+def measure(directory: Path, log_format: str, number: int) -> float:
+    log = log_tools.get_logger(
+        log_name=f'bench-{log_format}-{time.monotonic_ns()}',
+        directory_for_logs=directory,
+        log_format=log_format,
+        static_fields=STATIC_FIELDS,
+    )
+    started_at = time.perf_counter()
+    for i in range(number):
+        log.info('processing request #%s with payload %s', i, {'id': i})
+    log_tools.flush_logger(log)
+    return number / (time.perf_counter() - started_at)
+
+
+def report(title: str, records_per_second: float):
+    print(f'{title:<30} {records_per_second:>12,.0f} records/sec.')
+
+
+def main():
+    number = 100000
+    with tempfile.TemporaryDirectory() as directory:
+        directory = Path(directory)
+        report('text', measure(directory, 'text', number))
+        if json_format.orjson is not None:
+            report('json (orjson)', measure(directory, 'json', number))
+        with mock.patch.object(json_format, 'orjson', None):
+            report('json (json module)', measure(directory, 'json', number))
+
+
+if __name__ == '__main__':
+    main()
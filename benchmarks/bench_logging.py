@@ -0,0 +1,52 @@
+"""Benchmark for writing log files by loggers of log_tools.get_logger.
+
+Latency of a DEBUG record in caller thread is measured for loggers with
+own FileHandlers and for loggers in queued mode.
+"""
+
+import tempfile
+import time
+from pathlib import Path
+
+from pyservice.log_tools import log_tools
+from pyservice.log_tools import queued
+
+
+def measure(directory: Path, queued_files: bool, number: int) -> list[float]:
+    name = 'queued' if queued_files else 'direct'
+    log = log_tools.get_logger(
+        log_name=f'bench-{name}',
+        directory_for_logs=directory,
+        queued_files=queued_files,
+    )
+    latencies = []
+    for i in range(number):
+        started_at = time.perf_counter()
+        log.debug('processing request #%s with payload %s', i, {'id': i})
+        latencies.append(time.perf_counter() - started_at)
+    return latencies
+
+
+def report(title: str, latencies: list[float]):
+    ordered = sorted(latencies)
+    mean = sum(ordered) / len(ordered) * 1e6
+    p99 = ordered[int(len(ordered) * 0.99)] * 1e6
+    print(f'{title:<30} mean {mean:>8.2f} us   p99 {p99:>8.2f} us')
+
+
+def main():
+    number = 50000
+    with tempfile.TemporaryDirectory() as directory:
+        directory = Path(directory)
+        report('own FileHandlers', measure(directory, False, number))
+
+        started_at = time.perf_counter()
+        latencies = measure(directory, True, number)
+        queued.get_listener().flush(timeout=60)
+        total = time.perf_counter() - started_at
+        report('queued (caller thread)', latencies)
+        print(f'queued: all {number} records written in {total:.3f} sec.')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,76 @@
+"""Benchmark for codecs of files.compress_file_or_directory_by_tar.
+
+Wall time and compression ratio are measured per codec on a synthetic
+dataset (text-like, JSON-like and random files) by a single thread and
+by all CPUs.
+"""
+
+import json
+import os
+import random
+import tempfile
+import time
+from pathlib import Path
+
+from pyservice.files import archiving
+from pyservice.files import files
+
+
+def create_dataset(directory: Path, megabytes: int) -> int:
+    rnd = random.Random(42)
+    words = [''.join(rnd.choices('abcdefghijklmnop', k=rnd.randint(2, 9)))
+             for _ in range(2000)]
+    target, written, number = megabytes * 1024 * 1024, 0, 0
+    while written < target:
+        kind = number % 3
+        if kind == 0:
+            data = ' '.join(rnd.choices(words, k=100000)).encode()
+        elif kind == 1:
+            rows = [{'id': i, 'name': rnd.choice(words),
+                     'value': rnd.random()} for i in range(20000)]
+            data = json.dumps(rows).encode()
+        else:
+            data = os.urandom(256 * 1024)
+        (directory / f'file-{number}.dat').write_bytes(data)
+        written += len(data)
+        number += 1
+    return written
+
+
+def measure(source: Path, output: Path,
+            compression: archiving.TarCompression) -> tuple[float, int]:
+    started_at = time.perf_counter()
+    archive = files.compress_file_or_directory_by_tar(
+        source, output, compression)
+    elapsed = time.perf_counter() - started_at
+    size = archive.stat().st_size
+    archive.unlink()
+    return elapsed, size
+
+
+def main():
+    megabytes = 64
+    threads = os.cpu_count() or 1
+    with tempfile.TemporaryDirectory() as directory:
+        source = Path(directory) / 'data'
+        source.mkdir()
+        output = Path(directory) / 'archives'
+        output.mkdir()
+        total = create_dataset(source, megabytes)
+        print(f'dataset: {total / 1024 / 1024:.0f} MB, CPUs: {threads}')
+        variants = [(archiving.GZIP, 6), (archiving.GZIP, 1),
+                    (archiving.XZ, 1), (archiving.NONE, 0)]
+        if archiving.ZSTD in archiving.available_codecs():
+            variants.insert(2, (archiving.ZSTD, 3))
+        for codec, level in variants:
+            for number_of_threads in sorted({1, threads}):
+                compression = archiving.TarCompression(
+                    codec=codec, level=level, threads=number_of_threads)
+                elapsed, size = measure(source, output, compression)
+                print(f'{codec:<5} level {level} threads '
+                      f'{number_of_threads:<3} {elapsed:>7.2f} s, '
+                      f'ratio {total / size:.2f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -4,13 +4,18 @@
 from __future__ import annotations
 
 import typing as t
+from contextlib import contextmanager
 from pathlib import Path
 from uuid import uuid4
-import shutil
+import mmap
+import os
+import socket
 import re
 
 from pyservice.mixins.mixins import SequenceMixin
 from pyservice.files import files as files_tools
+from pyservice.files import hashing
+from pyservice.files import mover
 
 from . import base
 
@@ -27,7 +32,8 @@ class LocalFile(base.BaseEntity):
 
     @property
     def md5(self) -> str:
-        return files_tools.md5(self.fullpath)
+        """MD5 of file (cached until file is changed)."""
+        return hashing.default_cache.hash_file(self.fullpath, hashing.MD5)
 
     @property
     def last_extension(self) -> str:
@@ -42,11 +48,64 @@ class LocalFile(base.BaseEntity):
     def name_and_extension(self) -> tuple[str, str]:
         return self.filename_without_last_extension, self.last_extension
 
+    @property
+    def size_in_bytes(self) -> int:
+        return self.fullpath.stat().st_size
+
     def binary_content(self):
+        """Whole content in memory (see mapped_content for big files)."""
         with open(self.fullpath, 'rb') as f:
             file_content = f.read()
             return file_content
 
+    @contextmanager
+    def mapped_content(self) -> t.Iterator[memoryview]:
+        """Read-only memoryview of content mapped to memory.
+
+        Pages are loaded on access and are shared with page cache, so
+        the file is not duplicated in RAM. The view must not be used
+        after exit from context.
+        """
+        with open(self.fullpath, 'rb') as f:
+            if not os.fstat(f.fileno()).st_size:
+                yield memoryview(b'')
+                return
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                view = memoryview(mm)
+                try:
+                    yield view
+                finally:
+                    view.release()
+
+    def iter_chunks(
+            self,
+            chunk_size: int = 1024 * 1024,
+    ) -> t.Iterator[bytes]:
+        """Content by chunks (for streaming responses and payloads)."""
+        with open(self.fullpath, 'rb', buffering=0) as f:
+            while chunk := f.read(chunk_size):
+                yield chunk
+
+    @contextmanager
+    def opened_for_sending(self) -> t.Iterator[t.BinaryIO]:
+        """Unbuffered file, its descriptor suits os.sendfile.
+
+        Frameworks (like FileResponse of Django) and socket.sendfile
+        send such file by the kernel without copying it to userspace.
+        """
+        with open(self.fullpath, 'rb', buffering=0) as f:
+            yield f
+
+    def send_to_socket(
+            self,
+            sock: socket.socket,
+            offset: int = 0,
+            count: int | None = None,
+    ) -> int:
+        """Send content to socket by sendfile, return number of bytes."""
+        with self.opened_for_sending() as f:
+            return sock.sendfile(f, offset, count)
+
     def rename(
             self,
             new_name: str,
@@ -67,12 +126,7 @@ class LocalFile(base.BaseEntity):
         if not new_filename:
             new_filename = self.fullpath.name
         new_fullpath = directory / new_filename
-        if new_fullpath.is_file():
-            if exist_ok:
-                new_fullpath.unlink(missing_ok=True)
-            else:
-                raise FileExistsError(f'File <{new_fullpath}> already exists')
-        shutil.move(str(self.fullpath), str(new_fullpath))
+        mover.move_files([(self.fullpath, new_fullpath)], exist_ok=exist_ok)
         self.fullpath = new_fullpath
 
     @property
@@ -125,12 +179,30 @@ class LocalFiles(base.BaseEntity, SequenceMixin):
             self,
             new_directory: Path,
             exist_ok: bool = False,
+            max_workers: int = 4,
     ):
-        for _ in self.items:
-            _.move_to_directory(
-                directory=new_directory,
-                exist_ok=exist_ok,
-            )
+        """Move files at once (none of them is moved on failure).
+
+        See files.mover: files of the same device are renamed, others
+        are copied in parallel.
+        """
+        items = list(self.items)
+        targets = mover.move_files(
+            [(_.fullpath, new_directory / _.fullpath.name) for _ in items],
+            exist_ok=exist_ok,
+            max_workers=max_workers,
+        )
+        for item, target in zip(items, targets):
+            item.fullpath = target
+
+    def hashes(
+            self,
+            algorithm: str = hashing.MD5,
+            max_workers: int = 8,
+    ) -> dict[Path, str]:
+        """Digests of all files (hashed in parallel, cached by stat)."""
+        return hashing.hash_files(
+            [_.fullpath for _ in self.items], algorithm, max_workers)
 
     @property
     def filenames(self) -> list[str]:
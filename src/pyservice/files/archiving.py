@@ -0,0 +1,455 @@
+"""Codecs of tar archives, parallel compression and extraction.
+
+Tar stream is cut into blocks which are compressed by a pool of threads
+(zlib and lzma release GIL while compressing) and written in order as
+independent gzip members (xz streams). Concatenated members are a valid
+gzip (xz) file, so archives are read by tarfile, gzip, tar and pigz as
+usual. zstd (if zstandard is installed) compresses by its own threads.
+
+Extraction reads archive once, in order of members, and hands payloads
+of files to a pool of writer threads (restoring many small files is
+bound by syscalls of writing, not by reading of archive).
+"""
+
+from __future__ import annotations
+
+import dataclasses
+import fnmatch
+import gzip
+import lzma
+import os
+import shutil
+import tarfile
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from collections import deque
+from contextlib import contextmanager
+from pathlib import Path
+from typing import BinaryIO, Callable, Iterable, Iterator
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover
+    zstandard = None
+
+
+GZIP = 'gzip'
+XZ = 'xz'
+ZSTD = 'zstd'
+NONE = 'none'
+
+EXTENSIONS = {
+    GZIP: 'tar.gz',
+    XZ: 'tar.xz',
+    ZSTD: 'tar.zst',
+    NONE: 'tar',
+}
+# blocks of tar stream compressed independently (bigger - better ratio)
+BLOCK_SIZES = {
+    GZIP: 1024 * 1024,
+    XZ: 8 * 1024 * 1024,
+}
+ZSTD_MAGIC = b'\x28\xb5\x2f\xfd'
+
+
+def available_codecs() -> list[str]:
+    codecs = [GZIP, XZ, NONE]
+    if zstandard is not None:
+        codecs.insert(2, ZSTD)
+    return codecs
+
+
+@dataclasses.dataclass(frozen=True, slots=True)
+class TarCompression:
+    """Codec of tar archive (threads: 0 - number of CPUs)."""
+
+    codec: str = GZIP
+    level: int = 6
+    threads: int = 0
+    buffer_size: int = 1024 * 1024
+
+    def __post_init__(self):
+        if self.codec not in EXTENSIONS:
+            raise ValueError(f'Unknown codec of tar archive: {self.codec}')
+        if self.codec == ZSTD and zstandard is None:
+            raise ValueError('zstd codec requires zstandard package')
+
+    @property
+    def extension(self) -> str:
+        return EXTENSIONS[self.codec]
+
+    @property
+    def number_of_threads(self) -> int:
+        return self.threads or os.cpu_count() or 1
+
+
+class ParallelBlockWriter:
+    """File-like object compressing blocks of written data by threads."""
+
+    def __init__(
+            self,
+            raw: BinaryIO,
+            compress_block: Callable[[bytes], bytes],
+            threads: int,
+            block_size: int,
+    ):
+        self._raw = raw
+        self._compress_block = compress_block
+        self._block_size = block_size
+        self._buffer = bytearray()
+        self._executor = ThreadPoolExecutor(
+            max_workers=threads, thread_name_prefix='compression')
+        # blocks in flight are limited to keep memory bounded
+        self._max_pending = threads * 2
+        self._pending: deque[Future] = deque()
+
+    def write(self, data: bytes) -> int:
+        self._buffer += data
+        while len(self._buffer) >= self._block_size:
+            block = bytes(self._buffer[:self._block_size])
+            del self._buffer[:self._block_size]
+            self._submit(block)
+        return len(data)
+
+    def _submit(self, block: bytes):
+        self._pending.append(
+            self._executor.submit(self._compress_block, block))
+        while len(self._pending) > self._max_pending:
+            self._raw.write(self._pending.popleft().result())
+
+    def close(self):
+        try:
+            if self._buffer:
+                self._submit(bytes(self._buffer))
+                self._buffer.clear()
+            while self._pending:
+                self._raw.write(self._pending.popleft().result())
+        finally:
+            self._executor.shutdown(wait=True)
+
+
+def _gzip_member(level: int) -> Callable[[bytes], bytes]:
+    def compress(block: bytes) -> bytes:
+        return gzip.compress(block, compresslevel=level, mtime=0)
+    return compress
+
+
+def _xz_stream(level: int) -> Callable[[bytes], bytes]:
+    def compress(block: bytes) -> bytes:
+        return lzma.compress(block, format=lzma.FORMAT_XZ, preset=level)
+    return compress
+
+
+@contextmanager
+def compressed_writer(raw: BinaryIO,
+                      compression: TarCompression) -> Iterator[BinaryIO]:
+    """File-like object compressing data written to it into raw file."""
+    codec, level = compression.codec, compression.level
+    threads = compression.number_of_threads
+    if codec == NONE:
+        yield raw
+    elif codec == ZSTD:
+        compressor = zstandard.ZstdCompressor(
+            level=level, threads=threads if threads > 1 else 0)
+        with compressor.stream_writer(raw, closefd=False) as writer:
+            yield writer
+    elif threads > 1:
+        compress = _gzip_member(level) if codec == GZIP else _xz_stream(level)
+        writer = ParallelBlockWriter(
+            raw, compress, threads, BLOCK_SIZES[codec])
+        try:
+            yield writer
+        finally:
+            writer.close()
+    elif codec == GZIP:
+        with gzip.GzipFile(fileobj=raw, mode='wb',
+                           compresslevel=level, mtime=0) as writer:
+            yield writer
+    else:
+        with lzma.LZMAFile(raw, 'wb', preset=level) as writer:
+            yield writer
+
+
+def write_tar_archive(
+        output: Path,
+        sources: dict[str, Path],
+        compression: TarCompression,
+):
+    """Write tar archive of sources (name in archive: path)."""
+    with open(output, 'wb', buffering=compression.buffer_size) as raw, \
+            compressed_writer(raw, compression) as writer, \
+            tarfile.open(name=output, fileobj=writer, mode='w|',
+                         bufsize=compression.buffer_size) as tar:
+        # name lets tarfile skip the archive itself if it is among sources
+        for arcname, path in sources.items():
+            tar.add(path, arcname=arcname)
+
+
+@contextmanager
+def open_tar_archive(
+        path: Path,
+        buffer_size: int = 1024 * 1024,
+) -> Iterator[tarfile.TarFile]:
+    """Tar archive of any supported codec opened for reading.
+
+    zstd archives are opened as a stream (members are read in order).
+    """
+    with open(path, 'rb') as raw:
+        is_zstd = raw.read(len(ZSTD_MAGIC)) == ZSTD_MAGIC
+    if not is_zstd:
+        with tarfile.open(path, bufsize=buffer_size) as tar:
+            yield tar
+        return
+    if zstandard is None:
+        raise ValueError(f'zstd archive requires zstandard package: {path}')
+    with open(path, 'rb') as raw, \
+            zstandard.ZstdDecompressor().stream_reader(raw) as reader, \
+            tarfile.open(fileobj=reader, mode='r|',
+                         bufsize=buffer_size) as tar:
+        yield tar
+
+
+@dataclasses.dataclass(slots=True)
+class ExtractionStats:
+    """Progress of extraction."""
+
+    members: int = 0
+    files: int = 0
+    total_bytes: int = 0
+    skipped: int = 0
+    started_at: float = dataclasses.field(default_factory=time.monotonic)
+    finished_at: float | None = None
+
+    @property
+    def elapsed(self) -> float:
+        return (self.finished_at or time.monotonic()) - self.started_at
+
+    @property
+    def bytes_per_second(self) -> float:
+        return self.total_bytes / self.elapsed if self.elapsed else 0.0
+
+    @property
+    def files_per_second(self) -> float:
+        return self.files / self.elapsed if self.elapsed else 0.0
+
+
+def _strip_root(name: str) -> str | None:
+    """Name without the first part (None for the root itself)."""
+    _, separator, rest = name.strip('/').partition('/')
+    return rest if separator and rest else None
+
+
+def _sanitized(member: tarfile.TarInfo, name: str) -> tarfile.TarInfo:
+    """Regular file or directory filtered like tarfile.data_filter does.
+
+    Names are checked lexically (without resolving of paths), so it is
+    valid only while there are no symlinks in destination.
+    """
+    name = name.lstrip('/')
+    normalized = os.path.normpath(name)
+    if os.path.isabs(normalized) or normalized == '..' \
+            or normalized.startswith('../'):
+        raise tarfile.OutsideDestinationError(member, normalized)
+    mode = member.mode
+    if mode is not None:
+        mode &= 0o755
+        if member.isdir():
+            mode = None
+        else:
+            if not mode & 0o100:
+                mode &= ~0o111
+            mode |= 0o600
+    return member.replace(name=name, mode=mode, uid=None, gid=None,
+                          uname=None, gname=None, deep=False)
+
+
+def _write_file(target: str, payload: bytes, member: tarfile.TarInfo):
+    with open(target, 'wb') as f:
+        f.write(payload)
+    _set_attributes(target, member)
+
+
+def _set_attributes(target: str, member: tarfile.TarInfo):
+    if member.mode is not None:
+        os.chmod(target, member.mode)
+    if member.mtime is not None:
+        os.utime(target, (member.mtime, member.mtime))
+
+
+class _WriterPool:
+    """Writes of files by threads with bounded payloads in flight."""
+
+    def __init__(self, max_workers: int, max_pending_bytes: int):
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix='extraction')
+        self._max_pending_bytes = max_pending_bytes
+        self._pending: deque[tuple[Future, int]] = deque()
+        self._pending_bytes = 0
+
+    def submit(self, target: str, payload: bytes, member: tarfile.TarInfo):
+        future = self._executor.submit(_write_file, target, payload, member)
+        self._pending.append((future, len(payload)))
+        self._pending_bytes += len(payload)
+        while self._pending_bytes > self._max_pending_bytes:
+            self._wait_oldest()
+
+    def _wait_oldest(self):
+        future, size = self._pending.popleft()
+        self._pending_bytes -= size
+        future.result()
+
+    def drain(self):
+        while self._pending:
+            self._wait_oldest()
+
+    def shutdown(self):
+        self._executor.shutdown(wait=True, cancel_futures=True)
+
+
+def _extract_hard_link(
+        tar: tarfile.TarFile,
+        member: tarfile.TarInfo,
+        *,
+        original_linkname: str,
+        destination: str,
+        extracted: set[str],
+        stats: ExtractionStats,
+):
+    """Link to extracted target, or data of skipped one (if readable)."""
+    if member.linkname in extracted:
+        tar.extract(member, destination, filter='fully_trusted')
+        extracted.add(member.name)
+        return
+    # target is skipped by patterns: its data is written under the name
+    # of link, unless archive is a stream (data is read already)
+    try:
+        linked = tar.getmember(original_linkname)
+        source = tar.extractfile(linked)
+    except (KeyError, tarfile.StreamError):
+        stats.skipped += 1
+        return
+    target = os.path.join(destination, member.name)
+    with source, open(target, 'wb') as f:
+        shutil.copyfileobj(source, f)
+    _set_attributes(target, member)
+    extracted.add(member.name)
+    stats.files += 1
+    stats.total_bytes += linked.size
+
+
+def extract_tar_archive(
+        path: Path,
+        output_dir: Path,
+        *,
+        strip_root: bool = False,
+        patterns: Iterable[str] | None = None,
+        max_workers: int = 4,
+        progress: Callable[[ExtractionStats], None] | None = None,
+        progress_interval: float = 1.0,
+        buffer_size: int = 1024 * 1024,
+        max_pending_bytes: int = 64 * 1024 * 1024,
+) -> ExtractionStats:
+    """Extract archive (of any supported codec) by a pool of writers.
+
+    With `strip_root` the first part of names is dropped (archive of a
+    directory is extracted into `output_dir` itself). `patterns` are
+    globs of names (after stripping) of members to restore. Members are
+    sanitized by tarfile.data_filter. Files bigger than
+    `max_pending_bytes` are written by the reading thread by chunks.
+    """
+    output_dir = Path(output_dir).absolute()
+    output_dir.mkdir(parents=True, exist_ok=True)
+    destination = os.path.realpath(output_dir)
+    # resolving of every path by data_filter costs a stat per part of
+    # path, it is needed only if symlinks could redirect writes
+    with os.scandir(destination) as entries:
+        without_symlinks = next(entries, None) is None
+    patterns = list(patterns or [])
+    stats = ExtractionStats()
+    created_directories = {destination}
+    directories: list[tuple[str, tarfile.TarInfo]] = []
+    # links with names of their targets in archive
+    hard_links: list[tuple[tarfile.TarInfo, str]] = []
+    # names of extracted members (targets of links may be skipped)
+    extracted: set[str] = set()
+    reported_at = time.monotonic()
+
+    def make_directory(directory: str):
+        if directory not in created_directories:
+            os.makedirs(directory, exist_ok=True)
+            created_directories.add(directory)
+
+    pool = _WriterPool(max(1, max_workers), max_pending_bytes)
+    try:
+        with open_tar_archive(path, buffer_size) as tar:
+            for member in tar:
+                stats.members += 1
+                name = member.name
+                if strip_root:
+                    name = _strip_root(name)
+                    if name is None:
+                        continue
+                if patterns and not any(
+                        fnmatch.fnmatch(name, _) for _ in patterns):
+                    stats.skipped += 1
+                    continue
+                original_linkname = member.linkname
+                if without_symlinks and (member.isreg() or member.isdir()):
+                    member = _sanitized(member, name)
+                else:
+                    without_symlinks = False
+                    if strip_root and member.islnk():
+                        linkname = _strip_root(member.linkname)
+                        if linkname is None:
+                            stats.skipped += 1
+                            continue
+                        member = member.replace(linkname=linkname,
+                                                deep=False)
+                    if name != member.name:
+                        member = member.replace(name=name, deep=False)
+                    member = tarfile.data_filter(member, destination)
+                target = os.path.join(destination, member.name)
+                if member.isdir():
+                    make_directory(target)
+                    directories.append((target, member))
+                    continue
+                make_directory(os.path.dirname(target))
+                if member.isreg():
+                    source = tar.extractfile(member)
+                    if member.size > max_pending_bytes:
+                        with open(target, 'wb') as f:
+                            shutil.copyfileobj(source, f, buffer_size)
+                        _set_attributes(target, member)
+                    else:
+                        pool.submit(target, source.read(), member)
+                    stats.files += 1
+                    stats.total_bytes += member.size
+                elif member.islnk():
+                    # target of link may be still being written
+                    hard_links.append((member, original_linkname))
+                    continue
+                else:
+                    tar.extract(member, destination, filter='fully_trusted')
+                extracted.add(member.name)
+                now = time.monotonic()
+                if progress and now - reported_at >= progress_interval:
+                    progress(stats)
+                    reported_at = now
+            pool.drain()
+            for member, original_linkname in hard_links:
+                _extract_hard_link(
+                    tar, member,
+                    original_linkname=original_linkname,
+                    destination=destination,
+                    extracted=extracted,
+                    stats=stats,
+                )
+    finally:
+        pool.shutdown()
+    # like extractall, attributes of directories are set the last
+    for target, member in reversed(directories):
+        _set_attributes(target, member)
+    stats.finished_at = time.monotonic()
+    if progress is not None:
+        progress(stats)
+    return stats
@@ -2,19 +2,20 @@
 Common functions for deals with directories and files.
 """
 
+import fnmatch
 import shutil
 import json
 import pathlib
 from pathlib import Path
-import hashlib
-from typing import Any
+from typing import Any, Callable
 import os
 from datetime import datetime as dt
 
 import aiofiles
-import tarfile
 
 from pyservice.domain.base import BaseModel
+from pyservice.files import archiving, hashing, retention, scanner
+from pyservice.files.index import DirectoryIndex
 
 
 def format_bytes(size, should_round: bool = True):
@@ -54,7 +55,13 @@ def normalize_path(func_for_path):
 
 def compress_file_or_directory_by_tar(
         file_or_directory: Path | str,
-        output_dir_or_file: Path | str = None) -> Path:
+        output_dir_or_file: Path | str = None,
+        compression: archiving.TarCompression = None) -> Path:
+    """Archive file or directory (gzip by all CPUs by default).
+
+    See files.archiving for codecs (gzip, xz, zstd, none).
+    """
+    compression = compression or archiving.TarCompression()
     file_or_directory = Path(file_or_directory)
     if output_dir_or_file:
         output_dir_or_file = Path(output_dir_or_file)
@@ -62,21 +69,18 @@ def compress_file_or_directory_by_tar(
     origin_name = file_or_directory.name
 
     if not output_dir_or_file:
-        output_filename = f'{origin_name}.tar.gz'
+        output_filename = f'{origin_name}.{compression.extension}'
         output = origin_parent / output_filename
     elif output_dir_or_file.is_file():
         raise FileExistsError(f'File is already exists - {output_dir_or_file}')
     elif output_dir_or_file.is_dir():
-        output_filename = f'{origin_name}.tar.gz'
+        output_filename = f'{origin_name}.{compression.extension}'
         output = output_dir_or_file / output_filename
     else:
         output = output_dir_or_file
 
-    with tarfile.open(output, 'w:gz') as tar:
-        tar.add(
-            file_or_directory,
-            arcname=file_or_directory.name
-        )
+    archiving.write_tar_archive(
+        output, {file_or_directory.name: file_or_directory}, compression)
 
     assert output.is_file()
     return output
@@ -85,19 +89,23 @@ def compress_file_or_directory_by_tar(
 def extract_data_from_tar_archive(
         tar_archive: Path,
         output_dir: Path = None,
-        ignore_single_root_dir: bool = True):
+        ignore_single_root_dir: bool = True,
+        *,
+        patterns: list[str] = None,
+        max_workers: int = 4,
+        progress: Callable[[archiving.ExtractionStats], None] = None,
+) -> archiving.ExtractionStats:
+    """Restore archive (see archiving.extract_tar_archive)."""
     if not output_dir:
         output_dir = tar_archive.parent
-
-    # print('TAR E')
-    # print(tar_archive)
-    # print(output_dir)
-    with tarfile.open(tar_archive) as t:
-        def strip(member, path: Path):  # pylint: disable=W0613:
-            return member.replace(name=Path(*Path(member.path).parts[1:]))
-        fn = strip if ignore_single_root_dir else None
-        t.extractall(path=output_dir, filter=fn)
-        t.close()
+    return archiving.extract_tar_archive(
+        tar_archive,
+        output_dir,
+        strip_root=ignore_single_root_dir,
+        patterns=patterns,
+        max_workers=max_workers,
+        progress=progress,
+    )
 
 
 def create_text_file_in_directory(
@@ -129,11 +137,16 @@ def erase_directory(directory: Path):
 
 
 @normalize_path
-def clear_all_files_in_directory(directory: Path):
+def clear_all_files_in_directory(
+        directory: Path,
+        excluded: tuple[Path, ...] = (),
+):
+    """Truncate files in directory (except files in excluded ones)."""
     assert not directory.is_file()
     assert directory.is_dir()
     all_entities = directory.glob('**/*')
-    files = [x for x in all_entities if x.is_file()]
+    files = [x for x in all_entities if x.is_file()
+             and not any(x.is_relative_to(_) for _ in excluded)]
     for _ in files:
         # pylint:disable=R1732,W1514
         open(_, 'w').close()
@@ -153,6 +166,9 @@ class SetOfFileSystemEntities(BaseModel):
     denied: set[Path] = set()
     unknown: set[Path] = set()
 
+    # size of files accumulated by scanner (None - unknown)
+    files_size: int | None = None
+
     entity_types: list[str] = [
         'files',
         'directories',
@@ -178,9 +194,34 @@ class SetOfFileSystemEntities(BaseModel):
     def clear(self):
         for _ in self.entity_types:
             setattr(self, _, set())
+        self.files_size = None
+
+    def add_scanned(self, entry: scanner.ScannedEntry):
+        getattr(self, entry.kind).add(Path(entry.path))
+        if entry.kind == scanner.FILES:
+            self.files_size = (self.files_size or 0) + entry.size
+
+    def merge(self, other: 'SetOfFileSystemEntities'):
+        """Add entities of other set (like a part of the same directory)."""
+        for _ in self.entity_types:
+            getattr(self, _).update(getattr(other, _))
+        if self.files_size is not None and other.files_size is not None:
+            self.files_size += other.files_size
+        else:
+            self.files_size = None
+
+    @classmethod
+    def from_scanned(cls, entries) -> 'SetOfFileSystemEntities':
+        entities = cls()
+        entities.files_size = 0
+        for entry in entries:
+            entities.add_scanned(entry)
+        return entities
 
     @property
     def total_size_in_bytes(self):
+        if self.files_size is not None:
+            return self.files_size
         file_sizes = [_.lstat().st_size for _ in self.files if _.is_file()]
         result = sum(file_sizes)
         return result
@@ -208,6 +249,8 @@ class DetailedDirectory(BaseModel):
     directory: Path
     entities: SetOfFileSystemEntities = None
     mask: str = '**/*'
+    # threads scanning top-level subdirectories concurrently
+    max_workers: int = 1
 
     # pylint:disable=C0103
     def model_post_init(self, __context: Any) -> None:
@@ -224,6 +267,14 @@ class DetailedDirectory(BaseModel):
     def parse(self):
         assert self.directory.is_dir()
         self.entities.clear()
+        if scanner.split_mask(self.mask) is not None:
+            self.entities.files_size = 0
+            partials = scanner.scan_in_parallel(
+                self.directory, self.mask,
+                SetOfFileSystemEntities.from_scanned, self.max_workers)
+            for partial in partials:
+                self.entities.merge(partial)
+            return
         unfiltered_entities = list(self.directory.glob(self.mask))
         for _ in unfiltered_entities:
             try:
@@ -236,7 +287,7 @@ class DetailedDirectory(BaseModel):
                 elif _.is_symlink():
                     self.entities.symlinks.add(_)
                 elif _.is_char_device():
-                    self.entities.symlinks.add(_)
+                    self.entities.char_devices.add(_)
                 elif _.is_fifo():
                     self.entities.fifos.add(_)
                 elif _.is_block_device():
@@ -264,24 +315,42 @@ def get_list_of_directories_in_directory(
 
 @normalize_path
 def get_list_of_files_in_directory(
-        directory: Path, mask: str = '**/*'
+        directory: Path, mask: str = '**/*',
+        index: DirectoryIndex = None,
 ) -> list[Path] | set[Path]:
+    """Files matching mask (from refreshed index if it is given).
+
+    With index, mask is a glob of file names, recursive if it starts
+    with '**/' (like '**/*.py').
+    """
+    if index is not None:
+        recursive = mask.startswith('**/')
+        pattern = mask[3:] if recursive else mask
+        if '/' in pattern:
+            raise ValueError(f'Mask is not supported with index: {mask}')
+        index.refresh()
+        return [_.path for _ in index.files(directory, recursive)
+                if fnmatch.fnmatch(_.path.name, pattern)]
     detailed_dir = DetailedDirectory(directory=directory, mask=mask)
     return detailed_dir.entities.files
 
 
 @normalize_path
 def get_number_of_files_and_directories_in_directory(
-        directory: Path) -> tuple[int, int]:
-    detailed_dir = DetailedDirectory(directory=directory)
-    files = detailed_dir.entities.files
-    directories = detailed_dir.entities.directories
-    return len(files), len(directories)
+        directory: Path, max_workers: int = 1) -> tuple[int, int]:
+    totals = scanner.scan_totals(directory, max_workers=max_workers)
+    return (totals.counts.get(scanner.FILES, 0),
+            totals.counts.get(scanner.DIRECTORIES, 0))
 
 
 @normalize_path
-def get_number_of_files_in_directory(directory: Path) -> int:
-    return len(get_list_of_files_in_directory(directory))
+def get_number_of_files_in_directory(
+        directory: Path, index: DirectoryIndex = None) -> int:
+    """Number of files (from refreshed index if it is given)."""
+    if index is not None:
+        index.refresh()
+        return index.count_files(directory)
+    return scanner.scan_totals(directory).counts.get(scanner.FILES, 0)
 
 
 
@@ -300,31 +369,22 @@ def get_modification_dt_of_file(
 def delete_old_files_from_directory(
         directory: Path,
         count_limit: int = None,
-        dt_threshold: dt = None
+        dt_threshold: dt = None,
+        index: DirectoryIndex = None,
 ) -> list[Path]:
+    """Delete files older than threshold and all but the newest ones.
+
+    Deleted files are returned from the newest to the oldest, see
+    files.retention for combined policies and dry run. With `index`
+    files are taken from it instead of scanning of directory.
+    """
     if not (count_limit or dt_threshold):
         raise ValueError('Provide count limit or datetime threshold!')
-    all_files = get_list_of_files_in_directory(directory)
-    deleted = []
-    if dt_threshold:
-        # TODO: TEST!!!
-        for _ in all_files:
-            modificated_at = get_modification_dt_of_file(_)
-            if modificated_at < dt_threshold:
-                _.unlink()
-                deleted.append(_)
-
-    all_files = get_list_of_files_in_directory(directory)
-    if count_limit:
-        def sort_key(file: Path):
-            return get_modification_dt_of_file(file)
-        sorted_by_modification_dt = sorted(
-            all_files, key=sort_key, reverse=True)
-        to_delete = sorted_by_modification_dt[count_limit:]
-        for _ in to_delete:
-            _.unlink()
-            deleted.append(_)
-    return deleted
+    policy = retention.RetentionPolicy(
+        keep_last=count_limit or 0, not_before=dt_threshold)
+    plan = retention.plan_retention(
+        retention.collect_files(directory, index=index), policy)
+    return retention.apply_plan(plan)
 
 
 @normalize_path
@@ -409,8 +469,5 @@ def save_text(content: str, full_path):
 
 
 def md5(fullpath: Path) -> str:
-    with open(fullpath, 'rb') as f:
-        file_hash = hashlib.md5()
-        while chunk := f.read(8192):
-            file_hash.update(chunk)
-    return file_hash.hexdigest()
+    """MD5 of file (see files.hashing for other algorithms and cache)."""
+    return hashing.hash_file(fullpath, hashing.MD5)
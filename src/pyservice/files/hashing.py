@@ -0,0 +1,149 @@
+"""Hashing of files.
+
+Files are read by `readinto` into a reusable buffer of the thread (no
+allocation per block), big files are hashed through mmap. hashlib
+releases GIL while hashing big blocks, so many files are hashed by a
+pool of threads in parallel. HashCache keeps digests by stat of file
+(size, mtime_ns, inode), unchanged files are never hashed again.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import mmap
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Callable, Iterable
+
+try:
+    import xxhash
+except ImportError:  # pragma: no cover
+    xxhash = None
+
+
+MD5 = 'md5'
+SHA1 = 'sha1'
+SHA256 = 'sha256'
+BLAKE2B = 'blake2b'
+XXH3_64 = 'xxh3_64'
+XXH3_128 = 'xxh3_128'
+
+BUFFER_SIZE = 1024 * 1024
+# files of this size and bigger are hashed through mmap
+MMAP_THRESHOLD = 64 * 1024 * 1024
+
+_hashers: dict[str, Callable] = {
+    MD5: hashlib.md5,
+    SHA1: hashlib.sha1,
+    SHA256: hashlib.sha256,
+    BLAKE2B: hashlib.blake2b,
+}
+if xxhash is not None:
+    _hashers[XXH3_64] = xxhash.xxh3_64
+    _hashers[XXH3_128] = xxhash.xxh3_128
+
+
+def available_algorithms() -> list[str]:
+    return list(_hashers)
+
+
+def new_hasher(algorithm: str = MD5):
+    try:
+        return _hashers[algorithm]()
+    except KeyError:
+        raise ValueError(
+            f'Hashing algorithm is not available: {algorithm}') from None
+
+
+_local = threading.local()
+
+
+def _buffer_of_thread() -> memoryview:
+    buffer = getattr(_local, 'buffer', None)
+    if buffer is None:
+        buffer = memoryview(bytearray(BUFFER_SIZE))
+        _local.buffer = buffer
+    return buffer
+
+
+def hash_file(
+        path: Path | str,
+        algorithm: str = MD5,
+        use_mmap: bool | None = None,
+) -> str:
+    """Hex digest of file (mmap is used for big files by default)."""
+    hasher = new_hasher(algorithm)
+    with open(path, 'rb', buffering=0) as f:
+        size = os.fstat(f.fileno()).st_size
+        if use_mmap is None:
+            use_mmap = size >= MMAP_THRESHOLD
+        if use_mmap and size:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                hasher.update(mm)
+            return hasher.hexdigest()
+        buffer = _buffer_of_thread()
+        while read := f.readinto(buffer):
+            hasher.update(buffer[:read])
+    return hasher.hexdigest()
+
+
+class HashCache:
+    """Digests of files by their stat (least recently used are evicted)."""
+
+    def __init__(self, max_entries: int = 100000):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._entries: OrderedDict[tuple[str, str], tuple] = OrderedDict()
+
+    def hash_file(self, path: Path | str, algorithm: str = MD5) -> str:
+        path = os.path.abspath(path)
+        stat = os.stat(path)
+        signature = (stat.st_size, stat.st_mtime_ns, stat.st_ino)
+        key = (path, algorithm)
+        with self._lock:
+            cached = self._entries.get(key)
+            if cached is not None and cached[0] == signature:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return cached[1]
+            self.misses += 1
+        digest = hash_file(path, algorithm)
+        with self._lock:
+            self._entries[key] = (signature, digest)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return digest
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+default_cache = HashCache()
+
+
+def hash_files(
+        paths: Iterable[Path | str],
+        algorithm: str = MD5,
+        max_workers: int = 8,
+        cache: HashCache | None = default_cache,
+) -> dict[Path, str]:
+    """Digests of many files hashed by a pool of threads."""
+    paths = [Path(_) for _ in paths]
+    if cache is None:
+        def digest_of(path: Path) -> str:
+            return hash_file(path, algorithm)
+    else:
+        def digest_of(path: Path) -> str:
+            return cache.hash_file(path, algorithm)
+    if max_workers <= 1 or len(paths) <= 1:
+        return {_: digest_of(_) for _ in paths}
+    with ThreadPoolExecutor(max_workers=max_workers,
+                            thread_name_prefix='hashing') as executor:
+        return dict(zip(paths, executor.map(digest_of, paths)))
@@ -0,0 +1,248 @@
+"""Persistent index of files of a directory tree.
+
+The index (path, size, mtime, inode of every regular file) is kept in a
+SQLite database. Refresh re-reads only directories whose mtime has
+changed since the previous refresh (a directory mtime changes when its
+entries are added, removed or renamed), the other directories cost a
+single stat. Content changes of existing files do not change mtime of
+their directory, they are picked up by `refresh(check_files=True)`.
+
+Directories modified right before refresh are re-read next time as
+well, because mtime of some file systems has a coarse resolution.
+"""
+
+from __future__ import annotations
+
+import dataclasses
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Iterator
+
+
+# directories changed later than this before refresh are not trusted
+MTIME_RESOLUTION_NS = 2_000_000_000
+# mtime of directory which has to be re-read by the next refresh
+UNTRUSTED_MTIME = -1
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS directories (
+    path TEXT PRIMARY KEY,
+    parent TEXT,
+    mtime_ns INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS directories_parent ON directories (parent);
+CREATE TABLE IF NOT EXISTS files (
+    path TEXT PRIMARY KEY,
+    directory TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    inode INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS files_directory ON files (directory);
+'''
+
+
+@dataclasses.dataclass(frozen=True, slots=True)
+class IndexedFile:
+    """Regular file in index."""
+
+    path: Path
+    size: int
+    mtime_ns: int
+    inode: int
+
+
+@dataclasses.dataclass(slots=True)
+class IndexChanges:
+    """Result of refresh of index."""
+
+    added: list[Path] = dataclasses.field(default_factory=list)
+    updated: list[Path] = dataclasses.field(default_factory=list)
+    removed: list[Path] = dataclasses.field(default_factory=list)
+    # directories read by scandir (the rest were stat-ed only)
+    scanned_directories: int = 0
+
+    @property
+    def is_empty(self) -> bool:
+        return not (self.added or self.updated or self.removed)
+
+
+class DirectoryIndex:
+    """Index of regular files of directory, refreshed incrementally."""
+
+    def __init__(self, directory: Path | str, index_file: Path | str):
+        self.directory = Path(directory).absolute()
+        self.index_file = Path(index_file)
+        self.index_file.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(self.index_file, check_same_thread=False)
+        self._db.executescript(SCHEMA)
+
+    def refresh(self, check_files: bool = False) -> IndexChanges:
+        """Bring index in line with directory.
+
+        With `check_files` existing files of unchanged directories are
+        stat-ed as well (to find files modified in place).
+        """
+        changes = IndexChanges()
+        trusted_before = time.time_ns() - MTIME_RESOLUTION_NS
+        with self._lock, self._db:
+            known = dict(self._db.execute(
+                'SELECT path, mtime_ns FROM directories'))
+            root = str(self.directory)
+            stack = [(root, None)]
+            while stack:
+                directory, parent = stack.pop()
+                try:
+                    mtime_ns = os.stat(directory).st_mtime_ns
+                except FileNotFoundError:
+                    self._forget_directory(directory, changes)
+                    continue
+                if known.get(directory) == mtime_ns:
+                    if check_files:
+                        self._check_files(directory, changes)
+                    subdirectories = self._subdirectories(directory)
+                    stack.extend((_, directory) for _ in subdirectories)
+                    continue
+                changes.scanned_directories += 1
+                subdirectories = self._rescan(directory, changes)
+                stack.extend((_, directory) for _ in subdirectories)
+                if mtime_ns > trusted_before:
+                    mtime_ns = UNTRUSTED_MTIME
+                self._db.execute(
+                    'INSERT OR REPLACE INTO directories VALUES (?, ?, ?)',
+                    (directory, parent, mtime_ns))
+        return changes
+
+    def _subdirectories(self, directory: str) -> list[str]:
+        rows = self._db.execute(
+            'SELECT path FROM directories WHERE parent = ?', (directory,))
+        return [_ for (_,) in rows]
+
+    def _indexed_files(self, directory: str) -> dict[str, tuple]:
+        rows = self._db.execute(
+            'SELECT path, size, mtime_ns, inode FROM files '
+            'WHERE directory = ?', (directory,))
+        return {path: tuple(rest) for path, *rest in rows}
+
+    def _rescan(self, directory: str, changes: IndexChanges) -> list[str]:
+        """Sync files of directory, return its subdirectories."""
+        indexed = self._indexed_files(directory)
+        subdirectories, upserts = [], []
+        try:
+            with os.scandir(directory) as entries:
+                for entry in entries:
+                    if entry.is_dir(follow_symlinks=False):
+                        subdirectories.append(entry.path)
+                    elif entry.is_file(follow_symlinks=False):
+                        stat = entry.stat(follow_symlinks=False)
+                        row = (stat.st_size, stat.st_mtime_ns, stat.st_ino)
+                        previous = indexed.pop(entry.path, None)
+                        if previous is None:
+                            changes.added.append(Path(entry.path))
+                        elif previous != row:
+                            changes.updated.append(Path(entry.path))
+                        else:
+                            continue
+                        upserts.append((entry.path, directory, *row))
+        except PermissionError:
+            pass
+        self._db.executemany(
+            'INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?, ?)', upserts)
+        self._remove_files(list(indexed), changes)
+        for gone in set(self._subdirectories(directory)) \
+                - set(subdirectories):
+            self._forget_directory(gone, changes)
+        return subdirectories
+
+    def _check_files(self, directory: str, changes: IndexChanges):
+        upserts, gone = [], []
+        for path, previous in self._indexed_files(directory).items():
+            try:
+                stat = os.stat(path, follow_symlinks=False)
+            except FileNotFoundError:
+                gone.append(path)
+                continue
+            row = (stat.st_size, stat.st_mtime_ns, stat.st_ino)
+            if row != previous:
+                changes.updated.append(Path(path))
+                upserts.append((path, directory, *row))
+        self._db.executemany(
+            'INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?, ?)', upserts)
+        self._remove_files(gone, changes)
+
+    def _remove_files(self, paths: list[str], changes: IndexChanges):
+        self._db.executemany(
+            'DELETE FROM files WHERE path = ?', [(_,) for _ in paths])
+        changes.removed.extend(Path(_) for _ in paths)
+
+    def _forget_directory(self, directory: str, changes: IndexChanges):
+        """Remove directory and everything below it from index."""
+        # LIKE of SQLite is case-insensitive, so prefixes are compared
+        nested = directory + '/'
+        params = (directory, len(nested), nested)
+        condition = '(directory = ? OR substr(directory, 1, ?) = ?)'
+        rows = self._db.execute(
+            f'SELECT path FROM files WHERE {condition}', params)
+        changes.removed.extend(Path(_) for (_,) in rows)
+        self._db.execute(f'DELETE FROM files WHERE {condition}', params)
+        self._db.execute(
+            'DELETE FROM directories '
+            'WHERE path = ? OR substr(path, 1, ?) = ?', params)
+
+    def _condition(self, directory: Path | str | None,
+                   recursive: bool) -> tuple[str, tuple]:
+        """SQL condition selecting files of (sub)directory."""
+        if directory is None:
+            directory = self.directory
+        directory = Path(directory).absolute()
+        if directory != self.directory \
+                and self.directory not in directory.parents:
+            raise ValueError(
+                f'Directory <{directory}> is not in index of '
+                f'<{self.directory}>')
+        if directory == self.directory and recursive:
+            return '1', ()
+        if not recursive:
+            return 'directory = ?', (str(directory),)
+        nested = str(directory) + '/'
+        return '(directory = ? OR substr(directory, 1, ?) = ?)', \
+            (str(directory), len(nested), nested)
+
+    def files(self, directory: Path | str | None = None,
+              recursive: bool = True) -> Iterator[IndexedFile]:
+        """Indexed files (as of the last refresh) of (sub)directory."""
+        condition, params = self._condition(directory, recursive)
+        with self._lock:
+            rows = self._db.execute(
+                'SELECT path, size, mtime_ns, inode FROM files '
+                f'WHERE {condition}', params).fetchall()
+        for path, size, mtime_ns, inode in rows:
+            yield IndexedFile(Path(path), size, mtime_ns, inode)
+
+    def count_files(self, directory: Path | str | None = None,
+                    recursive: bool = True) -> int:
+        condition, params = self._condition(directory, recursive)
+        with self._lock:
+            row = self._db.execute(
+                f'SELECT COUNT(*) FROM files WHERE {condition}',
+                params).fetchone()
+        return row[0]
+
+    @property
+    def number_of_files(self) -> int:
+        return self.count_files()
+
+    @property
+    def total_size_in_bytes(self) -> int:
+        with self._lock:
+            row = self._db.execute(
+                'SELECT COALESCE(SUM(size), 0) FROM files').fetchone()
+        return row[0]
+
+    def close(self):
+        with self._lock:
+            self._db.close()
@@ -0,0 +1,252 @@
+"""Moving of many files at once with rollback.
+
+Files of the same device as their target directory are renamed (without
+overwriting, a file is linked to its target and unlinked, so an existing
+target is found by the kernel, not by a separate stat). Files of other
+devices are copied in parallel (by copy_file_range or sendfile when the
+kernel supports them, by big buffers otherwise) to temporary files near
+their targets first, then all files are put in place. Overwritten
+targets are kept aside (by hard links) until all files are in place,
+sources of copied files are removed only then too (their directories are
+checked to be writable beforehand, a source which still can not be
+removed is logged, not raised, as all files are in place already). If
+anything fails, everything done is rolled back.
+"""
+
+from __future__ import annotations
+
+import dataclasses
+import errno
+import itertools
+import logging
+import os
+import shutil
+from concurrent.futures import ThreadPoolExecutor, wait
+from pathlib import Path
+from typing import BinaryIO, Iterable
+
+
+BUFFER_SIZE = 8 * 1024 * 1024
+# errors of os.link on file systems without hard links
+_LINK_NOT_SUPPORTED = (errno.EPERM, errno.ENOTSUP, errno.EOPNOTSUPP,
+                       errno.EMLINK, errno.EXDEV)
+# errors of copy_file_range and sendfile when they can not copy files
+_KERNEL_COPY_NOT_SUPPORTED = (errno.EXDEV, errno.ENOSYS, errno.EINVAL,
+                             errno.EOPNOTSUPP, errno.EBADF)
+
+
+@dataclasses.dataclass(frozen=True, slots=True)
+class Move:
+    """Source file and its new path."""
+
+    # strings: pathlib costs more than syscalls of a move
+    source: str
+    target: str
+
+
+_numbers = itertools.count()
+
+
+def _temporary_path(target: str, purpose: str) -> str:
+    directory, name = os.path.split(target)
+    number = f'{os.getpid()}-{next(_numbers)}'
+    return os.path.join(directory, f'.{name}.{number}.{purpose}')
+
+
+def _copy_by_kernel(copy, fsrc: BinaryIO, fdst: BinaryIO,
+                    buffer_size: int) -> bool:
+    """Copy by copy_file_range or sendfile (False if not supported)."""
+    offset = 0
+    try:
+        while sent := copy(fsrc.fileno(), fdst.fileno(), offset,
+                           buffer_size):
+            offset += sent
+        return True
+    except OSError as e:
+        if offset or e.errno not in _KERNEL_COPY_NOT_SUPPORTED:
+            raise
+        return False
+
+
+def _copy_file_range(infd: int, outfd: int, offset: int, count: int):
+    return os.copy_file_range(infd, outfd, count, offset, offset)
+
+
+def _sendfile(infd: int, outfd: int, offset: int, count: int):
+    return os.sendfile(outfd, infd, offset, count)
+
+
+_kernel_copies = [_ for name, _ in (('copy_file_range', _copy_file_range),
+                                    ('sendfile', _sendfile))
+                  if hasattr(os, name)]
+
+
+def _copy_data(source: str, target: str, buffer_size: int):
+    with open(source, 'rb') as fsrc, open(target, 'wb') as fdst:
+        for copy in _kernel_copies:
+            if _copy_by_kernel(copy, fsrc, fdst, buffer_size):
+                return
+        shutil.copyfileobj(fsrc, fdst, buffer_size)
+
+
+def copy_file(source: Path | str, target: Path | str,
+              buffer_size: int = BUFFER_SIZE):
+    """Copy file (or symlink) with its metadata."""
+    if os.path.islink(source):
+        os.symlink(os.readlink(source), target)
+    else:
+        _copy_data(os.fspath(source), os.fspath(target), buffer_size)
+    shutil.copystat(source, target, follow_symlinks=False)
+
+
+class _Journal:
+    """Files put in place, to be rolled back or committed."""
+
+    def __init__(self):
+        # (path before, path after, target moved aside or None)
+        self._done: list[tuple[str, str, str | None]] = []
+
+    def put(self, source: str, target: str, exist_ok: bool):
+        aside = None
+        if exist_ok:
+            aside = _keep_aside(target)
+            try:
+                os.replace(source, target)
+            except BaseException:
+                if aside is not None:
+                    os.replace(aside, target)
+                raise
+        else:
+            _rename_without_overwriting(source, target)
+        self._done.append((source, target, aside))
+
+    def rollback(self):
+        for source, target, aside in reversed(self._done):
+            os.rename(target, source)
+            if aside is not None:
+                os.replace(aside, target)
+        self._done.clear()
+
+    def commit(self):
+        for _, _, aside in self._done:
+            if aside is not None:
+                _unlink(aside)
+        self._done.clear()
+
+
+def _unlink(path: str):
+    try:
+        os.unlink(path)
+    except FileNotFoundError:
+        pass
+
+
+def _keep_aside(target: str) -> str | None:
+    """Hard link to existing target (it is replaced, but not lost yet)."""
+    aside = _temporary_path(target, 'replaced')
+    try:
+        os.link(target, aside, follow_symlinks=False)
+    except FileNotFoundError:
+        return None
+    except OSError as e:
+        if e.errno not in _LINK_NOT_SUPPORTED or os.path.isdir(target):
+            raise
+        os.rename(target, aside)
+    return aside
+
+
+def _rename_without_overwriting(source: str, target: str):
+    try:
+        os.link(source, target, follow_symlinks=False)
+    except FileExistsError:
+        raise FileExistsError(f'File <{target}> already exists') from None
+    except OSError as e:
+        if e.errno not in _LINK_NOT_SUPPORTED:
+            raise
+        if os.path.lexists(target):
+            raise FileExistsError(f'File <{target}> already exists') from e
+        os.rename(source, target)
+        return
+    os.unlink(source)
+
+
+def _copy_all(moves: list[Move], max_workers: int,
+              buffer_size: int) -> dict[Move, str]:
+    """Copy files to temporary paths near targets (all or nothing)."""
+    copies = {_: _temporary_path(_.target, 'moving') for _ in moves}
+    if not moves:
+        return copies
+    with ThreadPoolExecutor(max_workers=max(1, max_workers),
+                            thread_name_prefix='mover') as executor:
+        futures = [executor.submit(copy_file, _.source, copies[_],
+                                   buffer_size) for _ in moves]
+        wait(futures)
+    errors = [_.exception() for _ in futures if _.exception()]
+    if errors:
+        for tmp in copies.values():
+            _unlink(tmp)
+        raise errors[0]
+    return copies
+
+
+def _check_removable(moves: list[Move]):
+    """Sources of copied files can be removed after copying."""
+    for directory in {os.path.dirname(_.source) or '.' for _ in moves}:
+        if not os.access(directory, os.W_OK | os.X_OK):
+            raise PermissionError(
+                errno.EACCES, 'Files can not be removed from directory',
+                directory)
+
+
+def move_files(
+        moves: Iterable[tuple[Path | str, Path | str]],
+        exist_ok: bool = False,
+        max_workers: int = 4,
+        buffer_size: int = BUFFER_SIZE,
+) -> list[Path]:
+    """Move files (source, target) all at once, return targets.
+
+    Existing targets are replaced with `exist_ok`, otherwise
+    FileExistsError is raised. On any error no file is moved.
+    """
+    moves = [Move(os.fspath(source), os.fspath(target))
+             for source, target in moves]
+    targets = [_.target for _ in moves]
+    if len(set(targets)) != len(targets):
+        raise ValueError('Several files are moved to the same path')
+    # devices are taken from directories, a stat per directory
+    devices: dict[str, int] = {}
+
+    def device_of(path: str) -> int:
+        directory = os.path.dirname(path)
+        if directory not in devices:
+            devices[directory] = os.stat(directory or '.').st_dev
+        return devices[directory]
+
+    renamed, copied = [], []
+    for move in moves:
+        same_device = device_of(move.source) == device_of(move.target)
+        (renamed if same_device else copied).append(move)
+
+    _check_removable(copied)
+    copies = _copy_all(copied, max_workers, buffer_size)
+    journal = _Journal()
+    try:
+        for move in renamed:
+            journal.put(move.source, move.target, exist_ok)
+        for move in copied:
+            journal.put(copies[move], move.target, exist_ok)
+    except BaseException:
+        journal.rollback()
+        for tmp in copies.values():
+            _unlink(tmp)
+        raise
+    journal.commit()
+    for move in copied:
+        try:
+            os.unlink(move.source)
+        except OSError:
+            logging.getLogger(__name__).warning(
+                'file <%s> is moved to <%s>, but can not be removed',
+                move.source, move.target, exc_info=True)
+    return [Path(_) for _ in targets]
@@ -0,0 +1,238 @@
+"""Retention of files (like backups) by combined policies.
+
+Every file is stat-ed once, when files are collected. A file is kept if
+any of keep rules selects it: the newest `keep_last` files, the newest
+file of each of the last `keep_daily` days (`keep_weekly` weeks,
+`keep_monthly` months). Files older than `not_before` are deleted
+regardless of keep rules, then the oldest of kept files are deleted
+while kept files take more than `max_total_bytes`.
+
+Planning does not touch files, so a plan can be shown (dry run) before
+it is applied. With a DirectoryIndex (see files.index) files are taken
+from the index after its incremental refresh instead of a full scan.
+"""
+
+from __future__ import annotations
+
+import dataclasses
+import heapq
+import os
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime as dt
+from pathlib import Path
+from typing import Callable, Hashable, Iterable
+
+from pyservice.files.index import DirectoryIndex
+
+
+@dataclasses.dataclass(frozen=True, slots=True)
+class RetainedFile:
+    """File with its stat taken at collecting."""
+
+    path: Path
+    size: int
+    mtime: float
+
+    @property
+    def modification_dt(self) -> dt:
+        return dt.fromtimestamp(self.mtime)
+
+
+@dataclasses.dataclass(frozen=True, slots=True)
+class RetentionPolicy:
+    """Rules of retention (None or zero - rule is not used)."""
+
+    keep_last: int = 0
+    keep_daily: int = 0
+    keep_weekly: int = 0
+    keep_monthly: int = 0
+    max_total_bytes: int = 0
+    not_before: dt | None = None
+
+    @property
+    def has_keep_rules(self) -> bool:
+        return bool(self.keep_last or self.keep_daily
+                    or self.keep_weekly or self.keep_monthly)
+
+    @property
+    def is_empty(self) -> bool:
+        return not (self.has_keep_rules or self.max_total_bytes
+                    or self.not_before)
+
+
+@dataclasses.dataclass(slots=True)
+class RetentionPlan:
+    """Files to keep and to delete (both from the newest to the oldest)."""
+
+    keep: list[RetainedFile] = dataclasses.field(default_factory=list)
+    delete: list[RetainedFile] = dataclasses.field(default_factory=list)
+
+    @property
+    def bytes_to_free(self) -> int:
+        return sum(_.size for _ in self.delete)
+
+    @property
+    def bytes_to_keep(self) -> int:
+        return sum(_.size for _ in self.keep)
+
+    def describe(self) -> list[str]:
+        """Human-readable lines of plan (for dry run)."""
+        return [
+            f'{"keep" if action else "delete"} {_.path} '
+            f'({_.size} bytes, {_.modification_dt:%Y-%m-%d %H:%M:%S})'
+            for action, files in ((True, self.keep), (False, self.delete))
+            for _ in files
+        ]
+
+
+def collect_files(directory: Path | str,
+                  recursive: bool = True,
+                  index: DirectoryIndex | None = None) -> list[RetainedFile]:
+    """Files of directory (symlinks to files included) stat-ed once.
+
+    With `index` (of directory or of its parent) regular files are taken
+    from the refreshed index.
+    """
+    if index is not None:
+        index.refresh()
+        return [RetainedFile(_.path, _.size, _.mtime_ns / 1e9)
+                for _ in index.files(directory, recursive)]
+    found = []
+    stack = [os.fspath(directory)]
+    while stack:
+        current = stack.pop()
+        try:
+            with os.scandir(current) as entries:
+                for entry in entries:
+                    if entry.is_dir(follow_symlinks=False):
+                        if recursive:
+                            stack.append(entry.path)
+                    elif entry.is_file():
+                        stat = entry.stat()
+                        found.append(RetainedFile(
+                            Path(entry.path), stat.st_size, stat.st_mtime))
+        except (PermissionError, FileNotFoundError):
+            continue
+    return found
+
+
+def _by_mtime(file: RetainedFile) -> float:
+    return file.mtime
+
+
+def _representatives(
+        files: Iterable[RetainedFile],
+        bucket_of: Callable[[dt], Hashable],
+        count: int,
+) -> list[RetainedFile]:
+    """The newest file of each of the newest `count` buckets."""
+    newest: dict[Hashable, RetainedFile] = {}
+    for file in files:
+        bucket = bucket_of(file.modification_dt)
+        current = newest.get(bucket)
+        if current is None or file.mtime > current.mtime:
+            newest[bucket] = file
+    return heapq.nlargest(count, newest.values(), key=_by_mtime)
+
+
+def _day(moment: dt) -> Hashable:
+    return moment.date()
+
+
+def _week(moment: dt) -> Hashable:
+    return moment.isocalendar()[:2]
+
+
+def _month(moment: dt) -> Hashable:
+    return moment.year, moment.month
+
+
+def plan_retention(files: list[RetainedFile],
+                   policy: RetentionPolicy) -> RetentionPlan:
+    """Split files to kept and deleted ones (files are not touched)."""
+    if policy.is_empty:
+        raise ValueError('Retention policy has no rules!')
+    candidates = files
+    expired = []
+    if policy.not_before is not None:
+        threshold = policy.not_before.timestamp()
+        candidates, expired = [], []
+        for file in files:
+            (expired if file.mtime < threshold else candidates).append(file)
+
+    if policy.has_keep_rules:
+        selected: dict[Path, RetainedFile] = {}
+        if policy.keep_last:
+            for file in heapq.nlargest(
+                    policy.keep_last, candidates, key=_by_mtime):
+                selected[file.path] = file
+        for count, bucket_of in ((policy.keep_daily, _day),
+                                 (policy.keep_weekly, _week),
+                                 (policy.keep_monthly, _month)):
+            if count:
+                for file in _representatives(candidates, bucket_of, count):
+                    selected[file.path] = file
+        keep = list(selected.values())
+        deleted = [_ for _ in candidates if _.path not in selected]
+    else:
+        keep, deleted = list(candidates), []
+
+    keep.sort(key=_by_mtime, reverse=True)
+    if policy.max_total_bytes:
+        total = sum(_.size for _ in keep)
+        while keep and total > policy.max_total_bytes:
+            oldest = keep.pop()
+            total -= oldest.size
+            deleted.append(oldest)
+
+    deleted.extend(expired)
+    deleted.sort(key=_by_mtime, reverse=True)
+    return RetentionPlan(keep=keep, delete=deleted)
+
+
+def _unlink_batch(batch: list[RetainedFile]) -> list[Path]:
+    removed = []
+    for file in batch:
+        try:
+            os.unlink(file.path)
+        except FileNotFoundError:
+            continue
+        removed.append(file.path)
+    return removed
+
+
+def apply_plan(plan: RetentionPlan, batch_size: int = 256,
+               max_workers: int = 1) -> list[Path]:
+    """Delete files of plan by batches, return deleted ones.
+
+    Batches are deleted concurrently with `max_workers` > 1 (unlink is
+    bound by latency on network file systems). Files which are already
+    removed are skipped.
+    """
+    batches = [plan.delete[i:i + batch_size]
+               for i in range(0, len(plan.delete), batch_size)]
+    if max_workers <= 1 or len(batches) <= 1:
+        results = map(_unlink_batch, batches)
+        return [_ for batch in results for _ in batch]
+    with ThreadPoolExecutor(max_workers=max_workers,
+                            thread_name_prefix='retention') as executor:
+        results = list(executor.map(_unlink_batch, batches))
+    return [_ for batch in results for _ in batch]
+
+
+def apply_retention(
+        directory: Path | str,
+        policy: RetentionPolicy,
+        dry_run: bool = False,
+        recursive: bool = True,
+        index: DirectoryIndex | None = None,
+) -> RetentionPlan:
+    """Plan retention of files of directory and apply it (unless dry run).
+
+    Returned plan lists files which are deleted (or would be deleted).
+    """
+    plan = plan_retention(
+        collect_files(directory, recursive, index), policy)
+    if not dry_run:
+        apply_plan(plan)
+    return plan
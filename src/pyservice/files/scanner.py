@@ -0,0 +1,217 @@
+"""Single-pass scanning of directories by os.scandir.
+
+Type of an entry is taken from its cached DirEntry (no syscall on most
+file systems), only files (for size) and special entries (for kind) are
+stat-ed once. Entities are classified like DetailedDirectory always did:
+symlinks are classified by their targets, symlinked directories are not
+scanned.
+"""
+
+from __future__ import annotations
+
+import dataclasses
+import fnmatch
+import os
+import stat
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Callable, Iterator, TypeVar
+
+
+FILES = 'files'
+DIRECTORIES = 'directories'
+SYMLINKS = 'symlinks'
+SOCKETS = 'sockets'
+CHAR_DEVICES = 'char_devices'
+FIFOS = 'fifos'
+BLOCK_DEVICES = 'block_devices'
+DENIED = 'denied'
+UNKNOWN = 'unknown'
+
+
+@dataclasses.dataclass(frozen=True, slots=True)
+class ScannedEntry:
+    """Entity found by scanner (size is known for files only)."""
+
+    path: str
+    kind: str
+    size: int = 0
+
+
+@dataclasses.dataclass(slots=True)
+class ScanTotals:
+    """Numbers of entities by kind and size of files (without paths)."""
+
+    counts: dict[str, int] = dataclasses.field(default_factory=dict)
+    total_size_in_bytes: int = 0
+
+    @property
+    def total_entities(self) -> int:
+        return sum(self.counts.values())
+
+    def add(self, entry: ScannedEntry):
+        self.counts[entry.kind] = self.counts.get(entry.kind, 0) + 1
+        self.total_size_in_bytes += entry.size
+
+    def merge(self, other: ScanTotals):
+        for kind, count in other.counts.items():
+            self.counts[kind] = self.counts.get(kind, 0) + count
+        self.total_size_in_bytes += other.total_size_in_bytes
+
+
+def split_mask(mask: str) -> tuple[bool, str] | None:
+    """Mask as (recursive, pattern of name) or None if not supported.
+
+    Supported masks are '*.ext'-like (entries of directory) and
+    '**/*.ext'-like (entries of all nested directories).
+    """
+    recursive = mask.startswith('**/')
+    pattern = mask[3:] if recursive else mask
+    if not pattern or '/' in pattern or '**' in pattern:
+        return None
+    return recursive, pattern
+
+
+def _special_kind(mode: int) -> str:
+    if stat.S_ISSOCK(mode):
+        return SOCKETS
+    if stat.S_ISCHR(mode):
+        return CHAR_DEVICES
+    if stat.S_ISFIFO(mode):
+        return FIFOS
+    if stat.S_ISBLK(mode):
+        return BLOCK_DEVICES
+    return UNKNOWN
+
+
+def classify(entry: os.DirEntry) -> ScannedEntry:
+    try:
+        if entry.is_dir(follow_symlinks=False):
+            return ScannedEntry(entry.path, DIRECTORIES)
+        if entry.is_file(follow_symlinks=False):
+            size = entry.stat(follow_symlinks=False).st_size
+            return ScannedEntry(entry.path, FILES, size)
+        if entry.is_symlink():
+            if entry.is_file():
+                size = entry.stat(follow_symlinks=False).st_size
+                return ScannedEntry(entry.path, FILES, size)
+            if entry.is_dir():
+                return ScannedEntry(entry.path, DIRECTORIES)
+            return ScannedEntry(entry.path, SYMLINKS)
+        mode = entry.stat(follow_symlinks=False).st_mode
+        return ScannedEntry(entry.path, _special_kind(mode))
+    except PermissionError:
+        return ScannedEntry(entry.path, DENIED)
+
+
+def _walk(start: str, recursive: bool, pattern: str,
+          start_matches: bool | None = None) -> Iterator[ScannedEntry]:
+    """Entries of directory, subdirectories are yielded once scanned.
+
+    So an unreadable subdirectory is yielded once, as denied. Start is
+    a found subdirectory if `start_matches` (the pattern) is not None.
+    """
+    match_all = pattern == '*'
+    stack = [(start, start_matches)]
+    while stack:
+        current, matches = stack.pop()
+        try:
+            with os.scandir(current) as entries:
+                if matches:
+                    yield ScannedEntry(current, DIRECTORIES)
+                for entry in entries:
+                    matched = match_all or fnmatch.fnmatchcase(
+                        entry.name, pattern)
+                    if recursive and entry.is_dir(follow_symlinks=False):
+                        stack.append((entry.path, matched))
+                    elif matched:
+                        yield classify(entry)
+        except PermissionError:
+            if matches is not None:
+                yield ScannedEntry(current, DENIED)
+        except FileNotFoundError:
+            # removed during scanning
+            continue
+
+
+def iter_entries(
+        directory: Path | str,
+        mask: str = '**/*',
+) -> Iterator[ScannedEntry]:
+    """Entities of directory matching mask (streaming)."""
+    split = split_mask(mask)
+    if split is None:
+        raise ValueError(f'mask is not supported by scanner: {mask}')
+    recursive, pattern = split
+    return _walk(os.fspath(directory), recursive, pattern)
+
+
+Partial = TypeVar('Partial')
+
+
+def _top_level_entries(
+        directory: str, pattern: str,
+        subdirectories: list[tuple[str, bool]]) -> Iterator[ScannedEntry]:
+    """Entries of directory itself, its subdirectories are collected."""
+    match_all = pattern == '*'
+    with os.scandir(directory) as entries:
+        for entry in entries:
+            matched = match_all or fnmatch.fnmatchcase(entry.name, pattern)
+            if entry.is_dir(follow_symlinks=False):
+                # yielded by scanning of subdirectory (see _walk)
+                subdirectories.append((entry.path, matched))
+            elif matched:
+                yield classify(entry)
+
+
+def scan_in_parallel(
+        directory: Path | str,
+        mask: str,
+        collect: Callable[[Iterator[ScannedEntry]], Partial],
+        max_workers: int = 8,
+) -> list[Partial]:
+    """Scan top-level subdirectories of directory concurrently.
+
+    `collect` turns entries of a part of directory (the top level or a
+    subtree) into a partial result, partial results are to be merged by
+    caller. Scanning is bound by latency of stat calls (especially on
+    network file systems), so threads help despite GIL.
+    """
+    split = split_mask(mask)
+    if split is None:
+        raise ValueError(f'mask is not supported by scanner: {mask}')
+    recursive, pattern = split
+    if not recursive or max_workers <= 1:
+        return [collect(iter_entries(directory, mask))]
+    subdirectories: list[tuple[str, bool]] = []
+    try:
+        partials = [collect(_top_level_entries(
+            os.fspath(directory), pattern, subdirectories))]
+    except PermissionError:
+        return []
+    with ThreadPoolExecutor(max_workers=max_workers,
+                            thread_name_prefix='scanner') as executor:
+        partials.extend(executor.map(
+            lambda _: collect(_walk(_[0], True, pattern, _[1])),
+            subdirectories))
+    return partials
+
+
+def _totals_of(entries: Iterator[ScannedEntry]) -> ScanTotals:
+    totals = ScanTotals()
+    for entry in entries:
+        totals.add(entry)
+    return totals
+
+
+def scan_totals(
+        directory: Path | str,
+        mask: str = '**/*',
+        max_workers: int = 1,
+) -> ScanTotals:
+    """Numbers and size of entities without keeping their paths."""
+    totals = ScanTotals()
+    for partial in scan_in_parallel(directory, mask, _totals_of,
+                                    max_workers):
+        totals.merge(partial)
+    return totals
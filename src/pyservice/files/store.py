@@ -0,0 +1,382 @@
+"""Deduplicating store of snapshots of directories.
+
+Files are cut into content-defined chunks, every chunk is stored once
+under its hash (compressed by zlib), so a snapshot of a mostly static
+directory stores only new chunks. Besides, files with the same size and
+mtime as in the previous snapshot are not read at all: their chunks are
+taken from its manifest.
+
+Chunk boundaries are found at C speed: every byte of data is translated
+to one of 16 symbols (bytes.translate) and a boundary is placed after
+an anchor (a fixed sequence of symbols) found by bytes.find. Boundaries
+depend on a few bytes around them only, so an insertion shifts only the
+chunks it touches. A per-byte rolling hash in pure Python is a hundred
+times slower.
+
+Layout of store:
+    chunks/<2 hex>/<hash>         - chunks (b'z' + zlib data or b'r' + data)
+    snapshots/<id>.json           - summaries of snapshots (for listing)
+    manifests/<id>.json.gz        - files of snapshots with their chunks
+    lock                          - shared by snapshotting, exclusive by gc
+
+Ids of snapshots (time of creation to nanoseconds) sort in creation order.
+"""
+
+from __future__ import annotations
+
+import contextlib
+import dataclasses
+import fcntl
+import fnmatch
+import gzip
+import hashlib
+import json
+import math
+import os
+import time
+import uuid
+import zlib
+from datetime import datetime as dt
+from pathlib import Path
+from typing import BinaryIO, Iterable, Iterator
+
+
+HASH_DIGEST_SIZE = 32
+RAW = b'r'
+COMPRESSED = b'z'
+
+
+def _symbols_table() -> bytes:
+    return bytes(hashlib.blake2b(bytes([_])).digest()[0] & 0x0F
+                 for _ in range(256))
+
+
+SYMBOLS = _symbols_table()
+# distinct symbols, so that runs of the same byte never match
+ANCHOR_SYMBOLS = bytes([1, 7, 3, 12, 5, 9, 14, 2])
+
+
+@dataclasses.dataclass(frozen=True, slots=True)
+class ChunkingParams:
+    """Sizes of chunks (average is approximate)."""
+
+    min_size: int = 256 * 1024
+    avg_size: int = 1024 * 1024
+    max_size: int = 4 * 1024 * 1024
+
+    def __post_init__(self):
+        if not 0 < self.min_size < self.avg_size < self.max_size:
+            raise ValueError('Sizes of chunks must be 0 < min < avg < max')
+
+    @property
+    def anchor(self) -> bytes:
+        # an anchor of n symbols is met once per 16 ** n bytes
+        length = round(math.log(self.avg_size - self.min_size, 16))
+        return ANCHOR_SYMBOLS[:max(1, min(length, len(ANCHOR_SYMBOLS)))]
+
+
+def iter_chunks(f: BinaryIO, params: ChunkingParams = ChunkingParams(),
+                read_size: int = 8 * 1024 * 1024) -> Iterator[bytes]:
+    """Content-defined chunks of file."""
+    anchor = params.anchor
+    read_size = max(read_size, params.max_size)
+    buffer, position, eof = b'', 0, False
+    while True:
+        if not eof and len(buffer) - position < params.max_size:
+            block = f.read(read_size)
+            eof = not block
+            buffer = buffer[position:] + block
+            position = 0
+            continue
+        rest = len(buffer) - position
+        if rest <= params.min_size:
+            if rest:
+                yield buffer[position:]
+            return
+        window = buffer[position + params.min_size - len(anchor):
+                        position + params.max_size]
+        found = window.translate(SYMBOLS).find(anchor)
+        if found < 0:
+            size = min(rest, params.max_size)
+        else:
+            size = params.min_size + found
+        yield buffer[position:position + size]
+        position += size
+
+
+def chunk_hash(chunk: bytes) -> str:
+    return hashlib.blake2b(chunk, digest_size=HASH_DIGEST_SIZE).hexdigest()
+
+
+@dataclasses.dataclass(frozen=True, slots=True)
+class SnapshotInfo:
+    """Summary of snapshot."""
+
+    id: str
+    created_at: str
+    source: str
+    tag: str | None
+    files: int
+    size: int
+    new_chunks: int
+    new_bytes: int
+    reused_files: int
+
+    @property
+    def created_dt(self) -> dt:
+        return dt.fromisoformat(self.created_at)
+
+
+@dataclasses.dataclass(frozen=True, slots=True)
+class GarbageCollection:
+    """Result of garbage collection of store."""
+
+    removed_chunks: int
+    freed_bytes: int
+    kept_chunks: int
+
+
+def _write_atomically(path: Path, data: bytes):
+    tmp = path.with_name(f'.{path.name}.{uuid.uuid4().hex[:8]}.tmp')
+    with open(tmp, 'wb') as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+
+class SnapshotStore:
+    """Content-addressed store of snapshots of directories."""
+
+    def __init__(
+            self,
+            directory: Path,
+            chunking: ChunkingParams = ChunkingParams(),
+            compress_level: int = 3,
+    ):
+        self.directory = Path(directory)
+        self.chunking = chunking
+        self.compress_level = compress_level
+        self.chunks_directory = self.directory / 'chunks'
+        self.snapshots_directory = self.directory / 'snapshots'
+        self.manifests_directory = self.directory / 'manifests'
+        self.lock_file = self.directory / 'lock'
+        for _ in (self.chunks_directory, self.snapshots_directory,
+                  self.manifests_directory):
+            _.mkdir(parents=True, exist_ok=True)
+
+    @contextlib.contextmanager
+    def locked(self, exclusive: bool = False):
+        """Lock of store: shared by snapshots, exclusive by gc (flock)."""
+        with open(self.lock_file, 'a+b') as f:
+            fcntl.flock(f, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    # chunks
+
+    def _chunk_path(self, digest: str) -> Path:
+        return self.chunks_directory / digest[:2] / digest
+
+    def has_chunk(self, digest: str) -> bool:
+        return self._chunk_path(digest).is_file()
+
+    def _put_chunk(self, chunk: bytes) -> tuple[str, int]:
+        """Store chunk (if new), return its hash and stored bytes."""
+        digest = chunk_hash(chunk)
+        path = self._chunk_path(digest)
+        if path.is_file():
+            return digest, 0
+        path.parent.mkdir(exist_ok=True)
+        compressed = zlib.compress(chunk, self.compress_level)
+        if len(compressed) < len(chunk):
+            data = COMPRESSED + compressed
+        else:
+            data = RAW + chunk
+        _write_atomically(path, data)
+        return digest, len(data)
+
+    def read_chunk(self, digest: str) -> bytes:
+        data = self._chunk_path(digest).read_bytes()
+        if data[:1] == COMPRESSED:
+            return zlib.decompress(data[1:])
+        return data[1:]
+
+    # snapshots
+
+    def snapshots(self) -> list[SnapshotInfo]:
+        """Snapshots from the oldest to the newest (summaries only)."""
+        found = []
+        for path in sorted(self.snapshots_directory.glob('*.json')):
+            found.append(SnapshotInfo(**json.loads(path.read_bytes())))
+        return found
+
+    def latest_snapshot(self, source: Path | None = None
+                        ) -> SnapshotInfo | None:
+        source = str(Path(source).absolute()) if source else None
+        for info in reversed(self.snapshots()):
+            if source is None or info.source == source:
+                return info
+        return None
+
+    def manifest(self, snapshot_id: str) -> dict:
+        path = self.manifests_directory / f'{snapshot_id}.json.gz'
+        return json.loads(gzip.decompress(path.read_bytes()))
+
+    def create_snapshot(self, source: Path,
+                        tag: str | None = None) -> SnapshotInfo:
+        """Store new chunks of files of source and its manifest."""
+        # chunks are not referenced by a manifest until its end, so gc
+        # must not run meanwhile
+        with self.locked(exclusive=False):
+            return self._create_snapshot(Path(source).absolute(), tag)
+
+    def _create_snapshot(self, source: Path,
+                         tag: str | None) -> SnapshotInfo:
+        previous = self.latest_snapshot(source)
+        known = {}
+        if previous is not None:
+            files = self.manifest(previous.id)['files']
+            known = {_['path']: _ for _ in files if 'chunks' in _}
+        entries, directories = [], []
+        new_chunks = new_bytes = reused = size = 0
+        for relative, stat, link in _walk(source):
+            if stat is None:
+                directories.append(relative)
+                continue
+            if link is not None:
+                entries.append({'path': relative, 'symlink': link})
+                continue
+            entry = {'path': relative, 'size': stat.st_size,
+                     'mtime_ns': stat.st_mtime_ns, 'mode': stat.st_mode}
+            old = known.get(relative)
+            if old is not None and old['size'] == stat.st_size \
+                    and old['mtime_ns'] == stat.st_mtime_ns \
+                    and all(map(self.has_chunk, old['chunks'])):
+                entry['chunks'] = old['chunks']
+                reused += 1
+            else:
+                entry['chunks'] = []
+                with open(source / relative, 'rb') as f:
+                    for chunk in iter_chunks(f, self.chunking):
+                        digest, stored = self._put_chunk(chunk)
+                        entry['chunks'].append(digest)
+                        new_chunks += bool(stored)
+                        new_bytes += stored
+            size += stat.st_size
+            entries.append(entry)
+
+        created_at, snapshot_id = _new_snapshot_id()
+        manifest = {'directories': directories, 'files': entries}
+        _write_atomically(
+            self.manifests_directory / f'{snapshot_id}.json.gz',
+            gzip.compress(json.dumps(manifest).encode('utf-8'), 6))
+        info = SnapshotInfo(
+            id=snapshot_id,
+            created_at=created_at.isoformat(),
+            source=str(source),
+            tag=tag,
+            files=sum(1 for _ in entries if 'chunks' in _),
+            size=size,
+            new_chunks=new_chunks,
+            new_bytes=new_bytes,
+            reused_files=reused,
+        )
+        # summary is written the last: snapshot is listed when complete
+        _write_atomically(
+            self.snapshots_directory / f'{snapshot_id}.json',
+            json.dumps(dataclasses.asdict(info)).encode('utf-8'))
+        return info
+
+    def restore(self, snapshot_id: str, output_dir: Path,
+                patterns: Iterable[str] | None = None) -> int:
+        """Restore files of snapshot (matching globs), return number."""
+        output_dir = Path(output_dir)
+        patterns = list(patterns or [])
+        manifest = self.manifest(snapshot_id)
+        if not patterns:
+            for relative in manifest['directories']:
+                (output_dir / relative).mkdir(parents=True, exist_ok=True)
+        restored = 0
+        for entry in manifest['files']:
+            relative = entry['path']
+            if patterns and not any(
+                    fnmatch.fnmatch(relative, _) for _ in patterns):
+                continue
+            target = output_dir / relative
+            target.parent.mkdir(parents=True, exist_ok=True)
+            if 'symlink' in entry:
+                target.unlink(missing_ok=True)
+                target.symlink_to(entry['symlink'])
+                continue
+            with open(target, 'wb') as f:
+                for digest in entry['chunks']:
+                    f.write(self.read_chunk(digest))
+            os.chmod(target, entry['mode'] & 0o7777)
+            os.utime(target, ns=(entry['mtime_ns'], entry['mtime_ns']))
+            restored += 1
+        return restored
+
+    def delete_snapshot(self, snapshot_id: str):
+        """Delete snapshot (its chunks are removed by gc)."""
+        (self.snapshots_directory / f'{snapshot_id}.json') \
+            .unlink(missing_ok=True)
+        (self.manifests_directory / f'{snapshot_id}.json.gz') \
+            .unlink(missing_ok=True)
+
+    def gc(self) -> GarbageCollection:
+        """Remove chunks which are not referenced by any snapshot."""
+        with self.locked(exclusive=True):
+            return self._gc()
+
+    def _gc(self) -> GarbageCollection:
+        referenced = set()
+        for info in self.snapshots():
+            for entry in self.manifest(info.id)['files']:
+                referenced.update(entry.get('chunks', ()))
+        removed = freed = kept = 0
+        for bucket in self.chunks_directory.iterdir():
+            with os.scandir(bucket) as entries:
+                for entry in entries:
+                    if entry.name in referenced:
+                        kept += 1
+                        continue
+                    freed += entry.stat().st_size
+                    os.unlink(entry.path)
+                    removed += 1
+        return GarbageCollection(removed, freed, kept)
+
+
+def _new_snapshot_id() -> tuple[dt, str]:
+    """Time of creation and id of snapshot (sorting by time)."""
+    ns = time.time_ns()
+    seconds, fraction = divmod(ns, 10 ** 9)
+    created_at = dt.fromtimestamp(seconds).astimezone() \
+        .replace(microsecond=fraction // 1000)
+    # random suffix keeps ids of concurrent snapshots unique
+    snapshot_id = f'{created_at:%Y%m%d-%H%M%S}-{fraction:09d}-' \
+                  f'{uuid.uuid4().hex[:4]}'
+    return created_at, snapshot_id
+
+
+def _walk(source: Path) -> Iterator[tuple[str, os.stat_result | None,
+                                          str | None]]:
+    """(relative path, stat, link) of files, symlinks and directories.
+
+    Directories come with stat None, symlinks with their targets.
+    """
+    root = os.fspath(source)
+    stack = [root]
+    while stack:
+        current = stack.pop()
+        with os.scandir(current) as entries:
+            for entry in sorted(entries, key=lambda _: _.name):
+                relative = os.path.relpath(entry.path, root)
+                if entry.is_symlink():
+                    yield relative, entry.stat(follow_symlinks=False), \
+                        os.readlink(entry.path)
+                elif entry.is_dir():
+                    yield relative, None, None
+                    stack.append(entry.path)
+                elif entry.is_file():
+                    yield relative, entry.stat(), None
@@ -8,4 +8,6 @@ from .log_tools import (
     get_file_of_logger,
     clean_file_for_logger,
     get_content_of_log_file_of_logger,
+    get_last_records_of_logger,
+    get_json_records_of_logger,
 )
@@ -2,9 +2,16 @@
 
 import functools
 import logging
+import random
+import time
+from contextvars import ContextVar
 from logging import Logger
 
 
+# nesting of calls of functions decorated by logged and logged_method
+call_depth: ContextVar[int] = ContextVar('call_depth', default=0)
+
+
 def shrink(string, limit):
     """Shrink too long strings"""
     string_length = len(string)
@@ -15,25 +22,18 @@ def shrink(string, limit):
     return result
 
 
-# pylint:disable=R0917
-def execute_function_with_logging(
-        logger: Logger,
-        level: str,
-        fn, args, kwargs,
-        class_name: str = '',
-        arg_length_limit: int = 100,
-        log_message_limit: int = 200,
-):
-    if not level:
-        level = logging.getLevelName(logger.level)
-    logger_method_name = level.lower()
-    logger_method = getattr(logger, logger_method_name)
+def get_level_number(level: str | int | None) -> int | None:
+    """Numeric level by its name (None - level of logger)."""
+    if level is None or isinstance(level, int):
+        return level
+    return logging.getLevelName(level.upper())
+
+
+def call_repr(function_name, args, kwargs, arg_length_limit) -> str:
+    """Signature of a call (one line)."""
     signature_elements = []
-    args_for_logging = list(args)
-    if class_name:
-        args_for_logging.pop(0)
-    if args_for_logging:
-        shrunk = [shrink(repr(_), arg_length_limit) for _ in args_for_logging]
+    if args:
+        shrunk = [shrink(repr(_), arg_length_limit) for _ in args]
         args_repr = ', '.join(shrunk).replace('\n', ' ')
         signature_elements.append(args_repr)
     if kwargs:
@@ -42,30 +42,92 @@ def execute_function_with_logging(
         kwargs_repr = ', '.join(as_list)
         signature_elements.append(kwargs_repr)
     method_signature = '(' + ', '.join(signature_elements) + ')'
+    return (function_name + method_signature).replace('\n', ' ')
+
+
+def result_repr(result, log_message_limit) -> str:
+    """Result of a call (one line)."""
+    return shrink(repr(result), log_message_limit).replace('\n', ' ')
+
+
+def call_nested(fn, args, kwargs):
+    """Call function one level deeper than the caller."""
+    token = call_depth.set(call_depth.get() + 1)
+    try:
+        return fn(*args, **kwargs)
+    finally:
+        call_depth.reset(token)
+
+
+# pylint:disable=R0917,R0913
+def execute_function_with_logging(
+        logger: Logger,
+        level: str | int | None,
+        fn, args, kwargs,
+        class_name: str = '',
+        arg_length_limit: int = 100,
+        log_message_limit: int = 200,
+        sample_rate: float = 1.0,
+        with_timing: bool = False,
+):
+    """Call function between two log records (before and after).
+
+    Nothing is formatted if level is disabled for logger or if call is
+    not sampled (`sample_rate` is a share of logged calls).
+    """
+    levelno = get_level_number(level)
+    if levelno is None:
+        levelno = logger.getEffectiveLevel()
+    if not logger.isEnabledFor(levelno) or (
+            sample_rate < 1 and random.random() >= sample_rate):
+        return call_nested(fn, args, kwargs)
+
+    args_for_logging = args[1:] if class_name else args
     method_name = fn.__name__ if hasattr(fn, '__name__') else ''
     if class_name:
         method_name = class_name + '.' + method_name
-    function_repr = method_name + method_signature
+    # rendered right away: handlers may format records later (in other
+    # threads), when arguments may be changed already
+    logger.log(levelno, '%s starts ...',
+               call_repr(method_name, args_for_logging, kwargs,
+                         arg_length_limit))
 
-    message_before = f'{function_repr} starts ...'.replace('\n', ' ')
-    logger_method(message_before)
+    if not with_timing:
+        result = call_nested(fn, args, kwargs)
+        logger.log(levelno, '%s ➞ %s',
+                   method_name, result_repr(result, log_message_limit))
+        return result
 
-    result = fn(*args, **kwargs)
-    result_for_log = shrink(repr(result), log_message_limit)
-    message_after = f'{method_name} ➞ {result_for_log}'.replace(
-        '\n', ' ')
-    logger_method(message_after)
+    started_at = time.perf_counter()
+    result = call_nested(fn, args, kwargs)
+    duration_ms = (time.perf_counter() - started_at) * 1000
+    logger.log(levelno, '%s ➞ %s (in %.3f ms)',
+               method_name, result_repr(result, log_message_limit),
+               duration_ms)
     return result
 
 
-def logged(func=None, *, logger: logging.Logger, level: str = None):
-    """Add two log records: before calling a function and after execution"""
+# pylint:disable=R0917
+def logged(
+        func=None, *,
+        logger: logging.Logger,
+        level: str = None,
+        sample_rate: float = 1.0,
+        with_timing: bool = False,
+):
+    """Add two log records: before calling a function and after execution
+
+    `sample_rate` - share of calls to be logged (1.0 - every call),
+    `with_timing` - add duration of call to the record after execution.
+    """
+    levelno = get_level_number(level)
 
     def log_decorator(fn):
         @functools.wraps(fn)
         def wrapper(*args, **kwargs):
             result = execute_function_with_logging(
-                logger, level, fn, args, kwargs)
+                logger, levelno, fn, args, kwargs,
+                sample_rate=sample_rate, with_timing=with_timing)
             return result
         return wrapper
     if func:
@@ -74,17 +136,27 @@ def logged(func=None, *, logger: logging.Logger, level: str = None):
         return log_decorator
 
 
-def logged_method(func=None, *, logger: logging.Logger, level: str = None):
-    """Add two log records: before calling a function and after execution"""
+# pylint:disable=R0917
+def logged_method(
+        func=None, *,
+        logger: logging.Logger,
+        level: str = None,
+        sample_rate: float = 1.0,
+        with_timing: bool = False,
+):
+    """Add two log records: before calling a function and after execution
+
+    The same as `logged`, but name of class is added to name of method.
+    """
+    levelno = get_level_number(level)
 
     def log_decorator(fn):
         @functools.wraps(fn)
         def wrapper(*args, **kwargs):
-            args_without_self = list(args)
-            class_instance = args_without_self.pop(0)
-            class_name = type(class_instance).__name__
+            class_name = type(args[0]).__name__
             result = execute_function_with_logging(
-                logger, level, fn, args, kwargs, class_name=class_name)
+                logger, levelno, fn, args, kwargs, class_name=class_name,
+                sample_rate=sample_rate, with_timing=with_timing)
             return result
         return wrapper
     if func:
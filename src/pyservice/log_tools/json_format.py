@@ -0,0 +1,81 @@
+"""Log records as JSON objects (one per line).
+
+Static fields (like app and microservice) are serialized once, when the
+formatter is created, and are glued to every record as a ready string.
+orjson is used if it is installed.
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+from datetime import datetime as dt
+from datetime import timezone
+from logging import LogRecord
+from pathlib import Path
+from typing import Iterator
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None
+
+
+TEXT = 'text'
+JSON = 'json'
+LOG_FORMATS = (TEXT, JSON)
+
+
+def dumps(value: dict) -> str:
+    if orjson is not None:
+        return orjson.dumps(value, default=str).decode('utf-8')
+    return json.dumps(value, default=str, ensure_ascii=False)
+
+
+def loads(line: str | bytes) -> dict:
+    if orjson is not None:
+        return orjson.loads(line)
+    return json.loads(line)
+
+
+class JsonFormatter(logging.Formatter):
+    """Format record as a single line JSON object."""
+
+    def __init__(self, static_fields: dict | None = None):
+        super().__init__()
+        static_fields = dict(static_fields or {})
+        # '"app":"...","microservice":"..."' without braces
+        self._static = dumps(static_fields)[1:-1] if static_fields else ''
+
+    def format(self, record: LogRecord) -> str:
+        fields = {
+            'ts': dt.fromtimestamp(record.created, tz=timezone.utc)
+            .isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+        depth = getattr(record, 'call_depth', 0)
+        if depth:
+            fields['depth'] = depth
+        log_props = getattr(record, 'log_props', None)
+        if log_props:
+            fields['props'] = log_props
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            fields['exception'] = record.exc_text
+        if record.stack_info:
+            fields['stack'] = self.formatStack(record.stack_info)
+        serialized = dumps(fields)
+        if not self._static:
+            return serialized
+        return '{' + self._static + ',' + serialized[1:]
+
+
+def iter_json_records(path: Path) -> Iterator[dict]:
+    """Records of JSON log file from the first to the last (streaming)."""
+    with open(path, 'rb') as f:
+        for line in f:
+            if line.strip():
+                yield loads(line)
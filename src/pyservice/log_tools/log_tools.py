@@ -1,12 +1,27 @@
 """Tool for loggers."""
-import inspect
 from logging import StreamHandler, FileHandler, Logger, getLogger, Formatter
 import logging
 from pathlib import Path
+from typing import Iterator
 
 import seqlog
 from seqlog.structured_logging import SeqLogHandler
 
+from pyservice.log_tools import queued
+from pyservice.log_tools.decorators import call_depth
+from pyservice.log_tools.json_format import (
+    JSON, LOG_FORMATS, JsonFormatter, iter_json_records
+)
+from pyservice.log_tools.rotation import (
+    NO_ROTATION, LogRotation, RotatingLogFileHandler, tail
+)
+from pyservice.log_tools.seq_shipping import BoundedSeqHandler
+
+
+TEXT_LOG_FORMAT = '%(asctime)s %(name)-20s - %(levelname)-5s - %(message)s'
+INDENTED_TEXT_LOG_FORMAT = \
+    '%(asctime)s %(name)-20s - %(levelname)-5s - %(indent)s%(message)s'
+
 
 class CustomizedSeqHandler(SeqLogHandler):
     """Tuned SeqLogHandler."""
@@ -30,7 +45,26 @@ class CustomizedSeqHandler(SeqLogHandler):
         super().emit(record)
 
 
+SEQ_HANDLER_TYPES = (CustomizedSeqHandler, BoundedSeqHandler)
+
+
+def is_queued(logger: Logger) -> bool:
+    """Whether log files of logger are written by queue listener."""
+    return any(isinstance(_, queued.LightQueueHandler)
+               for _ in logger.handlers)
+
+
+def flush_logger(logger: Logger, timeout: float = 10) -> bool:
+    if is_queued(logger):
+        return queued.get_listener().flush(timeout)
+    for handler in logger.handlers:
+        handler.flush()
+    return True
+
+
 def get_file_of_logger(logger: Logger) -> Path:
+    if is_queued(logger):
+        return queued.get_listener().get_log_file(logger.name)
     log_file = next(filter(
         lambda h: isinstance(h, FileHandler),
         logger.handlers)).baseFilename
@@ -38,6 +72,7 @@ def get_file_of_logger(logger: Logger) -> Path:
 
 
 def clean_file_for_logger(logger: Logger) -> Path:
+    flush_logger(logger)
     log_file = get_file_of_logger(logger)
     with open(log_file, 'w', encoding='utf-8') as f:
         f.write('')
@@ -53,17 +88,37 @@ def remove_all_stream_handlers(logger: Logger):
 
 
 def get_content_of_log_file_of_logger(logger: Logger) -> str:
+    flush_logger(logger)
     log_file = get_file_of_logger(logger)
     with open(log_file, 'r', encoding='utf-8') as f:
         return f.read()
 
 
+def get_json_records_of_logger(logger: Logger) -> Iterator[dict]:
+    """Records of logger with 'json' log format (streaming)."""
+    flush_logger(logger)
+    return iter_json_records(get_file_of_logger(logger))
+
+
+def get_last_records_of_logger(logger: Logger, records: int = 10
+                               ) -> list[str]:
+    """The last records of log file (without reading the whole file)."""
+    flush_logger(logger)
+    return tail(get_file_of_logger(logger), records)
+
+
 def get_logger_for_pyfile(
         pyfile: str | Path,
         directory_for_logs: Path,
         with_path: bool = False,
         erase: bool = True,
         seq_params: dict = None,
+        *,
+        queued_files: bool = False,
+        rotation: LogRotation | None = None,
+        log_format: str = 'text',
+        static_fields: dict = None,
+        indented: bool = False,
 ) -> Logger:
     pyfile = Path(pyfile)
     stem = pyfile.stem
@@ -75,6 +130,11 @@ def get_logger_for_pyfile(
         directory_for_logs=directory_for_logs,
         erase=erase,
         seq_params=seq_params,
+        queued_files=queued_files,
+        rotation=rotation,
+        log_format=log_format,
+        static_fields=static_fields,
+        indented=indented,
     )
     logger.debug('Logger for %s: %s', pyfile, logger)
     return logger
@@ -86,20 +146,35 @@ def add_seq_handler_to_logger(
         api_key: str,
         level: str = 'DEBUG',
         extra_field: dict = None,
+        *,
+        shipping: dict = None,
 ):
+    """Add handler sending records to SEQ.
+
+    With `shipping` (options of seq_shipping.SeqShipper) records are sent
+    through the bounded shipper, otherwise by seqlog handler.
+    """
     # pylint:disable=C0123
     current_seq_handlers = [_ for _ in logger.handlers
-                            if type(_) == CustomizedSeqHandler]
+                            if type(_) in SEQ_HANDLER_TYPES]
 
     assert len(current_seq_handlers) <= 1
     if len(current_seq_handlers) == 1:
         return
 
-    seq_handler = CustomizedSeqHandler(
-        server_url=url,
-        api_key=api_key,
-        level=level,
-    )
+    if shipping is not None:
+        seq_handler = BoundedSeqHandler(
+            server_url=url,
+            api_key=api_key,
+            level=level,
+            **shipping,
+        )
+    else:
+        seq_handler = CustomizedSeqHandler(
+            server_url=url,
+            api_key=api_key,
+            level=level,
+        )
     logger.addHandler(seq_handler)
     if extra_field:
         class ContextFilter(logging.Filter):
@@ -115,41 +190,65 @@ def add_seq_handler_to_logger(
 
 
 def indented_decorator(func):
+    """Prefix message with '=' per level of nested logged calls."""
 
     def wrapper(*args, **kwargs):
         if args and isinstance(args[0], str):
-            frames = inspect.getouterframes(inspect.currentframe())
-            filtered = [frame for frame in frames if 'src' in frame.filename]
-            levels = len(filtered)
-            indent = levels * '='
-
-            args_as_list = list(args)
-            msg = f'{indent}{args[0]}'
-            args_as_list[0] = msg
-            args = tuple(args_as_list)
+            indent = call_depth.get() * '='
+            args = (f'{indent}{args[0]}', *args[1:])
         func(*args, **kwargs)
     return wrapper
 
 
-def get_logger(
-        log_name: str,
-        directory_for_logs: Path,
-        erase: bool = True,
-        seq_params: dict = None,
-) -> Logger:
-    log = getLogger(log_name)
-    # if indented:
-    #     log.debug = indented_decorator(log.debug)
-    log_file = directory_for_logs / f'{log_name}.log'
-    error_log_file = directory_for_logs / 'errors.log'
-    log_files = [log_file, error_log_file]
+class CallDepthFilter(logging.Filter):
+    """Add depth of nested logged calls to records.
 
-    if erase and log_file.is_file():
-        with open(log_file, 'w', encoding='utf-8') as f:
-            f.write('')
-    # pylint:disable=C0123
-    current_file_handlers = [_ for _ in log.handlers if type(_) == FileHandler]
-    orphans = []
+    The depth is taken from a context variable maintained by logged and
+    logged_method, so it costs nearly nothing (unlike inspecting frames).
+    """
+
+    def __init__(self, indent: str = '  '):
+        super().__init__()
+        self.indent = indent
+
+    def filter(self, record):
+        depth = call_depth.get()
+        record.call_depth = depth
+        record.indent = self.indent * depth
+        return True
+
+
+def _set_call_depth_filter(log: Logger, indented: bool):
+    current = [_ for _ in log.filters if isinstance(_, CallDepthFilter)]
+    if indented and not current:
+        log.addFilter(CallDepthFilter())
+    if not indented:
+        for depth_filter in current:
+            log.removeFilter(depth_filter)
+
+
+def _create_file_handler(
+        log_file: Path,
+        log_rotation: LogRotation | None,
+) -> FileHandler:
+    if log_rotation and log_rotation.is_limited:
+        return RotatingLogFileHandler(log_file, log_rotation)
+    return FileHandler(log_file)
+
+
+def _set_file_handlers(
+        log: Logger,
+        log_file: Path,
+        error_log_file: Path,
+        formatter: Formatter,
+        log_rotation: LogRotation | None = None,
+):
+    """Own FileHandler for every log file of logger."""
+    log_files = [log_file, error_log_file]
+    current_file_handlers = [_ for _ in log.handlers
+                             if isinstance(_, FileHandler)]
+    orphans = [_ for _ in log.handlers
+               if isinstance(_, queued.LightQueueHandler)]
     for handler in current_file_handlers:
         handler: FileHandler
         current_file = Path(handler.baseFilename)
@@ -159,15 +258,15 @@ def get_logger(
         log.removeHandler(orphan)
 
     file_handlers: list[FileHandler] = \
-        [_ for _ in log.handlers if type(_) == FileHandler]
+        [_ for _ in log.handlers if isinstance(_, FileHandler)]
     current_files = [Path(_.baseFilename) for _ in file_handlers]
+    for file_handler in file_handlers:
+        # format may be changed since handler has been created
+        file_handler.setFormatter(formatter)
 
     for f in log_files:
         if f not in current_files:
-            file_handler = FileHandler(f)
-            formatter = Formatter(
-                '%(asctime)s %(name)-20s - %(levelname)-5s - %(message)s'
-            )
+            file_handler = _create_file_handler(f, log_rotation)
             file_handler.setFormatter(formatter)
             if f == error_log_file:
                 file_handler.setLevel('ERROR')
@@ -175,16 +274,94 @@ def get_logger(
                 file_handler.setLevel('DEBUG')
             log.addHandler(file_handler)
 
+
+def _set_queued_file_handler(
+        log: Logger,
+        log_file: Path,
+        error_log_file: Path,
+        formatter: Formatter,
+        log_rotation: LogRotation | None = None,
+):
+    """The handler of queue shared by all loggers of process."""
+    listener = queued.get_listener()
+    listener.register(
+        log_name=log.name,
+        log_file=log_file,
+        error_log_file=error_log_file,
+        formatter=formatter,
+        rotation=log_rotation or NO_ROTATION,
+    )
+    for handler in [_ for _ in log.handlers if isinstance(_, FileHandler)]:
+        log.removeHandler(handler)
+        handler.close()
+    if listener.handler not in log.handlers:
+        log.addHandler(listener.handler)
+
+
+def get_logger(
+        log_name: str,
+        directory_for_logs: Path,
+        erase: bool = True,
+        seq_params: dict = None,
+        *,
+        queued_files: bool = False,
+        rotation: LogRotation | None = None,
+        log_format: str = 'text',
+        static_fields: dict = None,
+        indented: bool = False,
+) -> Logger:
+    """Logger writing to own file and to errors.log (and to SEQ).
+
+    With `queued_files` log files are written by a single background
+    thread of process instead of a FileHandler per file in caller thread.
+    With `rotation` log files are rotated by size and age.
+    With `log_format` 'json' every record is a JSON line including
+    `static_fields` (global properties of SEQ by default).
+    With `indented` records of nested logged calls are indented.
+    """
+    if log_format not in LOG_FORMATS:
+        raise ValueError(f'unknown log format: {log_format}')
+    log = getLogger(log_name)
+    _set_call_depth_filter(log, indented)
+    log_file = directory_for_logs / f'{log_name}.log'
+    error_log_file = directory_for_logs / 'errors.log'
+
+    if erase and log_file.is_file():
+        if queued_files:
+            queued.get_listener().flush()
+        with open(log_file, 'w', encoding='utf-8') as f:
+            f.write('')
+
+    if log_format == JSON:
+        if static_fields is None and seq_params:
+            static_fields = seq_params.get('global_properties')
+        formatter = JsonFormatter(static_fields)
+    elif indented:
+        formatter = Formatter(INDENTED_TEXT_LOG_FORMAT,
+                              defaults={'indent': ''})
+    else:
+        formatter = Formatter(TEXT_LOG_FORMAT)
+
+    if queued_files:
+        _set_queued_file_handler(
+            log, log_file, error_log_file, formatter, rotation)
+    else:
+        _set_file_handlers(
+            log, log_file, error_log_file, formatter, rotation)
+
     remove_all_stream_handlers(log)
 
-    seq_handlers = [_ for _ in log.handlers if type(_) == CustomizedSeqHandler]
+    # pylint:disable=C0123
+    seq_handlers = [_ for _ in log.handlers if type(_) in SEQ_HANDLER_TYPES]
     assert len(seq_handlers) <= 1
 
-    desired_number_of_handlers = 3 if seq_handlers else 2
+    desired_number_of_handlers = 1 if queued_files else 2
+    if seq_handlers:
+        desired_number_of_handlers += 1
 
     if len(log.handlers) != desired_number_of_handlers:
-        raise RuntimeError(f'number of handlers for {log_name} is not 2: '
-                           f'{log.handlers}')
+        raise RuntimeError(f'number of handlers for {log_name} is not '
+                           f'{desired_number_of_handlers}: {log.handlers}')
     log.setLevel('DEBUG')
 
     if seq_params and not seq_handlers:
@@ -195,6 +372,7 @@ def get_logger(
             seq_params['api_key'],
             seq_params.get('level', 'DEBUG'),
             seq_params.get('extra_field'),
+            shipping=seq_params.get('shipping'),
         )
 
     log.propagate = False
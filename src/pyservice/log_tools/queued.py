@@ -0,0 +1,218 @@
+"""Writing of log files by a single background thread.
+
+Loggers in queued mode share one QueueHandler. Records are written by a
+listener thread which groups them by file and writes every group at once.
+Each log file (including shared errors.log) has a single open handle.
+"""
+
+from __future__ import annotations
+
+import atexit
+import copy
+import logging
+import os
+import queue
+import threading
+import time
+from logging import Formatter, LogRecord
+from logging.handlers import QueueHandler
+from pathlib import Path
+
+from pyservice.log_tools.rotation import LogRotation, RotatingFile
+from pyservice.log_tools.rotation import NO_ROTATION
+
+
+class LightQueueHandler(QueueHandler):
+    """Put records to queue without formatting them in caller thread.
+
+    Only the message is rendered (arguments may be changed after logging),
+    the rest of formatting is done by listener.
+    """
+
+    def handle(self, record: LogRecord) -> bool:
+        # queue is thread-safe, so lock of handler is not needed
+        is_passed = self.filter(record)
+        if is_passed:
+            self.emit(record)
+        return is_passed
+
+    def prepare(self, record: LogRecord) -> LogRecord:
+        # other handlers of logger get the record unchanged
+        message = record.getMessage()
+        record = copy.copy(record)
+        record.msg = message
+        record.args = None
+        return record
+
+
+class _Route:
+    __slots__ = ('log_file', 'error_log_file', 'formatter', 'rotation')
+
+    def __init__(self, log_file: Path, error_log_file: Path,
+                 formatter: Formatter, rotation: LogRotation):
+        self.log_file = log_file
+        self.error_log_file = error_log_file
+        self.formatter = formatter
+        self.rotation = rotation
+
+
+class BatchingFileListener:
+    """Write queued records to their log files in batches.
+
+    A batch is written when it has `max_batch_size` records or when
+    `flush_interval` seconds passed since its first record.
+    """
+
+    def __init__(self, max_batch_size: int = 1000,
+                 flush_interval: float = 0.2):
+        self.max_batch_size = max_batch_size
+        self.flush_interval = flush_interval
+        self.queue: queue.SimpleQueue = queue.SimpleQueue()
+        self.handler = LightQueueHandler(self.queue)
+        self._routes: dict[str, _Route] = {}
+        self._files: dict[Path, RotatingFile] = {}
+        self._lock = threading.Lock()
+        self._thread: threading.Thread | None = None
+
+    def register(
+            self,
+            log_name: str,
+            log_file: Path,
+            error_log_file: Path,
+            formatter: Formatter,
+            rotation: LogRotation = NO_ROTATION,
+    ):
+        self._routes[log_name] = _Route(
+            log_file, error_log_file, formatter, rotation)
+        self.start()
+
+    def get_log_file(self, log_name: str) -> Path | None:
+        route = self._find_route(log_name)
+        return route.log_file if route else None
+
+    def _find_route(self, log_name: str) -> _Route | None:
+        # records of child loggers go to the file of the nearest parent
+        name = log_name
+        while name:
+            route = self._routes.get(name)
+            if route:
+                return route
+            name = name.rpartition('.')[0]
+        return None
+
+    def start(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(
+                    target=self._run, name='log-files-writer', daemon=True)
+                self._thread.start()
+
+    def reset_after_fork(self):
+        """New queue and writer thread in a forked child process.
+
+        The writer thread of parent does not exist in child, records put
+        to the inherited queue would never be written.
+        """
+        self.queue = queue.SimpleQueue()
+        self.handler.queue = self.queue
+        self._lock = threading.Lock()
+        # files of parent are flushed after every write, they are left to
+        # parent (their locks may be held by its writer thread)
+        self._files = {}
+        self._thread = None
+        if self._routes:
+            self.start()
+
+    def _get_file(self, path: Path, rotation: LogRotation) -> RotatingFile:
+        f = self._files.get(path)
+        if f is None:
+            f = RotatingFile(path, rotation)
+            self._files[path] = f
+        return f
+
+    def _write(self, records: list[LogRecord]):
+        chunks: dict[Path, list[str]] = {}
+        rotations: dict[Path, LogRotation] = {}
+        for record in records:
+            route = self._find_route(record.name)
+            if route is None:
+                continue
+            line = route.formatter.format(record) + '\n'
+            chunks.setdefault(route.log_file, []).append(line)
+            rotations[route.log_file] = route.rotation
+            if record.levelno >= logging.ERROR:
+                chunks.setdefault(route.error_log_file, []).append(line)
+                rotations[route.error_log_file] = route.rotation
+        for path, lines in chunks.items():
+            try:
+                f = self._get_file(path, rotations[path])
+                f.write_lines(lines)
+            except OSError:
+                self._files.pop(path, None)
+                self.handler.handleError(records[-1])
+
+    def _run(self):
+        stopped = False
+        while not stopped:
+            item = self.queue.get()
+            batch, waiters = [], []
+            deadline = time.monotonic() + self.flush_interval
+            while True:
+                if item is None:
+                    stopped = True
+                elif isinstance(item, threading.Event):
+                    waiters.append(item)
+                else:
+                    batch.append(item)
+                remaining = deadline - time.monotonic()
+                if (stopped or waiters or remaining <= 0
+                        or len(batch) >= self.max_batch_size):
+                    break
+                try:
+                    item = self.queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+            self._write(batch)
+            for waiter in waiters:
+                waiter.set()
+        for f in self._files.values():
+            f.close()
+        self._files.clear()
+
+    def flush(self, timeout: float = 10) -> bool:
+        """Wait until all records queued before the call are written."""
+        if self._thread is None or not self._thread.is_alive():
+            return self.queue.empty()
+        written = threading.Event()
+        self.queue.put(written)
+        return written.wait(timeout)
+
+    def stop(self, timeout: float = 10):
+        if self._thread is not None and self._thread.is_alive():
+            self.queue.put(None)
+            self._thread.join(timeout)
+
+
+_listener: BatchingFileListener | None = None
+_listener_lock = threading.Lock()
+
+
+def get_listener() -> BatchingFileListener:
+    """Listener of the process (created on the first call)."""
+    global _listener  # pylint: disable=W0603
+    with _listener_lock:
+        if _listener is None:
+            _listener = BatchingFileListener()
+            atexit.register(_listener.stop)
+        return _listener
+
+
+def _reset_after_fork():
+    global _listener_lock  # pylint: disable=W0603
+    _listener_lock = threading.Lock()
+    if _listener is not None:
+        _listener.reset_after_fork()
+
+
+# like celery prefork workers, children keep logging to their files
+os.register_at_fork(after_in_child=_reset_after_fork)
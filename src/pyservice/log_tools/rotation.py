@@ -0,0 +1,273 @@
+"""Rotation of log files and reading of their last records.
+
+A log file is rotated when it reaches `max_bytes` or when it is older
+than `interval` seconds: `name.log` becomes `name.log.1` (`.1.gz` if
+compressed), older segments are shifted and only `backups` of them are
+kept. Besides, rotated segments of the whole directory are removed from
+the oldest one (on every rotation) while all files of directory take
+more than `max_directory_bytes`.
+"""
+
+from __future__ import annotations
+
+import dataclasses
+import gzip
+import os
+import re
+import shutil
+import threading
+import time
+from collections import deque
+from logging import FileHandler, LogRecord
+from pathlib import Path
+from typing import BinaryIO, Iterator
+
+
+@dataclasses.dataclass(frozen=True, slots=True)
+class LogRotation:
+    """Limits of log files (zero - no limit)."""
+
+    max_bytes: int = 0
+    interval: float = 0
+    backups: int = 5
+    compress: bool = False
+    max_directory_bytes: int = 0
+
+    @property
+    def is_limited(self) -> bool:
+        return bool(self.max_bytes or self.interval
+                    or self.max_directory_bytes)
+
+
+NO_ROTATION = LogRotation()
+
+
+def rotated_segment(path: Path, number: int, compress: bool) -> Path:
+    suffix = f'.{number}.gz' if compress else f'.{number}'
+    return path.with_name(path.name + suffix)
+
+
+def rotated_segments(directory: Path) -> list[Path]:
+    """Rotated segments of all log files of directory."""
+    pattern = re.compile(r'\.log\.\d+(\.gz)?$')
+    return [_ for _ in directory.iterdir()
+            if _.is_file() and pattern.search(_.name)]
+
+
+def _compress(path: Path, target: Path):
+    with open(path, 'rb') as source, gzip.open(target, 'wb') as gz:
+        shutil.copyfileobj(source, gz, 1024 * 1024)
+    os.unlink(path)
+
+
+def enforce_directory_cap(directory: Path, max_bytes: int):
+    """Remove the oldest rotated segments while directory is too big."""
+    if not max_bytes:
+        return
+    with os.scandir(directory) as entries:
+        total = sum(_.stat().st_size for _ in entries if _.is_file())
+    if total <= max_bytes:
+        return
+    segments = sorted(rotated_segments(directory),
+                      key=lambda _: _.stat().st_mtime)
+    for segment in segments:
+        if total <= max_bytes:
+            break
+        size = segment.stat().st_size
+        segment.unlink(missing_ok=True)
+        total -= size
+
+
+class RotatingFile:
+    """Append-only log file rotated by size and age."""
+
+    def __init__(self, path: Path, rotation: LogRotation = NO_ROTATION):
+        self.path = Path(path)
+        self.rotation = rotation
+        self._lock = threading.Lock()
+        self._file: BinaryIO | None = None
+        self._size = 0
+        self._rollover_at = 0.0
+
+    def _open(self) -> BinaryIO:
+        if self._file is None:
+            # pylint:disable=R1732
+            self._file = open(self.path, 'ab')
+            self._size = self._file.tell()
+            if self.rotation.interval:
+                self._rollover_at = time.time() + self.rotation.interval
+        return self._file
+
+    def _should_rotate(self, incoming: int) -> bool:
+        rotation = self.rotation
+        if rotation.interval and time.time() >= self._rollover_at:
+            return self._size > 0
+        if rotation.max_bytes and self._size + incoming > rotation.max_bytes:
+            # file may be truncated by somebody else (see erase option)
+            self._size = os.fstat(self._file.fileno()).st_size
+            return 0 < self._size and \
+                self._size + incoming > rotation.max_bytes
+        return False
+
+    def write(self, text: str):
+        data = text.encode('utf-8')
+        with self._lock:
+            f = self._open()
+            if self.rotation.is_limited and self._should_rotate(len(data)):
+                self._rotate()
+                f = self._open()
+            f.write(data)
+            f.flush()
+            self._size += len(data)
+
+    def write_lines(self, lines: list[str]):
+        """Write many lines at once (file is rotated between them)."""
+        if not self.rotation.max_bytes:
+            self.write(''.join(lines))
+            return
+        chunk, size = [], 0
+        for line in lines:
+            if chunk and size + len(line) > self.rotation.max_bytes:
+                self.write(''.join(chunk))
+                chunk, size = [], 0
+            chunk.append(line)
+            size += len(line)
+        if chunk:
+            self.write(''.join(chunk))
+
+    def rotate(self):
+        """Move current file to the first segment and shift older ones."""
+        with self._lock:
+            self._rotate()
+
+    def _rotate(self):
+        self._close()
+        rotation = self.rotation
+        compress = rotation.compress
+        if rotation.backups > 0:
+            rotated_segment(self.path, rotation.backups, compress) \
+                .unlink(missing_ok=True)
+            for number in range(rotation.backups - 1, 0, -1):
+                segment = rotated_segment(self.path, number, compress)
+                if segment.exists():
+                    segment.rename(
+                        rotated_segment(self.path, number + 1, compress))
+            first = rotated_segment(self.path, 1, compress)
+            if compress:
+                _compress(self.path, first)
+            else:
+                self.path.rename(first)
+        else:
+            self.path.unlink(missing_ok=True)
+        enforce_directory_cap(self.path.parent, rotation.max_directory_bytes)
+
+    def flush(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.flush()
+
+    def close(self):
+        """Close file (it is opened again by the next write)."""
+        with self._lock:
+            self._close()
+
+    def _close(self):
+        if self._file is not None:
+            self._file.close()
+        self._file = None
+
+
+_shared_files: dict[Path, RotatingFile] = {}
+_shared_files_lock = threading.Lock()
+
+
+def get_shared_file(path: Path, rotation: LogRotation) -> RotatingFile:
+    """Single RotatingFile for all handlers of path (like errors.log).
+
+    Otherwise a handler would keep writing to the segment rotated by
+    another handler.
+    """
+    path = Path(path).absolute()
+    with _shared_files_lock:
+        log_file = _shared_files.get(path)
+        if log_file is None:
+            log_file = RotatingFile(path, rotation)
+            _shared_files[path] = log_file
+        log_file.rotation = rotation
+        return log_file
+
+
+class RotatingLogFileHandler(FileHandler):
+    """FileHandler writing through shared RotatingFile."""
+
+    def __init__(self, filename: Path, rotation: LogRotation = NO_ROTATION):
+        super().__init__(filename, encoding='utf-8', delay=True)
+        self.log_file = get_shared_file(Path(self.baseFilename), rotation)
+
+    def emit(self, record: LogRecord):
+        try:
+            self.log_file.write(self.format(record) + self.terminator)
+        except Exception:  # pylint: disable=W0718
+            self.handleError(record)
+
+    def flush(self):
+        self.log_file.flush()
+
+    def close(self):
+        self.log_file.close()
+        super().close()
+
+
+# the first line of a record (see log_tools.TEXT_LOG_FORMAT or JSON line)
+RECORD_START = re.compile(r'^(\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2}|\{)')
+_RECORD_START_BYTES = re.compile(RECORD_START.pattern.encode())
+
+
+def _lines_backwards(path: Path, block_size: int) -> Iterator[bytes]:
+    with open(path, 'rb') as f:
+        position = f.seek(0, os.SEEK_END)
+        rest = b''
+        while position > 0:
+            step = min(block_size, position)
+            position -= step
+            f.seek(position)
+            lines = (f.read(step) + rest).split(b'\n')
+            rest = lines.pop(0)
+            yield from reversed(lines)
+        yield rest
+
+
+def tail(path: Path, records: int = 10,
+         block_size: int = 64 * 1024) -> list[str]:
+    """The last records of log file (read from the end by blocks).
+
+    Lines which do not start with a timestamp (like tracebacks) belong
+    to the record above them.
+    """
+    found: deque[str] = deque()
+    continuation: list[bytes] = []
+    for line in _lines_backwards(Path(path), block_size):
+        if not line and not continuation and not found:
+            continue
+        continuation.append(line)
+        if _RECORD_START_BYTES.match(line):
+            record = b'\n'.join(reversed(continuation))
+            found.appendleft(record.decode('utf-8', errors='replace'))
+            continuation = []
+            if len(found) >= records:
+                break
+    return list(found)
+
+
+def iter_records(path: Path) -> Iterator[str]:
+    """Records of log file from the first to the last (streaming)."""
+    current: list[str] = []
+    with open(path, 'r', encoding='utf-8', errors='replace') as f:
+        for line in f:
+            line = line.rstrip('\n')
+            if RECORD_START.match(line) and current:
+                yield '\n'.join(current)
+                current = []
+            current.append(line)
+    if current:
+        yield '\n'.join(current)
@@ -0,0 +1,402 @@
+"""Shipping of log records to SEQ with bounded memory.
+
+Handlers of all loggers with the same SEQ server share one shipper. Its
+buffer holds a limited number of serialized events, when it is full an
+overflow policy decides what to do. A single thread posts events in
+batches limited by size in bytes (optionally gzip-compressed) and backs
+off exponentially while SEQ is unavailable. With a spool directory,
+events which can not be sent are kept on disk (see seq_spool) and are
+replayed when SEQ is available again.
+"""
+
+from __future__ import annotations
+
+import atexit
+import collections
+import gzip
+import json
+import logging
+import threading
+import time
+from datetime import datetime as dt
+from datetime import timezone
+from logging import Formatter, LogRecord
+from pathlib import Path
+from typing import Callable
+
+import requests
+from seqlog.structured_logging import get_global_log_properties
+
+from pyservice.log_tools.seq_spool import SeqSpool
+
+
+# what to do with a new event when buffer is full
+DROP_OLDEST = 'drop_oldest'
+DROP_NEWEST = 'drop_newest'
+SPILL = 'spill'
+OVERFLOW_POLICIES = (DROP_OLDEST, DROP_NEWEST, SPILL)
+
+# receives serialized events which do not fit to buffer (or SEQ)
+Spill = Callable[[list[bytes]], None]
+
+
+def build_event(record: LogRecord, formatter: Formatter) -> dict:
+    """Event of SEQ raw format (the same as seqlog builds)."""
+    properties = get_global_log_properties(record.name or None)
+    if isinstance(record.args, tuple):
+        for index, arg in enumerate(record.args):
+            properties[str(index)] = arg
+    properties.update(getattr(record, 'log_props', None) or {})
+    event = {
+        'Timestamp': dt.fromtimestamp(
+            record.created, tz=timezone.utc).isoformat(),
+        'Level': logging.getLevelName(record.levelno),
+        'MessageTemplate': record.getMessage(),
+        'Properties': properties,
+    }
+    if record.exc_info and not record.exc_text:
+        record.exc_text = formatter.formatException(record.exc_info)
+    if record.exc_text:
+        event['Exception'] = record.exc_text
+    return event
+
+
+def serialize_event(event: dict) -> bytes:
+    return json.dumps(event, default=str, ensure_ascii=False).encode('utf-8')
+
+
+def batch_body(events: list[bytes]) -> bytes:
+    return b'{"Events":[' + b','.join(events) + b']}'
+
+
+class SeqShipper:
+    """Bounded buffer of events and a thread posting them to SEQ.
+
+    Counters: `queued` (in buffer now), `sent`, `dropped`, `spilled`
+    (events) and `failed` (unsuccessful posts).
+    """
+
+    # pylint:disable=R0913,R0902
+    def __init__(
+            self,
+            url: str,
+            api_key: str | None = None,
+            *,
+            capacity: int = 10000,
+            max_batch_bytes: int = 1024 * 1024,
+            flush_interval: float = 1.0,
+            compress: bool = True,
+            overflow: str = DROP_OLDEST,
+            spill: Spill | None = None,
+            max_backoff: float = 60.0,
+            timeout: float = 10.0,
+            spool_directory: Path | None = None,
+            spool_max_bytes: int = 256 * 1024 * 1024,
+    ):
+        if overflow not in OVERFLOW_POLICIES:
+            raise ValueError(f'unknown overflow policy: {overflow}')
+        self.endpoint = url.rstrip('/') + '/api/events/raw'
+        self.capacity = max(1, capacity)
+        self.max_batch_bytes = max_batch_bytes
+        self.flush_interval = flush_interval
+        self.compress = compress
+        self.overflow = overflow
+        self.spool = None
+        if spool_directory is not None:
+            self.spool = SeqSpool(spool_directory, max_bytes=spool_max_bytes)
+            spill = spill or self.spool.append
+        self.spill = spill
+        self.max_backoff = max_backoff
+        self.timeout = timeout
+
+        self._counters_lock = threading.Lock()
+        self.sent = 0
+        self.dropped = 0
+        self.spilled = 0
+        self.failed = 0
+
+        self.session = requests.Session()
+        self.session.headers['Content-Type'] = 'application/json'
+        if api_key:
+            self.session.headers['X-Seq-ApiKey'] = api_key
+        if compress:
+            self.session.headers['Content-Encoding'] = 'gzip'
+
+        self._buffer: collections.deque[bytes] = collections.deque()
+        self._buffered_bytes = 0
+        self._in_flight = 0
+        self._backoff = 0.0
+        self._flushing = False
+        self._stopped = False
+        self._condition = threading.Condition()
+        self._thread: threading.Thread | None = None
+
+    @property
+    def queued(self) -> int:
+        return len(self._buffer)
+
+    @property
+    def is_backing_off(self) -> bool:
+        """The last post failed (SEQ seems to be unavailable)."""
+        return self._backoff > 0
+
+    @property
+    def stats(self) -> dict:
+        return {
+            'queued': self.queued,
+            'sent': self.sent,
+            'dropped': self.dropped,
+            'spilled': self.spilled,
+            'failed': self.failed,
+            'spooled_bytes': self.spool.size if self.spool else 0,
+        }
+
+    def start(self):
+        with self._condition:
+            if self._thread is None or not self._thread.is_alive():
+                self._stopped = False
+                self._thread = threading.Thread(
+                    target=self._run, name='seq-shipper', daemon=True)
+                self._thread.start()
+
+    def put(self, event: bytes) -> bool:
+        """Add event to buffer (False if it has been dropped)."""
+        overflowed = None
+        with self._condition:
+            if len(self._buffer) >= self.capacity:
+                if self.overflow == DROP_NEWEST:
+                    self._count('dropped')
+                    return False
+                overflowed = self._buffer.popleft()
+                self._buffered_bytes -= len(overflowed)
+            self._buffer.append(event)
+            self._buffered_bytes += len(event)
+            if self._buffered_bytes >= self.max_batch_bytes:
+                self._condition.notify()
+        if overflowed is not None:
+            self._get_rid_of([overflowed])
+        return True
+
+    def _get_rid_of(self, events: list[bytes]):
+        """Spill events (if policy allows) or count them as dropped."""
+        if self.overflow == SPILL and self.spill is not None:
+            try:
+                self.spill(events)
+            except Exception:  # pylint: disable=W0718
+                logging.getLogger(__name__).debug(
+                    'can not spill %s events', len(events), exc_info=True)
+            else:
+                self._count('spilled', len(events))
+                return
+        self._count('dropped', len(events))
+
+    def _count(self, counter: str, number: int = 1):
+        # counters are updated by callers and by shipping thread
+        with self._counters_lock:
+            setattr(self, counter, getattr(self, counter) + number)
+
+    def _take_batch(self) -> list[bytes] | None:
+        """Wait for events and take a batch of them (None - stopped)."""
+        with self._condition:
+            deadline = time.monotonic() + self.flush_interval
+            while not self._stopped:
+                if self._buffer and (
+                        self._flushing
+                        or self._buffered_bytes >= self.max_batch_bytes):
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    if self._buffer or self._replay_is_due():
+                        break
+                    deadline = time.monotonic() + self.flush_interval
+                    remaining = self.flush_interval
+                self._condition.wait(remaining)
+            if self._stopped and not self._buffer:
+                return None
+            batch, size = [], 0
+            while self._buffer:
+                event_size = len(self._buffer[0]) + 1
+                if batch and size + event_size > self.max_batch_bytes:
+                    break
+                batch.append(self._buffer.popleft())
+                size += event_size
+            self._buffered_bytes -= size - len(batch)
+            self._in_flight = len(batch)
+            return batch
+
+    def _replay_is_due(self) -> bool:
+        return self.spool is not None and self.spool.size > 0
+
+    def post(self, events: list[bytes]) -> bool:
+        """Post events to SEQ (False if they should be sent again)."""
+        body = batch_body(events)
+        if self.compress:
+            body = gzip.compress(body, compresslevel=5)
+        try:
+            response = self.session.post(
+                self.endpoint, data=body, timeout=self.timeout)
+        except requests.RequestException:
+            return False
+        if response.status_code in (408, 429) \
+                or response.status_code >= 500:
+            return False
+        if response.status_code >= 400:
+            # SEQ rejected events, sending them again does not help
+            self._count('dropped', len(events))
+        else:
+            self._count('sent', len(events))
+        return True
+
+    def _return_to_buffer(self, batch: list[bytes]):
+        """Put not sent batch back before newer events (if they fit)."""
+        with self._condition:
+            free = self.capacity - len(self._buffer)
+            if self.overflow == DROP_NEWEST or free >= len(batch):
+                kept, rest = batch[:max(free, 0)], batch[max(free, 0):]
+            else:
+                oldest = len(batch) - free
+                kept, rest = batch[oldest:], batch[:oldest]
+            self._buffer.extendleft(reversed(kept))
+            self._buffered_bytes += sum(len(_) for _ in kept)
+        if rest:
+            self._get_rid_of(rest)
+
+    def _run(self):
+        while True:
+            batch = self._take_batch()
+            if batch is None:
+                break
+            delivered = self.post(batch) if batch else True
+            if not delivered:
+                if self.overflow == SPILL and self.spill is not None:
+                    self._get_rid_of(batch)
+                else:
+                    self._return_to_buffer(batch)
+            elif self.spool is not None and self.spool.size:
+                # SEQ is available, so it is time to send spooled events
+                delivered = self.spool.replay(
+                    self.post, self.max_batch_bytes)
+            if delivered:
+                self._backoff = 0.0
+            else:
+                self._count('failed')
+                self._backoff = min(
+                    self.max_backoff,
+                    max(self._backoff * 2, self.flush_interval))
+            with self._condition:
+                self._in_flight = 0
+                self._condition.notify_all()
+                if not delivered and not self._stopped:
+                    self._condition.wait(self._backoff)
+
+    def spill_buffered(self) -> int:
+        """Spill all buffered events if policy allows, return number."""
+        if self.overflow != SPILL or self.spill is None:
+            return 0
+        with self._condition:
+            events = list(self._buffer)
+            self._buffer.clear()
+            self._buffered_bytes = 0
+        if events:
+            self._get_rid_of(events)
+        return len(events)
+
+    def replay_soon(self):
+        """Stop backing off and send spooled events (SEQ is back)."""
+        with self._condition:
+            self._backoff = 0.0
+            self._condition.notify_all()
+
+    def flush(self, timeout: float = 10) -> bool:
+        """Send buffered events right now (True if all are sent)."""
+        if self._thread is None or not self._thread.is_alive():
+            return not self._buffer
+        with self._condition:
+            self._flushing = True
+            self._condition.notify_all()
+            try:
+                return self._condition.wait_for(
+                    lambda: not self._buffer and not self._in_flight,
+                    timeout,
+                )
+            finally:
+                self._flushing = False
+
+    def close(self, timeout: float = 10):
+        self.flush(timeout)
+        with self._condition:
+            self._stopped = True
+            self._condition.notify_all()
+        if self._thread is not None:
+            self._thread.join(timeout)
+        if self.spool is not None:
+            self.spool.close()
+        self.session.close()
+
+
+_shippers: dict[tuple[str, str | None], SeqShipper] = {}
+_shippers_lock = threading.Lock()
+
+
+def get_shipper(url: str, api_key: str | None = None,
+                **options) -> SeqShipper:
+    """Shipper of process for SEQ server (created on the first call)."""
+    key = (url.rstrip('/'), api_key)
+    with _shippers_lock:
+        shipper = _shippers.get(key)
+        if shipper is None:
+            shipper = SeqShipper(url, api_key, **options)
+            shipper.start()
+            atexit.register(shipper.close)
+            _shippers[key] = shipper
+        return shipper
+
+
+def replay_spools():
+    """Send spooled events of all shippers (when SEQ is back)."""
+    with _shippers_lock:
+        shippers = list(_shippers.values())
+    for shipper in shippers:
+        shipper.replay_soon()
+
+
+class BoundedSeqHandler(logging.Handler):
+    """Send records to SEQ through the shared bounded shipper."""
+
+    def __init__(
+            self,
+            server_url: str,
+            api_key: str | None = None,
+            level: str = 'DEBUG',
+            *,
+            flush_timeout: float = 1.0,
+            **shipping,
+    ):
+        super().__init__(level)
+        self.setFormatter(Formatter(style='{'))
+        self.flush_timeout = flush_timeout
+        self.shipper = get_shipper(server_url, api_key, **shipping)
+
+    def handle(self, record: LogRecord) -> bool:
+        # shipper is thread-safe, so lock of handler is not needed
+        is_passed = self.filter(record)
+        if is_passed:
+            self.emit(record)
+        return is_passed
+
+    def emit(self, record: LogRecord):
+        try:
+            event = serialize_event(build_event(record, self.formatter))
+        except Exception:  # pylint: disable=W0718
+            self.handleError(record)
+            return
+        self.shipper.put(event)
+
+    def flush(self):
+        # flushing of logger must not hang while SEQ is unavailable:
+        # events are spilled (by SPILL policy) or stay in buffer, where
+        # overflow policy applies to them
+        if self.shipper.is_backing_off:
+            self.shipper.spill_buffered()
+            return
+        self.shipper.flush(self.flush_timeout)
@@ -0,0 +1,259 @@
+"""Events for SEQ kept on disk while SEQ is unavailable.
+
+Events are appended to newline-delimited JSON segments. A segment is
+closed when it reaches `segment_bytes`, the oldest segments are removed
+when all of them take more than `max_bytes`. Replay sends segments in
+order of creation and removes every segment as soon as it is sent.
+
+Processes sharing a spool directory (like prefork workers) never touch
+segments of each other: every process writes to its own subdirectory
+locked by flock while the process lives (a forked child takes a new
+one). Subdirectories of finished processes are claimed (by taking their
+locks) and replayed by the others, `max_bytes` is a cap per process.
+"""
+
+from __future__ import annotations
+
+import fcntl
+import os
+import threading
+import time
+from pathlib import Path
+from typing import BinaryIO, Callable, Iterator
+
+
+SEGMENT_SUFFIX = '.ndjson'
+LOCK_FILE_NAME = 'lock'
+
+
+class SeqSpool:
+    """Append-only segment-rotated spool of serialized events."""
+
+    def __init__(
+            self,
+            directory: Path,
+            segment_bytes: int = 8 * 1024 * 1024,
+            max_bytes: int = 256 * 1024 * 1024,
+    ):
+        self.root = Path(directory)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.segment_bytes = segment_bytes
+        self.max_bytes = max_bytes
+        # events removed because of disk cap
+        self.discarded = 0
+        self._lock = threading.Lock()
+        self._current: BinaryIO | None = None
+        self._current_path: Path | None = None
+        self._sizes: dict[Path, int] = {}
+        # locked subdirectories (own and claimed ones) with lock files
+        self._claimed: dict[Path, BinaryIO] = {}
+        self._pid = 0
+        self.directory = self.root
+        self._next_number = 0
+        with self._lock:
+            self._take_own_directory()
+
+    def _take_own_directory(self):
+        """Start own subdirectory (in a new or forked process)."""
+        # locks and segment of parent process are its own
+        for f in self._claimed.values():
+            f.close()
+        if self._current is not None:
+            self._current.close()
+        self._current, self._current_path = None, None
+        self._claimed, self._sizes = {}, {}
+        self._pid = os.getpid()
+        name = f'{time.time_ns():020d}-{self._pid}'
+        # subdirectory is locked before it gets its name (a dot-name
+        # is never claimed), so others never see it unlocked
+        preparing = self.root / f'.{name}'
+        preparing.mkdir()
+        locked = _lock_directory(preparing, blocking=True)
+        self.directory = self.root / name
+        os.rename(preparing, self.directory)
+        self._claimed[self.directory] = locked
+        self._next_number = 0
+        self._claim_orphans()
+
+    def _ensure_own_directory(self):
+        if self._pid != os.getpid():
+            self._take_own_directory()
+
+    def _claim_orphans(self):
+        """Take subdirectories of finished processes with their segments."""
+        for directory in sorted(self.root.iterdir()):
+            if directory.name.startswith('.') or not directory.is_dir() \
+                    or directory in self._claimed:
+                continue
+            locked = _lock_directory(directory)
+            if locked is None:
+                continue
+            self._claimed[directory] = locked
+            for segment in directory.glob(f'*{SEGMENT_SUFFIX}'):
+                self._sizes[segment] = segment.stat().st_size
+
+    def _release_orphans(self, only_empty: bool):
+        for directory in list(self._claimed):
+            if directory == self.directory:
+                continue
+            if only_empty and any(
+                    _.parent == directory for _ in self._sizes):
+                continue
+            self._release(directory)
+
+    def _release(self, directory: Path):
+        """Unlock subdirectory (and remove it if it has no segments)."""
+        locked = self._claimed.pop(directory)
+        if not any(_.parent == directory for _ in self._sizes):
+            try:
+                os.unlink(directory / LOCK_FILE_NAME)
+                os.rmdir(directory)
+            except OSError:
+                pass
+        for segment in [_ for _ in self._sizes if _.parent == directory]:
+            del self._sizes[segment]
+        locked.close()
+
+    def segments(self) -> list[Path]:
+        """Segments (own and claimed) from the oldest to the newest."""
+        return sorted(self._sizes)
+
+    @property
+    def size(self) -> int:
+        return sum(self._sizes.values())
+
+    def _open_segment(self) -> BinaryIO:
+        if self._current is not None \
+                and self._sizes[self._current_path] < self.segment_bytes:
+            return self._current
+        self._close_segment()
+        path = self.directory / f'{self._next_number:012d}{SEGMENT_SUFFIX}'
+        self._next_number += 1
+        # pylint:disable=R1732
+        self._current = open(path, 'ab')
+        self._current_path = path
+        self._sizes[path] = 0
+        return self._current
+
+    def _close_segment(self):
+        if self._current is not None:
+            self._current.close()
+        self._current = None
+        self._current_path = None
+
+    def append(self, events: list[bytes]):
+        """Write events to the current segment."""
+        if not events:
+            return
+        data = b'\n'.join(events) + b'\n'
+        with self._lock:
+            self._ensure_own_directory()
+            f = self._open_segment()
+            f.write(data)
+            f.flush()
+            self._sizes[self._current_path] += len(data)
+            self._enforce_cap()
+
+    def _enforce_cap(self):
+        while self.size > self.max_bytes and len(self._sizes) > 1:
+            oldest = min(self._sizes)
+            if oldest == self._current_path:
+                self._close_segment()
+            with open(oldest, 'rb') as f:
+                self.discarded += sum(_.count(b'\n') for _ in _read_blocks(f))
+            self._remove(oldest)
+
+    def _remove(self, segment: Path):
+        self._sizes.pop(segment, None)
+        try:
+            os.unlink(segment)
+        except FileNotFoundError:
+            pass
+
+    def replay(
+            self,
+            post: Callable[[list[bytes]], bool],
+            max_batch_bytes: int = 1024 * 1024,
+    ) -> bool:
+        """Post spooled events in batches (True if all of them are sent).
+
+        Replay stops on the first failed batch, not sent rest of its
+        segment stays in the segment for the next replay. Events can be
+        appended meanwhile, they go to new segments.
+        """
+        with self._lock:
+            self._ensure_own_directory()
+            self._close_segment()
+            self._claim_orphans()
+            segments = sorted(self._sizes)
+        for segment in segments:
+            try:
+                events = _read_events(segment)
+            except FileNotFoundError:
+                # removed because of disk cap
+                continue
+            start = 0
+            for batch in _batches(events, max_batch_bytes):
+                if not post(batch):
+                    self._rewrite(segment, events[start:])
+                    return False
+                start += len(batch)
+            with self._lock:
+                self._remove(segment)
+        with self._lock:
+            self._release_orphans(only_empty=True)
+        return True
+
+    def _rewrite(self, segment: Path, events: list[bytes]):
+        with self._lock:
+            if segment not in self._sizes:
+                return
+            tmp = segment.with_suffix('.tmp')
+            data = b''.join(_ + b'\n' for _ in events)
+            tmp.write_bytes(data)
+            os.replace(tmp, segment)
+            self._sizes[segment] = len(data)
+
+    def close(self):
+        """Release subdirectories (the rest is replayed by others)."""
+        with self._lock:
+            if self._pid != os.getpid():
+                return
+            self._close_segment()
+            self._release_orphans(only_empty=False)
+            if self.directory in self._claimed:
+                self._release(self.directory)
+
+
+def _lock_directory(directory: Path,
+                    blocking: bool = False) -> BinaryIO | None:
+    """Locked lock file of directory (None if it is locked already)."""
+    # pylint:disable=R1732
+    f = open(directory / LOCK_FILE_NAME, 'a+b')
+    try:
+        fcntl.flock(f, fcntl.LOCK_EX | (0 if blocking else fcntl.LOCK_NB))
+    except BlockingIOError:
+        f.close()
+        return None
+    return f
+
+
+def _read_blocks(f: BinaryIO, size: int = 1024 * 1024) -> Iterator[bytes]:
+    while block := f.read(size):
+        yield block
+
+
+def _read_events(segment: Path) -> list[bytes]:
+    return [_ for _ in segment.read_bytes().split(b'\n') if _]
+
+
+def _batches(events: list[bytes], max_bytes: int) -> Iterator[list[bytes]]:
+    batch, size = [], 0
+    for event in events:
+        if batch and size + len(event) + 1 > max_bytes:
+            yield batch
+            batch, size = [], 0
+        batch.append(event)
+        size += len(event) + 1
+    if batch:
+        yield batch
@@ -0,0 +1,86 @@
+"""Cluster membership cached with TTL."""
+
+from __future__ import annotations
+
+import dataclasses
+import logging
+import threading
+import time
+from typing import Callable
+
+from pyservice.domain.cluster import Cluster
+
+
+log = logging.getLogger(__name__)
+
+
+@dataclasses.dataclass(frozen=True, slots=True)
+class ClusterSnapshot:
+    """Discovered cluster and the moment of discovery."""
+
+    cluster: Cluster
+    discovered_at: float
+
+    @property
+    def age(self) -> float:
+        return time.monotonic() - self.discovered_at
+
+
+class ClusterDiscovery:
+    """Keep the last discovered cluster and refresh it in background.
+
+    Readers get the cached cluster immediately. When it is older than
+    `ttl`, a single background thread discovers the cluster again.
+    """
+
+    def __init__(self, discover: Callable[[], Cluster], ttl: float = 60):
+        self.discover = discover
+        self.ttl = ttl
+        self._snapshot: ClusterSnapshot | None = None
+        self._refresh_lock = threading.Lock()
+        self._refreshing: threading.Thread | None = None
+
+    @property
+    def snapshot(self) -> ClusterSnapshot | None:
+        return self._snapshot
+
+    def refresh(self) -> ClusterSnapshot:
+        """Discover cluster right now (blocking)."""
+        cluster = self.discover()
+        snapshot = ClusterSnapshot(
+            cluster=cluster, discovered_at=time.monotonic())
+        self._snapshot = snapshot
+        return snapshot
+
+    def _refresh_quietly(self):
+        try:
+            self.refresh()
+        except Exception:  # pylint: disable=W0718
+            log.exception('can not refresh cluster in background')
+
+    def refresh_in_background(self) -> threading.Thread:
+        with self._refresh_lock:
+            if self._refreshing and self._refreshing.is_alive():
+                return self._refreshing
+            self._refreshing = threading.Thread(
+                target=self._refresh_quietly,
+                name='cluster-discovery',
+                daemon=True,
+            )
+            self._refreshing.start()
+            return self._refreshing
+
+    def get(self, block: bool = True) -> Cluster | None:
+        """Cached cluster (None if never discovered and not blocking)."""
+        snapshot = self._snapshot
+        if snapshot is None:
+            if block:
+                return self.refresh().cluster
+            self.refresh_in_background()
+            return None
+        if snapshot.age > self.ttl:
+            self.refresh_in_background()
+        return snapshot.cluster
+
+    def invalidate(self):
+        self._snapshot = None
@@ -0,0 +1,263 @@
+"""Checks of services which microservice depends on."""
+
+from __future__ import annotations
+
+import asyncio
+import dataclasses
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime as dt
+from datetime import timezone
+from typing import Awaitable, Callable
+
+import pika
+
+
+DependencyCheck = Callable[[], Awaitable]
+
+
+@dataclasses.dataclass(frozen=True, slots=True)
+class DependencyCheckResult:
+    """Result of checking a single dependency."""
+
+    name: str
+    is_ok: bool
+    latency: float
+    error: str | None = None
+
+    def __str__(self):
+        status = 'OK' if self.is_ok else f'FAILED ({self.error})'
+        return f'- {self.name}: {status} in {self.latency:.3f} sec.'
+
+
+@dataclasses.dataclass(frozen=True, slots=True)
+class DependenciesReport:
+    """Results of checking all dependencies."""
+
+    results: tuple[DependencyCheckResult, ...]
+    duration: float
+
+    @property
+    def is_ok(self) -> bool:
+        return all(_.is_ok for _ in self.results)
+
+    @property
+    def failed(self) -> list[DependencyCheckResult]:
+        return [_ for _ in self.results if not _.is_ok]
+
+    def as_dict(self) -> dict:
+        return dataclasses.asdict(self)
+
+    def __str__(self):
+        rows = [f'dependencies checked in {self.duration:.3f} sec.:']
+        rows.extend(str(_) for _ in self.results)
+        return '\n'.join(rows)
+
+
+async def _timed_check(name: str, check: DependencyCheck
+                       ) -> DependencyCheckResult:
+    started_at = time.perf_counter()
+    error = None
+    try:
+        await check()
+    except Exception as e:  # pylint: disable=W0718
+        error = f'{type(e).__name__}: {e}'
+    latency = time.perf_counter() - started_at
+    return DependencyCheckResult(
+        name=name, is_ok=error is None, latency=latency, error=error)
+
+
+async def run_dependency_checks(
+        checks: dict[str, DependencyCheck],
+        deadline: float,
+) -> DependenciesReport:
+    """Run all checks concurrently, unfinished by deadline are failed."""
+    started_at = time.perf_counter()
+    tasks = {
+        name: asyncio.ensure_future(_timed_check(name, check))
+        for name, check in checks.items()
+    }
+    if tasks:
+        await asyncio.wait(tasks.values(), timeout=deadline)
+    results = []
+    for name, task in tasks.items():
+        if task.done():
+            results.append(task.result())
+        else:
+            task.cancel()
+            results.append(DependencyCheckResult(
+                name=name,
+                is_ok=False,
+                latency=time.perf_counter() - started_at,
+                error=f'not finished in {deadline} sec.',
+            ))
+    await asyncio.gather(*tasks.values(), return_exceptions=True)
+    return DependenciesReport(
+        results=tuple(results),
+        duration=time.perf_counter() - started_at,
+    )
+
+
+@dataclasses.dataclass(frozen=True, slots=True)
+class HealthSnapshot:
+    """Result of the last self checks."""
+
+    checked_at: dt
+    report: DependenciesReport | None = None
+    error: str | None = None
+
+    @property
+    def is_ok(self) -> bool:
+        return self.error is None and self.report is not None \
+            and self.report.is_ok
+
+    def as_dict(self) -> dict:
+        return {
+            'checked_at': self.checked_at.isoformat(),
+            'is_ok': self.is_ok,
+            'report': self.report.as_dict() if self.report else None,
+            'error': self.error,
+        }
+
+    def __str__(self):
+        rows = [f'checked at {self.checked_at.isoformat()}']
+        if self.error:
+            rows.append(f'error: {self.error}')
+        if self.report:
+            rows.append(str(self.report))
+        return '\n'.join(rows)
+
+
+class RabbitProbe:
+    """Message round trip through RabbitMQ over a reused connection.
+
+    Connection and test queue are created once and used from a single
+    dedicated thread (pika connections are not thread-safe). The queue is
+    named by broker, so probes of many processes never share a queue.
+    """
+
+    def __init__(self, connect: Callable[[], pika.BlockingConnection]):
+        self.connect = connect
+        self.queue: str | None = None
+        self._executor = ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix='rabbit-probe')
+        self._connection: pika.BlockingConnection | None = None
+        self._channel = None
+
+    def _ensure_channel(self):
+        if self._connection is not None and self._connection.is_open:
+            return self._channel
+        self._connection = self.connect()
+        self._channel = self._connection.channel()
+        # exclusive queue lives as long as the health connection
+        declared = self._channel.queue_declare(
+            queue='', exclusive=True, auto_delete=True)
+        self.queue = declared.method.queue
+        return self._channel
+
+    def _round_trip(self):
+        try:
+            channel = self._ensure_channel()
+            test_message = f'test message {uuid.uuid4()}'
+            channel.basic_publish(
+                exchange='',
+                routing_key=self.queue,
+                body=test_message,
+            )
+            # pylint: disable=W0612
+            method_frame, header_frame, body = channel.basic_get(
+                queue=self.queue,
+                auto_ack=True,
+            )
+            received = body.decode('utf-8') if body else None
+            if received != test_message:
+                raise RuntimeError(
+                    f'unexpected message from RabbitMQ: {received}')
+        except Exception:
+            self.close_connection()
+            raise
+
+    async def check(self):
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(self._executor, self._round_trip)
+
+    def close_connection(self):
+        connection, self._connection = self._connection, None
+        self._channel = None
+        if connection is not None and connection.is_open:
+            try:
+                connection.close()
+            except Exception:  # pylint: disable=W0718
+                pass
+
+    def close(self):
+        self._executor.submit(self.close_connection).result()
+        self._executor.shutdown()
+
+
+class SelfCheckEngine:
+    """Run dependency checks on a persistent event loop.
+
+    The loop lives in its own daemon thread, so periodic checks neither
+    create new loops nor depend on loop of caller.
+    """
+
+    def __init__(
+            self,
+            checks: Callable[[], dict[str, DependencyCheck]],
+            deadline: float,
+            clock: Callable[[], dt] = None,
+    ):
+        self.checks = checks
+        self.deadline = deadline
+        self.clock = clock or (lambda: dt.now(tz=timezone.utc))
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._thread: threading.Thread | None = None
+        self._lock = threading.Lock()
+        self._snapshot: HealthSnapshot | None = None
+
+    @property
+    def last_snapshot(self) -> HealthSnapshot | None:
+        return self._snapshot
+
+    def _ensure_loop(self) -> asyncio.AbstractEventLoop:
+        with self._lock:
+            if self._loop is None or self._loop.is_closed():
+                self._loop = asyncio.new_event_loop()
+                self._thread = threading.Thread(
+                    target=self._loop.run_forever,
+                    name='self-checks',
+                    daemon=True,
+                )
+                self._thread.start()
+            return self._loop
+
+    def run(self) -> HealthSnapshot:
+        """Perform checks (blocking) and keep result as last snapshot."""
+        loop = self._ensure_loop()
+        future = asyncio.run_coroutine_threadsafe(
+            run_dependency_checks(self.checks(), self.deadline), loop)
+        try:
+            # checks are finished by deadline, the gap is for cancellation
+            report = future.result(timeout=self.deadline + 5)
+        except Exception as e:  # pylint: disable=W0718
+            future.cancel()
+            snapshot = HealthSnapshot(
+                checked_at=self.clock(),
+                error=f'{type(e).__name__}: {e}',
+            )
+        else:
+            snapshot = HealthSnapshot(checked_at=self.clock(), report=report)
+        self._snapshot = snapshot
+        return snapshot
+
+    def close(self):
+        with self._lock:
+            loop, self._loop = self._loop, None
+            if loop is None:
+                return
+            loop.call_soon_threadsafe(loop.stop)
+            self._thread.join()
+            loop.close()
@@ -1,6 +1,10 @@
 """The microservice manager."""
 
+from __future__ import annotations
+
 import asyncio
+import dataclasses
+import hashlib
 import os
 import sys
 import uuid
@@ -14,6 +18,7 @@ import celery.exceptions
 from celery import Celery
 from celery.result import AsyncResult
 from celery.utils.log import get_task_logger
+from celery.worker.control import inspect_command
 
 from pytz import timezone
 import pika
@@ -31,8 +36,74 @@ from pyservice.pyconfig.pyconfig import default_microservice_config
 from pyservice.tcpwait.tcpwait import wait_for_tcp_service
 from pyservice.files import files
 from pyservice.files.files import create_if_not_yet
-from pyservice.domain.cluster import Microservice, Backuper, deserialize_microservice
+from pyservice.files.index import DirectoryIndex
+from pyservice.files.store import SnapshotStore
+from pyservice.domain.cluster import (
+    Microservice,
+    Backuper,
+    Cluster,
+    deserialize_microservice,
+)
 from pyservice.log_tools import log_tools
+from pyservice.log_tools import seq_shipping
+from pyservice.log_tools.rotation import LogRotation
+from pyservice.manager.discovery import ClusterDiscovery
+from pyservice.manager.health import (
+    DependenciesReport,
+    DependencyCheck,
+    HealthSnapshot,
+    RabbitProbe,
+    SelfCheckEngine,
+    run_dependency_checks,
+)
+from pyservice.manager.notifications import TelegramNotifier
+from pyservice.manager.publishing import (
+    BulkPublisher,
+    CeleryTaskCall,
+    CeleryTaskOutcome,
+    ResultsCollector,
+)
+
+
+@dataclasses.dataclass(frozen=True, slots=True)
+class ProjectLayout:
+    """Location of the app inside the project tree."""
+
+    parent_for_app_dir: Path
+    app_dir: Path
+    root_module: Path | None
+    app_ref: str
+
+    # any of these directories marks the app directory
+    markers = ('src', 'tests', 'test')
+
+    @classmethod
+    def discover(cls, origin_file: Path) -> ProjectLayout:
+        """Walk up from origin file to the first directory with markers.
+
+        The root module of app is the first directory after <src>.
+        """
+        root_module = None
+        current_dir = origin_file.parent
+        previous_dir = None
+        while True:
+            if current_dir.name == 'src':
+                root_module = previous_dir
+            for marker in cls.markers:
+                if (current_dir / marker).is_dir():
+                    return cls(
+                        parent_for_app_dir=current_dir.parent,
+                        app_dir=current_dir,
+                        root_module=root_module,
+                        app_ref=root_module.name if root_module else 'unknown',
+                    )
+            if current_dir.parent == current_dir:
+                raise ValueError('Can not detect project dir and its parent!')
+            previous_dir = current_dir
+            current_dir = current_dir.parent
+
+    def as_tuple(self) -> tuple[Path, Path, Path | None]:
+        return self.parent_for_app_dir, self.app_dir, self.root_module
 
 
 class AppManager:
@@ -40,6 +111,9 @@ class AppManager:
 
     config: AppConfig
     _origin_file: Path
+    _layout: ProjectLayout | None = None
+    _directory_indexes: dict[Path, DirectoryIndex] | None = None
+    _snapshot_store: SnapshotStore | None = None
     test_mode: bool = False
 
     def __init__(self, config_of_service: AppConfig, origin_file: str | Path):
@@ -65,12 +139,54 @@ class AppManager:
             return {
                 'url': self.config.seq_url,
                 'api_key': self.config.seq_api_key,
-                'global_properties': {
-                    'app': self.app_ref,
-                },
+                'global_properties': dict(self.log_static_fields),
                 'prefix_for_logger_name': 'seq-prefix',
+                'shipping': self.seq_shipping_params,
             }
 
+    @property
+    def seq_shipping_params(self) -> dict | None:
+        """Options of bounded shipping to SEQ (None - seqlog handler)."""
+        if not self.config.seq_bounded_shipping:
+            return None
+        params = {
+            'capacity': self.config.seq_buffer_size,
+            'overflow': self.config.seq_overflow_policy,
+            'max_batch_bytes': self.config.seq_batch_bytes,
+            'compress': self.config.seq_compress_batches,
+        }
+        if self.config.seq_overflow_policy == 'spill':
+            params['spool_directory'] = self.directory_for_seq_spool
+            params['spool_max_bytes'] = self.config.seq_spool_max_bytes
+        return params
+
+    @property
+    def file_logging_params(self) -> dict:
+        """Options of log files for log_tools.get_logger."""
+        return {
+            'queued_files': self.config.queued_file_logging,
+            'rotation': self.log_rotation,
+            'log_format': self.config.log_format,
+            'static_fields': self.log_static_fields,
+            'indented': self.config.indented_logging,
+        }
+
+    @property
+    def log_static_fields(self) -> dict:
+        """Fields of every record (in SEQ and in JSON log files)."""
+        return {'app': self.app_ref}
+
+    @property
+    def log_rotation(self) -> LogRotation | None:
+        rotation = LogRotation(
+            max_bytes=self.config.log_rotation_max_bytes,
+            interval=self.config.log_rotation_interval,
+            backups=self.config.log_rotation_backups,
+            compress=self.config.log_rotation_compress,
+            max_directory_bytes=self.config.logs_directory_max_bytes,
+        )
+        return rotation if rotation.is_limited else None
+
     def get_manager_logger(self):
         logger_name = f'{self.app_ref}-manager'
         log = log_tools.get_logger(
@@ -78,6 +194,7 @@ class AppManager:
             directory_for_logs=self.directory_for_logs,
             erase=self.config.delete_logs_on_start,
             seq_params=self.seq_params,
+            **self.file_logging_params,
         )
         return log
 
@@ -91,37 +208,37 @@ class AppManager:
             directory_for_logs=self.directory_for_logs,
             erase=self.config.delete_logs_on_start,
             seq_params=seq_params,
+            **self.file_logging_params,
         )
         log_tools.remove_all_stream_handlers(logger=root_log)
 
 
+    @property
+    def layout(self) -> ProjectLayout:
+        """Project layout, resolved once per manager."""
+        if self._layout is None:
+            self._layout = ProjectLayout.discover(self._origin_file)
+        return self._layout
+
+    def invalidate_layout(self):
+        """Force re-discovering of project layout on the next access."""
+        self._layout = None
+
     @property
     def directory_for_place_app_directory(self):
-        # pylint: disable=W0612
-        parent_for_app_dir, app_dir, app_root_module = (
-            self.base_project_directories)
-        return parent_for_app_dir
+        return self.layout.parent_for_app_dir
 
     @property
     def directory_for_app(self) -> Path:
-        # pylint: disable=W0612
-        parent_for_app_dir, app_dir, app_root_module = (
-            self.base_project_directories)
-        return app_dir
+        return self.layout.app_dir
 
     @property
     def directory_for_tests(self) -> Path:
-        # pylint: disable=W0612
-        parent_for_app_dir, app_dir, app_root_module = (
-            self.base_project_directories)
-        return app_dir / 'tests'
+        return self.layout.app_dir / 'tests'
 
     @property
     def root_module(self) -> Path | None:
-        # pylint: disable=W0612
-        parent_for_app_dir, app_dir, app_root_module = (
-            self.base_project_directories)
-        return app_root_module
+        return self.layout.root_module
 
     @property
     def root_module_name(self) -> str:
@@ -132,7 +249,7 @@ class AppManager:
 
     @property
     def app_ref(self) -> str:
-        return self.root_module.name if self.root_module else 'unknown'
+        return self.layout.app_ref
 
     @property
     def base_project_directories(self) -> tuple[Path, Path, Path]:
@@ -141,26 +258,7 @@ class AppManager:
         - app directory
         - root module of app (the first after <src> directory)
         """
-        root_module = None
-
-        config_location = self._origin_file
-        current_dir = config_location.parent
-        previous_dir = None
-        while True:
-            if current_dir.name == 'src':
-                root_module = previous_dir
-            dirs = files.get_list_of_directories_in_directory(
-                current_dir, mask='*')
-            for directory in dirs:
-                if directory.name in ['src', 'tests', 'test']:
-                    app_dir = directory.parent
-                    parent_for_app_dir = app_dir.parent
-                    return parent_for_app_dir, app_dir, root_module
-                elif directory.name == '/':
-                    raise ValueError(
-                        'Can not detect project dir and its parent!')
-            previous_dir = current_dir
-            current_dir = current_dir.parent
+        return self.layout.as_tuple()
 
     @property
     @create_if_not_yet
@@ -184,6 +282,29 @@ class AppManager:
     def directory_for_data(self) -> Path:
         return self.artefacts_directory / 'data'
 
+    def get_directory_index(self, directory: Path) -> DirectoryIndex:
+        """Persistent index of files of directory (see files.index)."""
+        directory = Path(directory).absolute()
+        if self._directory_indexes is None:
+            self._directory_indexes = {}
+        index = self._directory_indexes.get(directory)
+        if index is None:
+            name = hashlib.md5(str(directory).encode('utf-8')).hexdigest()
+            index = DirectoryIndex(
+                directory,
+                self.directory_for_data / 'indexes' / f'{name}.sqlite3',
+            )
+            self._directory_indexes[directory] = index
+        return index
+
+    @property
+    def snapshot_store(self) -> SnapshotStore:
+        """Deduplicating store of snapshots (see files.store)."""
+        if self._snapshot_store is None:
+            self._snapshot_store = SnapshotStore(
+                self.directory_for_data / 'snapshots')
+        return self._snapshot_store
+
     @property
     def timezone(self):
         return timezone(self.config.tz)
@@ -218,9 +339,17 @@ class AppManager:
         if detailed_tmp.entities.total_size_in_bytes > 0:
             raise RuntimeError('Tmp directory is not empty')
 
+    @property
+    def directory_for_seq_spool(self) -> Path:
+        """Events not delivered to SEQ (kept when logs are erased)."""
+        return self.directory_for_logs / 'seq-spool'
+
     def erase_logs_directory(self):
         # files.erase_directory(self.directory_for_logs)
-        files.clear_all_files_in_directory(self.directory_for_logs)
+        files.clear_all_files_in_directory(
+            self.directory_for_logs,
+            excluded=(self.directory_for_seq_spool,),
+        )
 
     def get_logger_for_pyfile(
             self,
@@ -233,6 +362,7 @@ class AppManager:
             with_path=with_path,
             erase=self.config.delete_logs_on_start,
             seq_params=self.seq_params,
+            **self.file_logging_params,
         )
         return logger
 
@@ -242,6 +372,7 @@ class AppManager:
                 log_name=_,
                 directory_for_logs=self.directory_for_logs,
                 erase=self.config.delete_logs_on_start,
+                **self.file_logging_params,
             )
 
     def get_installed_packages(self) -> list[str]:
@@ -296,13 +427,57 @@ class AppManager:
             self.log.debug('logs directory has been erased!')
 
 
+@dataclasses.dataclass(frozen=True, slots=True)
+class MicroserviceDescriptor:
+    """Microservice model together with its serialized form."""
+
+    config: MicroserviceConfig
+    queues: tuple[str, ...]
+    microservice: Microservice
+    payload: dict
+
+    @classmethod
+    def build(
+            cls,
+            config: MicroserviceConfig,
+            queues: tuple[str, ...],
+    ) -> MicroserviceDescriptor:
+        if isinstance(config, BackuperConfig):
+            klass = Backuper
+        else:
+            klass = Microservice
+        own_queue = queues[0]
+        microservice = klass(
+            config=config,
+            ref=own_queue,
+            queues=list(queues),
+            own_queue=own_queue,
+        )
+        return cls(
+            config=config,
+            queues=queues,
+            microservice=microservice,
+            payload=microservice.as_dict(),
+        )
+
+    def as_dict(self) -> dict:
+        """Pre-serialized microservice (must not be modified)."""
+        return self.payload
+
+
 class MicroServiceManager(AppManager):
     """The manager for microservice."""
 
     config: MicroserviceConfig
     celery_app: Celery = None
 
-    microservice: Microservice
+    _microservice_descriptor: MicroserviceDescriptor | None = None
+    _bulk_publisher: BulkPublisher | None = None
+    _cluster_discovery: ClusterDiscovery | None = None
+    _self_check_engine: SelfCheckEngine | None = None
+    _rabbit_probe: RabbitProbe | None = None
+    _telegram_client: TgServiceClient | None = None
+    _notifier: TelegramNotifier | None = None
 
     def __init__(
             self,
@@ -324,27 +499,51 @@ class MicroServiceManager(AppManager):
         log.info('Logger for celery tasks: %s', log)
         return log
 
-    def _async_self_checks_by_celery(self) -> list:
-        async_checks = [
-            self.check_connection_to_rabbit_mq(),
-            self.check_connection_to_seq(),
-            self.check_connection_to_telegram_server(),
-        ]
-        return async_checks
+    @property
+    def rabbit_probe(self) -> RabbitProbe:
+        if self._rabbit_probe is None:
+            self._rabbit_probe = RabbitProbe(
+                connect=self._get_connection_to_rabbitmq)
+        return self._rabbit_probe
 
-    def _sync_self_checks_by_celery(self):
-        sync_tasks = [
-            self.test_rabbit_by_pika,
-        ]
-        return sync_tasks
+    async def check_rabbit_mq_by_probe(self):
+        await self.check_connection_to_rabbit_mq()
+        await self.rabbit_probe.check()
+
+    def _self_checks(self) -> dict[str, DependencyCheck]:
+        checks = self._dependency_checks()
+        # periodic checks reuse connection instead of a new one every time
+        checks['rabbitmq'] = self.check_rabbit_mq_by_probe
+        return checks
 
     @property
-    def seq_params(self) -> dict | None:
-        base = super().seq_params
-        if base:
-            global_properties = base['global_properties']
-            global_properties['microservice'] = self.microservice.ref
-        return base
+    def self_check_engine(self) -> SelfCheckEngine:
+        if self._self_check_engine is None:
+            self._self_check_engine = SelfCheckEngine(
+                checks=self._self_checks,
+                deadline=self.config.preflight_checks_deadline,
+                clock=self.get_now,
+            )
+        return self._self_check_engine
+
+    @property
+    def last_health_snapshot(self) -> HealthSnapshot | None:
+        return self.self_check_engine.last_snapshot
+
+    def service_info(self) -> dict:
+        """Microservice with result of the last self checks."""
+        snapshot = self.last_health_snapshot
+        return {
+            **self.microservice_descriptor.as_dict(),
+            'health': snapshot.as_dict() if snapshot else None,
+        }
+
+    @property
+    def log_static_fields(self) -> dict:
+        return {
+            **super().log_static_fields,
+            'microservice': self.microservice.ref,
+        }
 
     def post_app_manager_init(self):
         pass
@@ -357,6 +556,7 @@ class MicroServiceManager(AppManager):
         super().enable_test_mode()
         self.config.tg_group_for_system_notifications = (
             self.config.tg_group_for_tests)
+        self.invalidate_microservice_descriptor()
 
     @property
     def celery_test_file(self):
@@ -423,27 +623,32 @@ class MicroServiceManager(AppManager):
         print('All good! Celery is working fine!')
 
     @property
-    def microservice(self) -> Microservice:
+    def microservice_descriptor(self) -> MicroserviceDescriptor:
+        """Microservice model, rebuilt only when its inputs change."""
         ref = f'{self.app_ref}:{self.config.instance_tag}'
-        queues = [
+        queues = (
             ref,
             self.app_ref,
             self.config.default_celery_queue,
-        ]
-        if isinstance(self.config, BackuperConfig):
-            klass = Backuper
-        else:
-            klass = Microservice
-        m = klass(
-            config=self.config,
-            ref=ref,
-            queues=queues,
-            own_queue=ref,
         )
-        return m
+        descriptor = self._microservice_descriptor
+        if (descriptor is None
+                or descriptor.config is not self.config
+                or descriptor.queues != queues):
+            descriptor = MicroserviceDescriptor.build(self.config, queues)
+            self._microservice_descriptor = descriptor
+        return descriptor
+
+    def invalidate_microservice_descriptor(self):
+        """Force rebuilding of microservice model (after config changes)."""
+        self._microservice_descriptor = None
+
+    @property
+    def microservice(self) -> Microservice:
+        return self.microservice_descriptor.microservice
 
     def all_queues(self, as_text: bool = False) -> list[str]:
-        queues = self.microservice.queues
+        queues = list(self.microservice_descriptor.queues)
         if as_text:
             queues = ','.join(queues)
         return queues
@@ -455,6 +660,7 @@ class MicroServiceManager(AppManager):
         self.log.info('check TCP connection to SEQ (%s)', seq_url)
         await wait_for_tcp_service(seq_url)
         self.log.info('OK - SEQ on wire!')
+        seq_shipping.replay_spools()
         return True
 
     async def check_connection_to_rabbit_mq(self):
@@ -473,24 +679,46 @@ class MicroServiceManager(AppManager):
         await wait_for_tcp_service(url)
         self.log.info('OK - Telegram Server on wire!')
 
-    async def preflight_checks(self):
+    async def check_rabbit_mq_messaging(self):
+        await self.check_connection_to_rabbit_mq()
+        # pika is blocking, so it is tested outside of event loop
+        await asyncio.to_thread(self.test_rabbit_by_pika)
+
+    def _dependency_checks(self) -> dict[str, DependencyCheck]:
+        return {
+            'seq': self.check_connection_to_seq,
+            'telegram server': self.check_connection_to_telegram_server,
+            'rabbitmq': self.check_rabbit_mq_messaging,
+        }
+
+    async def check_dependencies(
+            self, deadline: float = None) -> DependenciesReport:
+        """Check all dependencies concurrently within deadline."""
+        if deadline is None:
+            deadline = self.config.preflight_checks_deadline
+        report = await run_dependency_checks(
+            self._dependency_checks(), deadline)
+        for result in report.results:
+            if result.is_ok:
+                self.log.info('dependency %s', result)
+            else:
+                self.log.error('dependency %s', result)
+        return report
+
+    async def preflight_checks(self) -> DependenciesReport:
         self.log.info('performing preflight checks for microservice %s',
                       self.microservice.ref)
-        print('waiting for seq ... ', end=None)
-        await self.check_connection_to_seq()
-        print('OK')
-        print('waiting for telegram server ...', end=None)
-        await self.check_connection_to_telegram_server()
-        print('OK')
-        print('waiting for rabbit mq ...', end=None)
-        await self.check_connection_to_rabbit_mq()
-        print('OK')
-        self.test_rabbit_by_pika()
+        print('waiting for dependencies ...')
+        report = await self.check_dependencies()
+        print(report)
+        if not report.is_ok:
+            raise RuntimeError(f'Preflight checks failed!\n{report}')
 
-        self.send_message_to_telegram_chat(
+        self.notifier.notify(
             text=f'Preflight check for {self.microservice}',
             chat_id=self.config.tg_group_for_tests
         )
+        return report
 
     def add_task_to_celery_scheduler(
             self,
@@ -508,6 +736,8 @@ class MicroServiceManager(AppManager):
         # Queue (with empty deque)! That's very strange!!!
         # I was unable to get the real reason, but I think it may be related
         # with threads conflicts (Celery Sheduler and Seq Queue).
+        # Bounded shipping (config.seq_bounded_shipping) has no seqlog
+        # consumer, but keep logs out of here for seqlog handler.
         scheduler: dict = self.celery_app.conf.beat_schedule
         scheduler[ref] = {
             'task': f'{self.app_ref}.{task_name}',
@@ -548,30 +778,27 @@ class MicroServiceManager(AppManager):
                 ),
                 beat_schedule_filename=schedule_file,
                 task_default_queue=self.config.default_celery_queue,
+                broker_pool_limit=self.config.celery_producer_pool_size,
+                broker_transport_options={
+                    'confirm_publish': self.config.celery_publisher_confirms,
+                },
             )
 
             @app.task
             def self_check():
                 self.log.debug('launching periodic self checks by Celery ...')
-                try:
-                    loop = asyncio.new_event_loop()
-                    asyncio.set_event_loop(loop)
-                    async_checks = asyncio.gather(
-                        *self._async_self_checks_by_celery())
-                    loop.run_until_complete(async_checks)
-                    for _ in self._sync_self_checks_by_celery():
-                        _()
-                except Exception as e:
+                snapshot = self.self_check_engine.run()
+                if not snapshot.is_ok:
                     msg = (f'ERROR during performing periodical self-check '
-                           f'for service {self.microservice.ref}: {e}')
+                           f'for service {self.microservice.ref}:\n'
+                           f'{snapshot}')
                     self.log.critical(msg)
-                    self.log.exception(e)
                     self.system_notification(msg)
-                    raise e
-                else:
-                    self.log.debug(
-                        'self-checks for service %s have been passed',
-                        self.microservice.ref)
+                    raise RuntimeError(msg)
+                self.log.debug(
+                    'self-checks for service %s have been passed',
+                    self.microservice.ref)
+                return snapshot.as_dict()
 
             @app.task
             def create_test_file():
@@ -583,9 +810,15 @@ class MicroServiceManager(AppManager):
             def service_info(publisher):
                 self.log.debug('<%s> have been requested '
                                'service_info', publisher)
-                result = self.microservice.as_dict()
+                result = self.service_info()
                 return result
 
+            # the same info for broadcast requests (see discover_cluster)
+            @inspect_command(name='service_info')
+            def service_info_for_broadcast(state, publisher=None):
+                # pylint: disable=W0613
+                return self.service_info()
+
             app.conf.beat_schedule = {
                 'periodic-selfscheck': {
                     'task': f'{self.app_ref}.self_check',
@@ -672,15 +905,43 @@ class MicroServiceManager(AppManager):
             queue=self.microservice.own_queue
         )
 
+    def discover_cluster(self, deadline: float = None) -> Cluster:
+        """Ask all workers at once and collect replies within deadline."""
+        if deadline is None:
+            deadline = self.config.cluster_discovery_deadline
+        replies = self.celery_app.control.broadcast(
+            'service_info',
+            arguments={'publisher': self.microservice.ref},
+            reply=True,
+            timeout=deadline,
+        )
+        cluster = Cluster(microservices=set())
+        for reply in replies:
+            for worker, serialized in reply.items():
+                if not isinstance(serialized, dict) or 'ref' not in serialized:
+                    self.log.debug('worker %s has no service info: %s',
+                                   worker, serialized)
+                    continue
+                cluster.add_microservice(
+                    deserialize_microservice(serialized))
+        self.log.debug('discovered cluster: %s', cluster)
+        return cluster
+
+    @property
+    def cluster_discovery(self) -> ClusterDiscovery:
+        if self._cluster_discovery is None:
+            self._cluster_discovery = ClusterDiscovery(
+                discover=self.discover_cluster,
+                ttl=self.config.cluster_cache_ttl,
+            )
+        return self._cluster_discovery
+
+    def get_cluster(self, block: bool = True) -> Cluster | None:
+        """Cached cluster (expired one is refreshed in background)."""
+        return self.cluster_discovery.get(block=block)
+
     def get_all_cluster_microservices(self) -> set[Microservice]:
-        result = set()
-        first = self.get_microservice_from_cluster()
-        result.add(first)
-        next_one = None
-        while next_one != first:
-            next_one = self.get_microservice_from_cluster()
-            result.add(next_one)
-        return result
+        return set(self.get_cluster().microservices)
 
     def get_all_celery_tasks(
             self, with_internal_celery: bool = False) -> list[str]:
@@ -724,6 +985,8 @@ class MicroServiceManager(AppManager):
             queue = self.microservice.ref
             self.log.debug('queue is not provided, '
                            'own queue will be used - %s', queue)
+        # producer is acquired from the pool of celery app
+        # (see celery_producer_pool_size in config)
         result: AsyncResult = self.celery_app.send_task(
             task_name,
             queue=queue,
@@ -741,6 +1004,89 @@ class MicroServiceManager(AppManager):
         #     },
         # }
 
+    def execute_celery_tasks_concurrently(
+            self,
+            calls: list[CeleryTaskCall],
+            timeout: float = None,
+            return_partial: bool = True,
+    ) -> list[CeleryTaskOutcome]:
+        """Send all tasks at once and collect results as they arrive.
+
+        Timed out or failed tasks are returned as outcomes with error
+        (or the first error is raised if partial result is not allowed).
+        """
+        started_at = time.monotonic()
+        results = self.send_tasks_bulk(calls)
+        collector = ResultsCollector(calls, results, timeout, started_at)
+        for outcome in collector.iter_outcomes(
+                self.config.celery_result_poll_interval):
+            if not (outcome.is_ok or return_partial):
+                raise outcome.error
+        return collector.outcomes
+
+    async def aexecute_celery_tasks_concurrently(
+            self,
+            calls: list[CeleryTaskCall],
+            timeout: float = None,
+            return_partial: bool = True,
+    ) -> list[CeleryTaskOutcome]:
+        """Async version of execute_celery_tasks_concurrently.
+
+        Tasks are sent and their results are awaited by a worker thread
+        (result backend of celery app is bound to thread), so event loop
+        is never blocked.
+        """
+        return await asyncio.to_thread(
+            self.execute_celery_tasks_concurrently,
+            calls, timeout, return_partial)
+
+    async def aexecute_celery_task(
+            self,
+            task_name: str,
+            task_args: tuple = None,
+            queue: str = None,
+            timeout: float = None,
+    ):
+        """Execute task without blocking event loop while waiting result."""
+        call = CeleryTaskCall(
+            task_name=task_name,
+            task_args=task_args,
+            queue=queue,
+            timeout=timeout,
+        )
+        outcomes = await self.aexecute_celery_tasks_concurrently(
+            [call], return_partial=False)
+        return outcomes[0].result
+
+    @property
+    def bulk_publisher(self) -> BulkPublisher:
+        if self._bulk_publisher is None:
+            self._bulk_publisher = BulkPublisher(
+                self.celery_app,
+                flush_size=self.config.celery_bulk_flush_size,
+                confirms=self.config.celery_publisher_confirms,
+                confirm_timeout=self.config.celery_bulk_confirm_timeout,
+            )
+        return self._bulk_publisher
+
+    def send_tasks_bulk(
+            self,
+            calls: list[CeleryTaskCall],
+    ) -> list[AsyncResult]:
+        """Start many tasks at once over a single AMQP channel.
+
+        Calls without queue are sent to own queue.
+        """
+        own_queue = self.microservice.ref
+        calls = [
+            _ if _.queue else dataclasses.replace(_, queue=own_queue)
+            for _ in calls
+        ]
+        self.log.debug('sending %s celery tasks in bulk', len(calls))
+        results = self.bulk_publisher.send(calls)
+        self.log.debug('%s celery tasks have been sent', len(results))
+        return results
+
     def _get_connection_to_rabbitmq(self):
         return pika.BlockingConnection(
             pika.ConnectionParameters(
@@ -796,14 +1142,32 @@ class MicroServiceManager(AppManager):
         # self.log.debug('- celery registered tasks: %s',
         #                self.get_all_celery_tasks())
 
+    @property
+    def telegram_client(self) -> TgServiceClient:
+        if self._telegram_client is None:
+            self._telegram_client = TgServiceClient(
+                url=self.config.tgs_server_url,
+            )
+        return self._telegram_client
+
+    @property
+    def notifier(self) -> TelegramNotifier:
+        if self._notifier is None:
+            self._notifier = TelegramNotifier(
+                client_factory=lambda: self.telegram_client,
+                sender_phone=self.config.tg_account_for_sending_notifications,
+                header=f'Notification from "{self.microservice.ref}":\n',
+                queue_size=self.config.tg_notifications_queue_size,
+                digest_interval=self.config.tg_notifications_digest_interval,
+            )
+        return self._notifier
+
     def send_message_to_telegram_chat(self, text, chat_id):
+        """Send message right now (blocking)."""
         self.log.debug('sending text to the chat with id="%s"', chat_id)
-        tg_client = TgServiceClient(
-            url=self.config.tgs_server_url,
-        )
         sender_phone = self.config.tg_account_for_sending_notifications
         tg_chat = chat_id
-        sent_message = tg_client.send_text_message(
+        sent_message = self.telegram_client.send_text_message(
             app_phone=str(sender_phone),
             receiver=tg_chat,
             text=text[:4000]
@@ -812,10 +1176,11 @@ class MicroServiceManager(AppManager):
         self.log.debug('message has been sent successfully: %s', sent_message)
 
     def system_notification(self, text):
-        header = f'Notification from "{self.microservice.ref}":\n'
-        text = header + text
+        """Put notification to the queue of notifier (not blocking)."""
         tg_chat = self.config.tg_group_for_system_notifications
-        self.send_message_to_telegram_chat(text, chat_id=tg_chat)
+        if not self.notifier.notify(text, chat_id=tg_chat):
+            self.log.warning('system notification has been dropped: %s',
+                             text)
 
 
 class DjangoBasedMicroserviceManager(MicroServiceManager):
@@ -934,21 +1299,19 @@ class DjangoBasedMicroserviceManager(MicroServiceManager):
         super().on_start()
         self.erase_web_static_files_directory()
 
-    def _async_self_checks_by_celery(self) -> list:
-        base = super()._async_self_checks_by_celery()
-        base.append(self.check_connection_to_db())
-        base.append(self.check_connection_to_keycloak())
+    def _dependency_checks(self) -> dict[str, DependencyCheck]:
+        base = super()._dependency_checks()
+        base['database'] = self.check_connection_to_db
+        base['keycloak'] = self.check_connection_to_keycloak
         return base
 
-    async def preflight_checks(self):
+    async def preflight_checks(self) -> DependenciesReport:
         if not self.config.keycloak_secret_key:
             raise ValueError('KEYCLOAK_SECRET_KEY must be provided!!!!')
         if not self.config.keycloak_client_id:
             raise ValueError('KEYCLOAK_CLIENT_ID must be provided!!!!')
-        await super().preflight_checks()
         assert self.django_directory.is_dir()
-        await self.check_connection_to_db()
-        await self.check_connection_to_keycloak()
+        return await super().preflight_checks()
 
     async def check_connection_to_db(self):
         hostname = self.config.django_db_hostname
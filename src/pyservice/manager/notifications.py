@@ -0,0 +1,232 @@
+"""Background sending of notifications to telegram chats."""
+
+from __future__ import annotations
+
+import logging
+import queue
+import threading
+import time
+from typing import Callable
+
+from tgs_client import TgServiceClient
+
+
+log = logging.getLogger(__name__)
+
+
+class TelegramNotifier:
+    """Send notifications to telegram chats without blocking callers.
+
+    Messages are put to a bounded queue and sent by a single worker
+    thread. All messages for a chat collected during `digest_interval`
+    are sent as one digest, repeated messages are counted instead of
+    being repeated. When the queue is full, new messages are dropped.
+    After a failed sending the worker backs off exponentially, so the
+    messages of a failure storm are coalesced into a few digests. Messages
+    of a failed digest are sent again (with newer messages of the chat)
+    when backoff of the chat is over, until `max_attempts` sendings of the
+    chat fail, then they are dropped.
+    """
+
+    def __init__(
+            self,
+            client_factory: Callable[[], TgServiceClient],
+            sender_phone: str,
+            *,
+            header: str = '',
+            queue_size: int = 1000,
+            digest_interval: float = 5.0,
+            max_backoff: float = 300.0,
+            max_message_length: int = 4000,
+            max_attempts: int = 3,
+    ):
+        self.client_factory = client_factory
+        self.sender_phone = str(sender_phone)
+        self.header = header
+        self.digest_interval = digest_interval
+        self.max_backoff = max_backoff
+        self.max_message_length = max_message_length
+        self.max_attempts = max(1, max_attempts)
+
+        # counters are changed by worker and by callers
+        self._counters_lock = threading.Lock()
+        self.sent = 0
+        self.failed = 0
+        self.dropped = 0
+
+        self._queue: queue.Queue[tuple[str, str]] = queue.Queue(queue_size)
+        self._client: TgServiceClient | None = None
+        self._backoff = 0.0
+        # messages of failed digests, failed attempts and retry time by chats
+        self._unsent: dict[str, dict[str, int]] = {}
+        self._attempts: dict[str, int] = {}
+        self._retry_at: dict[str, float] = {}
+        self._flushing = threading.Event()
+        self._stopped = threading.Event()
+        self._lock = threading.Lock()
+        self._worker: threading.Thread | None = None
+
+    @property
+    def client(self) -> TgServiceClient:
+        if self._client is None:
+            self._client = self.client_factory()
+        return self._client
+
+    def notify(self, text: str, chat_id: str) -> bool:
+        """Put message to queue (False if it has been dropped)."""
+        self._ensure_worker()
+        try:
+            self._queue.put_nowait((str(chat_id), text))
+        except queue.Full:
+            self._count('dropped')
+            return False
+        return True
+
+    def _count(self, counter: str, number: int = 1):
+        with self._counters_lock:
+            setattr(self, counter, getattr(self, counter) + number)
+
+    def _ensure_worker(self):
+        with self._lock:
+            if self._worker is None or not self._worker.is_alive():
+                self._stopped.clear()
+                self._worker = threading.Thread(
+                    target=self._run,
+                    name='telegram-notifier',
+                    daemon=True,
+                )
+                self._worker.start()
+
+    def _collect(self) -> tuple[dict[str, dict[str, int]], int]:
+        """Wait for messages and group them by chat and text."""
+        try:
+            chat_id, text = self._queue.get(timeout=0.5)
+        except queue.Empty:
+            return {}, 0
+        pending: dict[str, dict[str, int]] = {}
+        collected = 0
+        deadline = time.monotonic() + max(self.digest_interval, self._backoff)
+        while True:
+            messages = pending.setdefault(chat_id, {})
+            messages[text] = messages.get(text, 0) + 1
+            collected += 1
+            if collected >= self._queue.maxsize > 0:
+                break
+            try:
+                chat_id, text = self._next_message(deadline)
+            except queue.Empty:
+                break
+        return pending, collected
+
+    def _next_message(self, deadline: float) -> tuple[str, str]:
+        """Wait for message till deadline (the rest is taken on flush)."""
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0 or self._flushing.is_set():
+                return self._queue.get_nowait()
+            try:
+                return self._queue.get(timeout=min(remaining, 0.1))
+            except queue.Empty:
+                continue
+
+    def digest(self, messages: dict[str, int]) -> str:
+        rows = []
+        for text, count in messages.items():
+            if count > 1:
+                text = f'{text}\n(repeated {count} times)'
+            rows.append(text)
+        digest = self.header + '\n\n'.join(rows)
+        if len(digest) > self.max_message_length:
+            digest = digest[:self.max_message_length - 4] + ' ...'
+        return digest
+
+    def _send(self, chat_id: str, messages: dict[str, int]):
+        try:
+            self.client.send_text_message(
+                app_phone=self.sender_phone,
+                receiver=chat_id,
+                text=self.digest(messages),
+            )
+        except Exception:  # pylint: disable=W0718
+            self._count('failed')
+            self._backoff = min(
+                self.max_backoff, max(self._backoff * 2, self.digest_interval))
+            log.exception('can not send notification to chat %s', chat_id)
+            self._keep_for_retry(chat_id, messages)
+        else:
+            self._count('sent')
+            self._backoff = 0.0
+            self._forget(chat_id)
+
+    def _forget(self, chat_id: str):
+        self._attempts.pop(chat_id, None)
+        self._unsent.pop(chat_id, None)
+        self._retry_at.pop(chat_id, None)
+
+    def _keep_for_retry(self, chat_id: str, messages: dict[str, int]):
+        attempts = self._attempts.get(chat_id, 0) + 1
+        if attempts >= self.max_attempts:
+            self._forget(chat_id)
+            self._count('dropped', sum(messages.values()))
+            log.warning('notifications to chat %s are dropped after %s '
+                        'attempts', chat_id, attempts)
+            return
+        self._attempts[chat_id] = attempts
+        self._unsent[chat_id] = messages
+        # backoff of chat does not depend on sendings to other chats
+        backoff = min(self.max_backoff,
+                      self.digest_interval * 2 ** (attempts - 1))
+        self._retry_at[chat_id] = time.monotonic() + backoff
+
+    def _with_retries(self, pending: dict[str, dict[str, int]]
+                      ) -> dict[str, dict[str, int]]:
+        """Add messages of failed digests of chats which are due to retry.
+
+        New messages for chats still backing off wait for their retry.
+        """
+        if not self._unsent:
+            return pending
+        now = time.monotonic()
+        flushing = self._flushing.is_set()
+        # failed digests stay unsent until they are sent or dropped
+        digests = {chat_id: dict(messages)
+                   for chat_id, messages in self._unsent.items()
+                   if flushing or now >= self._retry_at[chat_id]}
+        for chat_id, messages in pending.items():
+            if chat_id in self._unsent and chat_id not in digests:
+                merged = self._unsent[chat_id]
+            else:
+                merged = digests.setdefault(chat_id, {})
+            for text, count in messages.items():
+                merged[text] = merged.get(text, 0) + count
+        return digests
+
+    def _run(self):
+        while not self._stopped.is_set():
+            pending, collected = self._collect()
+            for chat_id, messages in self._with_retries(pending).items():
+                self._send(chat_id, messages)
+            for _ in range(collected):
+                self._queue.task_done()
+
+    def flush(self, timeout: float = 30) -> bool:
+        """Send queued messages right now (True if all are handled).
+
+        Failed digests are sent again without waiting for backoff.
+        """
+        self._flushing.set()
+        try:
+            deadline = time.monotonic() + timeout
+            while self._queue.unfinished_tasks or self._unsent:
+                if time.monotonic() > deadline:
+                    return False
+                time.sleep(0.05)
+            return True
+        finally:
+            self._flushing.clear()
+
+    def close(self, timeout: float = 30):
+        self.flush(timeout)
+        self._stopped.set()
+        if self._worker is not None:
+            self._worker.join(timeout)
@@ -0,0 +1,284 @@
+"""Sending celery tasks and collecting their results."""
+
+from __future__ import annotations
+
+import dataclasses
+import socket
+import threading
+import time
+from typing import Any, Iterable, Iterator
+
+import celery.exceptions
+import celery.states
+from celery import Celery
+from celery.result import AsyncResult, ResultSet
+
+
+class PublishNotConfirmed(Exception):
+    pass
+
+
+@dataclasses.dataclass(frozen=True, slots=True)
+class CeleryTaskCall:
+    """Celery task to be sent."""
+
+    task_name: str
+    task_args: tuple | None = None
+    queue: str | None = None
+    # seconds to wait for result (counted from sending)
+    timeout: float | None = None
+
+
+@dataclasses.dataclass(frozen=True, slots=True)
+class CeleryTaskOutcome:
+    """Result or error of a sent celery task."""
+
+    call: CeleryTaskCall
+    task_id: str
+    result: Any = None
+    error: BaseException | None = None
+    duration: float = 0.0
+
+    @property
+    def is_ok(self) -> bool:
+        return self.error is None
+
+
+class PublisherConfirms:
+    """Publisher confirms (RabbitMQ extension) of a single channel."""
+
+    def __init__(self, channel):
+        self.channel = channel
+        self.published = 0
+        self.nacked = 0
+        self._settled_up_to = 0
+        self._settled_above: set[int] = set()
+        channel.events['basic_ack'].add(self._on_ack)
+        channel.events['basic_nack'].add(self._on_nack)
+        channel.confirm_select()
+
+    @property
+    def settled(self) -> int:
+        return self._settled_up_to + len(self._settled_above)
+
+    def _settle(self, delivery_tag: int, multiple: bool):
+        if multiple:
+            self._settled_up_to = max(self._settled_up_to, delivery_tag)
+            self._settled_above = {
+                _ for _ in self._settled_above if _ > self._settled_up_to}
+        elif delivery_tag > self._settled_up_to:
+            self._settled_above.add(delivery_tag)
+
+    def _on_ack(self, delivery_tag, multiple):
+        self._settle(delivery_tag, multiple)
+
+    def _on_nack(self, delivery_tag, multiple):
+        before = self.settled
+        self._settle(delivery_tag, multiple)
+        self.nacked += self.settled - before
+
+    def wait(self, connection, timeout: float):
+        """Wait until broker confirms every published message."""
+        deadline = time.monotonic() + timeout
+        while self.settled < self.published:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise PublishNotConfirmed(
+                    f'{self.published - self.settled} messages are not '
+                    f'confirmed in {timeout} sec.')
+            try:
+                connection.drain_events(timeout=remaining)
+            except socket.timeout:
+                pass
+        if self.nacked:
+            nacked, self.nacked = self.nacked, 0
+            raise PublishNotConfirmed(
+                f'{nacked} messages are rejected by broker')
+
+
+class BulkPublisher:
+    """Send many tasks over one long-lived connection and channel.
+
+    Tasks are published in batches of `flush_size`. If confirms are
+    enabled, publisher waits for broker confirmation of the whole batch
+    instead of confirming every message separately.
+    """
+
+    def __init__(
+            self,
+            app: Celery,
+            flush_size: int = 500,
+            confirms: bool = False,
+            confirm_timeout: float = 30,
+    ):
+        self.app = app
+        self.flush_size = max(1, flush_size)
+        self.confirms = confirms
+        self.confirm_timeout = confirm_timeout
+        self._lock = threading.Lock()
+        self._connection = None
+        self._producer = None
+        self._confirms: PublisherConfirms | None = None
+
+    def _ensure_producer(self):
+        if self._connection is not None and self._connection.connected:
+            return
+        self.close()
+        # every message of a batch is confirmed by a single wait
+        connection = self.app.connection_for_write(
+            transport_options={'confirm_publish': False})
+        connection.ensure_connection(max_retries=3)
+        channel = connection.channel()
+        if self.confirms and hasattr(channel, 'confirm_select'):
+            self._confirms = PublisherConfirms(channel)
+        self._producer = self.app.amqp.Producer(channel, auto_declare=False)
+        self._connection = connection
+
+    def send(self, calls: Iterable[CeleryTaskCall]) -> list[AsyncResult]:
+        results = []
+        with self._lock:
+            self._ensure_producer()
+            try:
+                for call in calls:
+                    result = self.app.send_task(
+                        call.task_name,
+                        args=call.task_args,
+                        queue=call.queue,
+                        producer=self._producer,
+                    )
+                    results.append(result)
+                    if self._confirms:
+                        self._confirms.published += 1
+                    if len(results) % self.flush_size == 0:
+                        self.flush()
+                self.flush()
+            except Exception:
+                self.close()
+                raise
+        return results
+
+    def flush(self):
+        if self._confirms:
+            self._confirms.wait(self._connection, self.confirm_timeout)
+
+    def close(self):
+        if self._connection is not None:
+            self._connection.release()
+        self._connection = None
+        self._producer = None
+        self._confirms = None
+
+
+class ResultsCollector:
+    """Collect results of sent tasks as soon as they are ready.
+
+    Calls without own timeout use `default_timeout` (None - wait forever).
+    Results are consumed from the result backend as they arrive (by
+    ResultSet.iter_native), backends without native join are polled
+    every `poll_interval` seconds.
+    """
+
+    def __init__(
+            self,
+            calls: list[CeleryTaskCall],
+            results: list[AsyncResult],
+            default_timeout: float | None = None,
+            started_at: float | None = None,
+    ):
+        self.calls = calls
+        self.started_at = started_at or time.monotonic()
+        self._pending = dict(enumerate(results))
+        self._indexes = {result.id: i for i, result in enumerate(results)}
+        self._deadlines = []
+        for call in calls:
+            timeout = call.timeout if call.timeout is not None \
+                else default_timeout
+            deadline = None if timeout is None else self.started_at + timeout
+            self._deadlines.append(deadline)
+        self._outcomes: list[CeleryTaskOutcome | None] = [None] * len(calls)
+
+    @property
+    def is_done(self) -> bool:
+        return not self._pending
+
+    @property
+    def outcomes(self) -> list[CeleryTaskOutcome | None]:
+        """Outcomes in order of calls (None - still pending)."""
+        return list(self._outcomes)
+
+    def iter_outcomes(
+            self, poll_interval: float = 0.5) -> Iterator[CeleryTaskOutcome]:
+        """Outcomes in order of finishing (blocks until all are done)."""
+        while self._pending:
+            yield from self._expire()
+            if not self._pending:
+                return
+            pending = ResultSet(list(self._pending.values()))
+            if not pending.supports_native_join:
+                yield from self._poll()
+                if self._pending:
+                    time.sleep(poll_interval)
+                continue
+            try:
+                for task_id, meta in pending.iter_native(
+                        timeout=self._time_to_next_deadline(),
+                        interval=poll_interval):
+                    yield self._finish_by_meta(self._indexes[task_id], meta)
+            except (socket.timeout, celery.exceptions.TimeoutError):
+                pass
+
+    def _time_to_next_deadline(self) -> float | None:
+        deadlines = [self._deadlines[_] for _ in self._pending
+                     if self._deadlines[_] is not None]
+        if not deadlines:
+            return None
+        # zero timeout of backend means no timeout
+        return max(min(deadlines) - time.monotonic(), 0.001)
+
+    def _expire(self) -> list[CeleryTaskOutcome]:
+        now = time.monotonic()
+        expired = []
+        for index, result in list(self._pending.items()):
+            deadline = self._deadlines[index]
+            if deadline is not None and now > deadline:
+                error = celery.exceptions.TimeoutError(
+                    f'no result of task {self.calls[index].task_name} '
+                    f'({result.id}) in time')
+                expired.append(self._finish(index, error=error))
+        return expired
+
+    def _poll(self) -> list[CeleryTaskOutcome]:
+        finished = []
+        for index, result in list(self._pending.items()):
+            if result.ready():
+                try:
+                    outcome = self._finish(index, value=result.get())
+                except Exception as e:  # pylint: disable=W0718
+                    outcome = self._finish(index, error=e)
+                finished.append(outcome)
+        return finished
+
+    def _finish_by_meta(self, index: int, meta) -> CeleryTaskOutcome:
+        if isinstance(meta, list):  # children of group
+            return self._finish(index, value=[_.get() for _ in meta])
+        value = meta['result']
+        if meta['status'] in celery.states.PROPAGATE_STATES:
+            return self._finish(index, error=value)
+        return self._finish(index, value=value)
+
+    def _finish(
+            self,
+            index: int,
+            value: Any = None,
+            error: BaseException | None = None,
+    ) -> CeleryTaskOutcome:
+        result = self._pending.pop(index)
+        outcome = CeleryTaskOutcome(
+            call=self.calls[index],
+            task_id=result.id,
+            result=value,
+            error=error,
+            duration=time.monotonic() - self.started_at,
+        )
+        self._outcomes[index] = outcome
+        return outcome
@@ -1,11 +1,14 @@
 """Configurations for app and microservices."""
 
 from pathlib import Path
+from typing import Literal
 
 from pydantic_extra_types.timezone_name import TimeZoneName
-from pydantic import HttpUrl
+from pydantic import HttpUrl, model_validator
 
 from pyservice.domain.base import BaseSettings
+from pyservice.files.archiving import EXTENSIONS, TarCompression
+from pyservice.files.retention import RetentionPolicy
 
 
 class AppConfig(BaseSettings):
@@ -18,10 +21,31 @@ class AppConfig(BaseSettings):
 
     seq_url: str | None = None
     seq_api_key: str | None = None
+    # send records to SEQ through a bounded buffer (see log_tools.seq_shipping)
+    seq_bounded_shipping: bool = True
+    seq_buffer_size: int = 10000
+    # spill - keep events on disk while SEQ is unavailable (or overflowed)
+    seq_overflow_policy: str = 'spill'  # or drop_oldest, drop_newest
+    seq_spool_max_bytes: int = 256 * 1024 * 1024
+    seq_batch_bytes: int = 1024 * 1024
+    seq_compress_batches: bool = True
 
     # put here any loggers from other modules to create default handlers
     tracked_loggers: list[str] = []
 
+    # write log files by a single background thread (see log_tools.queued)
+    queued_file_logging: bool = False
+    # format of log files: text or json (see log_tools.json_format)
+    log_format: Literal['text', 'json'] = 'text'
+    # indent records of nested calls of logged functions
+    indented_logging: bool = False
+    # rotation of log files (see log_tools.rotation), zero - no limit
+    log_rotation_max_bytes: int = 0
+    log_rotation_interval: int = 0  # seconds
+    log_rotation_backups: int = 5
+    log_rotation_compress: bool = True
+    logs_directory_max_bytes: int = 0
+
 
 class MicroserviceConfig(AppConfig):
     """Configuration for microservice in cluster with RabbitMQ and Celery."""
@@ -38,12 +62,33 @@ class MicroserviceConfig(AppConfig):
 
     default_celery_queue: str = 'cluster'
 
+    # connections (and producers) kept by celery app for sending tasks
+    celery_producer_pool_size: int = 10
+    # wait for RabbitMQ confirmation of published tasks
+    celery_publisher_confirms: bool = False
+    # send_tasks_bulk waits for confirmations after each batch of tasks
+    celery_bulk_flush_size: int = 500
+    celery_bulk_confirm_timeout: int = 30
+    # seconds between checks of results of concurrently executed tasks
+    # (only for result backends without native join)
+    celery_result_poll_interval: float = 0.05
+
+    # seconds to collect replies of workers during cluster discovery
+    cluster_discovery_deadline: float = 2.0
+    # seconds before discovered cluster is refreshed
+    cluster_cache_ttl: int = 60
+
     periodic_self_checks_period: str = '600'  # seconds or CRON string
+    # seconds for checking all dependencies (they are checked concurrently)
+    preflight_checks_deadline: int = 30
 
     tgs_server_url: str = '10.0.80.2:50051'
     tg_group_for_system_notifications: str = '-4101022781'
     tg_group_for_tests: str = '-4138637604'
     tg_account_for_sending_notifications: str = '+88804692592'
+    # notifications for a chat are sent once per interval as a digest
+    tg_notifications_digest_interval: float = 5.0
+    tg_notifications_queue_size: int = 1000
 
 
 class BackuperConfig(MicroserviceConfig):
@@ -56,7 +101,17 @@ class BackuperConfig(MicroserviceConfig):
     directory_name_with_data_to_backup: str = 'data_to_backup'
     directory_name_for_local_store_backups: str = 'backups'
     number_of_stored_backups_on_local: int = 2
-    archive_extension: str = 'tar.gz'
+    # representatives of periods kept besides the last backups (0 - none)
+    stored_daily_backups_on_local: int = 0
+    stored_weekly_backups_on_local: int = 0
+    stored_monthly_backups_on_local: int = 0
+    max_bytes_of_backups_on_local: int = 0  # 0 - no limit
+    # see files.archiving (gzip, xz, zstd, none), threads: 0 - all CPUs
+    archive_codec: str = 'gzip'
+    # deprecated: derived from codec (a contradicting value is rejected)
+    archive_extension: str | None = None
+    archive_compression_level: int = 6
+    archive_compression_threads: int = 0
     gpg_keys_params: dict = {
         'key_type': 'RSA',
         'key_length': 1024,
@@ -72,6 +127,38 @@ class BackuperConfig(MicroserviceConfig):
     tg_account_for_notifications: str = '+88804692592'
     tg_group_for_notifications: str = '-4138637604'
 
+    @property
+    def retention_of_local_backups(self) -> RetentionPolicy:
+        return RetentionPolicy(
+            keep_last=self.number_of_stored_backups_on_local,
+            keep_daily=self.stored_daily_backups_on_local,
+            keep_weekly=self.stored_weekly_backups_on_local,
+            keep_monthly=self.stored_monthly_backups_on_local,
+            max_total_bytes=self.max_bytes_of_backups_on_local,
+        )
+
+    @property
+    def archive_compression(self) -> TarCompression:
+        return TarCompression(
+            codec=self.archive_codec,
+            level=self.archive_compression_level,
+            threads=self.archive_compression_threads,
+        )
+
+    @model_validator(mode='after')
+    def derive_archive_extension(self) -> 'BackuperConfig':
+        extension = EXTENSIONS.get(self.archive_codec)
+        if extension is None:
+            raise ValueError(
+                f'Unknown codec of archives: {self.archive_codec}')
+        if self.archive_extension is None:
+            self.archive_extension = extension
+        elif self.archive_extension.lstrip('.') != extension:
+            raise ValueError(
+                f'Extension of archives "{self.archive_extension}" '
+                f'contradicts codec "{self.archive_codec}" ({extension})')
+        return self
+
 
 class DjangoBasedMicroserviceConfig(MicroserviceConfig):
     """Configuration for microservice powered by Django."""
@@ -1,11 +1,17 @@
 """
 Tests.
 """
+import os
+import tempfile
+import threading
 import time
+from datetime import datetime
 from unittest import TestCase
 from pathlib import Path
 
 from pyservice.files import files
+from pyservice.files import (
+    archiving, hashing, mover, retention, scanner, store)
 from pyservice import pyconfig
 from pyservice.manager.manager import AppManager
 
@@ -55,6 +61,132 @@ class FilesTestCase(TestCase):
         self.assertEqual(detailed.entities.total_size_in_bytes, 0)
         self.assertEqual(detailed.entities.total_entities, 1)
 
+    def test_scanner(self):
+        project_directory = Path(__file__).parent.parent
+        detailed = files.DetailedDirectory(directory=project_directory)
+        totals = scanner.scan_totals(project_directory)
+        self.assertEqual(totals.total_entities,
+                         detailed.entities.total_entities)
+        self.assertEqual(totals.total_size_in_bytes,
+                         detailed.entities.total_size_in_bytes)
+        python_files = {
+            Path(_.path) for _ in scanner.iter_entries(
+                project_directory / 'src', '**/*.py')
+        }
+        self.assertEqual(
+            python_files,
+            set((project_directory / 'src').glob('**/*.py')),
+        )
+
+    def test_parallel_scanning(self):
+        project_directory = Path(__file__).parent.parent
+        serial = files.DetailedDirectory(directory=project_directory)
+        parallel = files.DetailedDirectory(
+            directory=project_directory, max_workers=4)
+        self.assertEqual(serial.entities.files, parallel.entities.files)
+        self.assertEqual(serial.entities.directories,
+                         parallel.entities.directories)
+        self.assertEqual(serial.entities.total_size_in_bytes,
+                         parallel.entities.total_size_in_bytes)
+        self.assertEqual(
+            files.get_number_of_files_and_directories_in_directory(
+                project_directory, max_workers=4),
+            (len(serial.entities.files), len(serial.entities.directories)),
+        )
+
+    def test_scanning_of_unreadable_directory(self):
+        if not os.geteuid():
+            self.skipTest('root reads any directory')
+        with tempfile.TemporaryDirectory() as directory:
+            unreadable = Path(directory) / 'a' / 'unreadable'
+            unreadable.mkdir(parents=True)
+            os.chmod(unreadable, 0)
+            try:
+                for max_workers in (1, 4):
+                    totals = scanner.scan_totals(directory,
+                                                 max_workers=max_workers)
+                    # found once, as denied
+                    self.assertEqual(totals.counts, {scanner.DIRECTORIES: 1,
+                                                     scanner.DENIED: 1})
+            finally:
+                os.chmod(unreadable, 0o755)
+
+    def test_retention(self):
+        day = 24 * 3600
+        # late evening, so that ages below fall to known calendar days
+        now = datetime.now().replace(hour=23, minute=0).timestamp()
+        directory = self.mng.directory_for_tmp / 'backups'
+        directory.mkdir()
+        # a backup per day for 40 days, the last two days - twice a day
+        ages = [0.1, 0.5, 1.1, 1.5] + list(range(2, 40))
+        for age in ages:
+            f = files.create_text_file_in_directory(
+                directory, 'x' * 10, f'backup-{age}.tar.gz')
+            os.utime(f, (now - age * day, now - age * day))
+
+        collected = retention.collect_files(directory)
+        self.assertEqual(len(collected), len(ages))
+        policy = retention.RetentionPolicy(keep_last=2, keep_daily=7)
+        plan = retention.plan_retention(collected, policy)
+        kept_ages = [float(_.path.name[7:-7]) for _ in plan.keep]
+        self.assertEqual(kept_ages[:2], [0.1, 0.5])
+        self.assertEqual(len(plan.keep), 8)
+        self.assertEqual(len(plan.keep) + len(plan.delete), len(ages))
+        self.assertEqual(plan.bytes_to_free, 10 * len(plan.delete))
+
+        policy = retention.RetentionPolicy(
+            keep_last=3, keep_monthly=12, max_total_bytes=40)
+        plan = retention.apply_retention(directory, policy, dry_run=True)
+        self.assertEqual(len(plan.keep), 4)
+        self.assertEqual(len(plan.describe()), len(ages))
+        self.assertEqual(
+            files.get_number_of_files_in_directory(directory), len(ages))
+
+        plan = retention.apply_retention(directory, policy)
+        self.assertEqual(
+            sorted(directory.iterdir()), sorted(_.path for _ in plan.keep))
+
+    def test_directory_index(self):
+        directory = self.mng.directory_for_tmp / 'indexed'
+        (directory / 'nested').mkdir(parents=True)
+        first = files.create_text_file_in_directory(directory, 'a', 'a.txt')
+        second = files.create_text_file_in_directory(
+            directory / 'nested', 'b', 'b.txt')
+        index = self.mng.get_directory_index(directory)
+        changes = index.refresh()
+        self.assertEqual(set(changes.added), {first, second})
+        self.assertEqual(index.number_of_files, 2)
+
+        second.unlink()
+        third = files.create_text_file_in_directory(
+            directory / 'nested', 'ccc', 'c.txt')
+        changes = index.refresh()
+        self.assertEqual(changes.added, [third])
+        self.assertEqual(changes.removed, [second])
+        self.assertEqual(index.total_size_in_bytes, 4)
+
+        self.assertEqual(
+            files.get_number_of_files_in_directory(directory, index=index),
+            2)
+        self.assertEqual(files.get_list_of_files_in_directory(
+            directory, mask='**/c.*', index=index), [third])
+        self.assertEqual(files.get_list_of_files_in_directory(
+            directory, mask='*', index=index), [first])
+        self.assertEqual(
+            [_.path for _ in retention.collect_files(
+                directory / 'nested', index=index)], [third])
+        deleted = files.delete_old_files_from_directory(
+            directory, count_limit=1, index=index)
+        self.assertEqual(len(deleted), 1)
+        self.assertEqual(
+            files.get_number_of_files_in_directory(directory, index=index),
+            1)
+
+        files.erase_directory(directory)
+        changes = index.refresh()
+        self.assertEqual(len(changes.removed), 1)
+        self.assertEqual(index.number_of_files, 0)
+
     def test_tar(self):
         test_file = self.mng.create_text_file_in_tmp_directory(
             content='my-content'
@@ -70,6 +202,216 @@ class FilesTestCase(TestCase):
         )
         self.assertTrue(test_file.is_file())
 
+    def test_tar_codecs(self):
+        source = self.mng.directory_for_tmp / 'source'
+        source.mkdir()
+        # bigger than a compressed block, so that archives are multi-member
+        content = ''.join(f'line {i} of text\n' for i in range(600000))
+        files.create_text_file_in_directory(source, content, 'big.txt')
+        files.create_text_file_in_directory(source, 'small', 'small.txt')
+        for codec in archiving.available_codecs():
+            for threads in (1, 4):
+                compression = archiving.TarCompression(
+                    codec=codec, level=1, threads=threads)
+                output = self.mng.directory_for_tmp / f'{codec}-{threads}'
+                output.mkdir()
+                tar_file = files.compress_file_or_directory_by_tar(
+                    source, output, compression)
+                self.assertEqual(
+                    tar_file.name, f'source.{compression.extension}')
+                files.extract_data_from_tar_archive(tar_file, output)
+                self.assertEqual(
+                    (output / 'big.txt').read_text(), content)
+                self.assertEqual(
+                    (output / 'small.txt').read_text(), 'small')
+
+        with self.assertRaises(ValueError):
+            archiving.TarCompression(codec='rar')
+
+    def test_parallel_extraction(self):
+        source = self.mng.directory_for_tmp / 'source'
+        for i in range(20):
+            nested = source / f'dir-{i % 4}' / 'nested'
+            nested.mkdir(parents=True, exist_ok=True)
+            suffix = 'txt' if i % 2 else 'json'
+            files.create_text_file_in_directory(
+                nested, f'content {i}', f'file-{i}.{suffix}')
+        (source / 'link.txt').symlink_to('dir-1/nested/file-1.txt')
+        os.link(source / 'dir-1/nested/file-1.txt', source / 'hard.txt')
+        tar_file = files.compress_file_or_directory_by_tar(
+            source, self.mng.directory_for_tmp)
+
+        output = self.mng.directory_for_tmp / 'restored'
+        reports = []
+        stats = files.extract_data_from_tar_archive(
+            tar_file, output, max_workers=4, progress=reports.append)
+        self.assertEqual(stats.files, 20)  # and a hard link
+        self.assertTrue(reports)
+        self.assertGreater(stats.bytes_per_second, 0)
+        for original in source.glob('**/*'):
+            restored = output / original.relative_to(source)
+            if original.is_file():
+                self.assertEqual(restored.read_text(), original.read_text())
+        self.assertTrue((output / 'link.txt').is_symlink())
+        self.assertEqual((output / 'hard.txt').read_text(), 'content 1')
+
+        output = self.mng.directory_for_tmp / 'selected'
+        stats = files.extract_data_from_tar_archive(
+            tar_file, output, patterns=['dir-*/nested/*.json'])
+        self.assertEqual(stats.files, 10)
+        self.assertEqual(len(list(output.glob('**/*.json'))), 10)
+        self.assertEqual(list(output.glob('**/*.txt')), [])
+
+    def test_extraction_of_hard_link_without_its_target(self):
+        source = self.mng.directory_for_tmp / 'source'
+        (source / 'sub').mkdir(parents=True)
+        files.create_text_file_in_directory(source, 'content', 'a.txt')
+        os.link(source / 'a.txt', source / 'sub' / 'hard')
+        tar_file = files.compress_file_or_directory_by_tar(
+            source, self.mng.directory_for_tmp)
+        output = self.mng.directory_for_tmp / 'restored'
+        stats = files.extract_data_from_tar_archive(
+            tar_file, output, patterns=['sub/*'])
+        self.assertEqual((output / 'sub' / 'hard').read_text(), 'content')
+        self.assertFalse((output / 'a.txt').exists())
+        self.assertEqual(stats.files, 1)
+
+    def test_snapshot_store(self):
+        source = self.mng.directory_for_tmp / 'data'
+        (source / 'nested').mkdir(parents=True)
+        big = source / 'nested' / 'big.bin'
+        big.write_bytes(os.urandom(3 * 1024 * 1024))
+        files.create_text_file_in_directory(source, 'static', 'a.txt')
+        (source / 'empty').mkdir()
+        snapshots = store.SnapshotStore(
+            self.mng.directory_for_tmp / 'store',
+            store.ChunkingParams(64 * 1024, 256 * 1024, 1024 * 1024),
+        )
+        first = snapshots.create_snapshot(source, tag='first')
+        self.assertEqual(first.files, 2)
+        self.assertEqual(first.reused_files, 0)
+
+        # insertion shifts data, but only the touched chunks are new
+        data = big.read_bytes()
+        big.write_bytes(data[:1000000] + b'inserted' + data[1000000:])
+        second = snapshots.create_snapshot(source)
+        self.assertEqual(second.reused_files, 1)
+        self.assertLessEqual(second.new_chunks, 2)
+        self.assertEqual(
+            [_.id for _ in snapshots.snapshots()], [first.id, second.id])
+
+        output = self.mng.directory_for_tmp / 'restored'
+        self.assertEqual(snapshots.restore(first.id, output), 2)
+        self.assertEqual((output / 'nested' / 'big.bin').read_bytes(), data)
+        self.assertEqual((output / 'a.txt').read_text(), 'static')
+        self.assertTrue((output / 'empty').is_dir())
+
+        snapshots.delete_snapshot(first.id)
+        collected = snapshots.gc()
+        self.assertEqual(collected.removed_chunks, second.new_chunks)
+        output = self.mng.directory_for_tmp / 'restored-second'
+        snapshots.restore(second.id, output, patterns=['nested/*'])
+        self.assertEqual(
+            (output / 'nested' / 'big.bin').read_bytes(), big.read_bytes())
+        self.assertFalse((output / 'a.txt').exists())
+
+        # snapshots of the same second are listed in creation order
+        created = [snapshots.create_snapshot(source).id for _ in range(5)]
+        self.assertEqual([_.id for _ in snapshots.snapshots()][-5:], created)
+        self.assertEqual(snapshots.latest_snapshot(source).id, created[-1])
+
+    def test_gc_waits_for_running_snapshot(self):
+        source = self.mng.directory_for_tmp / 'data'
+        source.mkdir()
+        snapshots = store.SnapshotStore(self.mng.directory_for_tmp / 'store')
+        files.create_text_file_in_directory(source, 'old', 'a.txt')
+        snapshots.create_snapshot(source)
+        files.create_text_file_in_directory(source, 'new', 'b.txt')
+        collections = []
+        with snapshots.locked():  # like a running snapshot
+            collecting = threading.Thread(
+                target=lambda: collections.append(snapshots.gc()))
+            collecting.start()
+            collecting.join(0.2)
+            self.assertTrue(collecting.is_alive())
+        collecting.join()
+        self.assertEqual(collections[0].removed_chunks, 0)
+
+    def test_hashing(self):
+        path = self.mng.directory_for_tmp / 'hashed.bin'
+        content = os.urandom(3 * hashing.BUFFER_SIZE + 17)
+        path.write_bytes(content)
+        for algorithm in hashing.available_algorithms():
+            expected = hashing.new_hasher(algorithm)
+            expected.update(content)
+            for use_mmap in (False, True):
+                self.assertEqual(
+                    hashing.hash_file(path, algorithm, use_mmap),
+                    expected.hexdigest())
+        with self.assertRaises(ValueError):
+            hashing.hash_file(path, 'crc7')
+
+        cache = hashing.HashCache()
+        digest = cache.hash_file(path)
+        self.assertEqual(cache.hash_file(path), digest)
+        self.assertEqual((cache.hits, cache.misses), (1, 1))
+        path.write_bytes(content + b'changed')
+        self.assertNotEqual(cache.hash_file(path), digest)
+        self.assertEqual(cache.misses, 2)
+
+        paths = [files.create_text_file_in_directory(
+            self.mng.directory_for_tmp, f'content {i}', f'file-{i}.txt')
+            for i in range(10)]
+        digests = hashing.hash_files(paths, max_workers=4, cache=cache)
+        self.assertEqual(digests, {_: files.md5(_) for _ in paths})
+
+    def test_batch_move(self):
+        source = self.mng.directory_for_tmp / 'uploads'
+        target = self.mng.directory_for_tmp / 'data'
+        source.mkdir()
+        target.mkdir()
+        paths = [files.create_text_file_in_directory(
+            source, f'content {i}', f'file-{i}.txt') for i in range(10)]
+        files.create_text_file_in_directory(target, 'old', 'file-7.txt')
+        moves = [(_, target / _.name) for _ in paths]
+
+        with self.assertRaises(FileExistsError):
+            mover.move_files(moves)
+        # nothing is moved on failure
+        self.assertTrue(all(_.is_file() for _ in paths))
+        self.assertEqual((target / 'file-7.txt').read_text(), 'old')
+        self.assertEqual(len(list(target.iterdir())), 1)
+
+        moved = mover.move_files(moves, exist_ok=True)
+        self.assertEqual(moved, [target / _.name for _ in paths])
+        self.assertFalse(any(_.exists() for _ in paths))
+        self.assertEqual((target / 'file-7.txt').read_text(), 'content 7')
+        self.assertEqual(len(list(target.iterdir())), 10)
+
+        # another device (if there is one) - files are copied
+        other = Path('/dev/shm')
+        if other.is_dir() and \
+                other.stat().st_dev != target.stat().st_dev:
+            with tempfile.TemporaryDirectory(dir=other) as directory:
+                moved = mover.move_files(
+                    [(_, Path(directory) / _.name) for _ in moved],
+                    max_workers=4)
+                self.assertEqual(
+                    moved[3].read_text(), 'content 3')
+                self.assertEqual(list(target.iterdir()), [])
+
+                if os.geteuid():
+                    # sources could not be removed after copying
+                    os.chmod(directory, 0o555)
+                    try:
+                        with self.assertRaises(PermissionError):
+                            mover.move_files(
+                                [(_, target / _.name) for _ in moved])
+                    finally:
+                        os.chmod(directory, 0o755)
+                    self.assertTrue(all(_.is_file() for _ in moved))
+                    self.assertEqual(list(target.iterdir()), [])
+
     def test_md5(self):
         test_file = self.mng.create_text_file_in_tmp_directory(
             content='some-content', filename='md5check.txt'
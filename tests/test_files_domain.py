@@ -2,6 +2,8 @@
 Tests.
 """
 
+import socket
+import threading
 from unittest import TestCase
 from pathlib import Path
 
@@ -110,3 +112,65 @@ class FilesDomainTestCase(TestCase):
             set(f.fullpath.name for f in multi_match),
             {'gamma.log', 'epsilon.log'}
         )
+
+    def test_hashes(self):
+        local_files = files_domain.LocalFiles(items={
+            files_domain.LocalFile.Examples.random_txt(
+                directory=self.mng.directory_for_tmp)
+            for _ in range(5)
+        })
+        hashes = local_files.hashes(max_workers=4)
+        self.assertEqual(len(hashes), 5)
+        for local_file in local_files.items:
+            self.assertEqual(hashes[local_file.fullpath], local_file.md5)
+            self.assertEqual(
+                local_file.md5, files_utils.md5(local_file.fullpath))
+
+    def test_zero_copy_content(self):
+        content = b'0123456789' * 300000
+        path = self.mng.directory_for_tmp / 'payload.bin'
+        path.write_bytes(content)
+        local_file = files_domain.LocalFile(fullpath=path)
+        self.assertEqual(local_file.size_in_bytes, len(content))
+
+        with local_file.mapped_content() as view:
+            self.assertIsInstance(view, memoryview)
+            self.assertEqual(view[10:20].tobytes(), content[10:20])
+            self.assertEqual(len(view), len(content))
+
+        chunks = list(local_file.iter_chunks(chunk_size=1024 * 1024))
+        self.assertEqual(len(chunks), 3)
+        self.assertEqual(b''.join(chunks), content)
+
+        first, second = socket.socketpair()
+        with first, second:
+            received = bytearray()
+            reader = threading.Thread(target=lambda: [
+                received.extend(_) for _ in iter(
+                    lambda: second.recv(65536), b'')])
+            reader.start()
+            sent = local_file.send_to_socket(first)
+            first.shutdown(socket.SHUT_WR)
+            reader.join()
+        self.assertEqual(sent, len(content))
+        self.assertEqual(bytes(received), content)
+
+        path = self.mng.directory_for_tmp / 'empty.bin'
+        path.write_bytes(b'')
+        empty = files_domain.LocalFile(fullpath=path)
+        with empty.mapped_content() as view:
+            self.assertEqual(len(view), 0)
+
+    def test_move_all_files(self):
+        local_files = files_domain.LocalFiles(items={
+            files_domain.LocalFile.Examples.random_txt(
+                directory=self.mng.directory_for_tmp)
+            for _ in range(5)
+        })
+        new_directory = self.mng.directory_for_tmp / 'moved'
+        new_directory.mkdir()
+        local_files.move_all_files_to_directory(new_directory)
+        self.assertTrue(all(
+            _.is_exist and _.fullpath.parent == new_directory
+            for _ in local_files.items))
+        self.assertEqual(len(list(new_directory.iterdir())), 5)
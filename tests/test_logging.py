@@ -2,9 +2,13 @@
 Tests.
 """
 
+import os
+import tempfile
+from pathlib import Path
 from unittest import TestCase
 
 from pyservice import log_tools
+from pyservice.log_tools.rotation import LogRotation
 from pyservice.manager.manager import get_default_app_manager
 from pyservice.manager.manager import get_default_microservice_manager
 
@@ -53,3 +57,152 @@ class LoggingTestCase(TestCase):
         calc = Calculator()
 
         calc.multiply(5, 6)
+
+    def test_queued_logging(self):
+        queued_log = log_tools.log_tools.get_logger(
+            log_name='queued-test-logger',
+            directory_for_logs=log_tools.get_file_of_logger(log).parent,
+            queued_files=True,
+        )
+        self.assertTrue(log_tools.log_tools.is_queued(queued_log))
+        queued_log.debug('record in queued mode')
+        queued_log.error('error in queued mode')
+        content = log_tools.get_content_of_log_file_of_logger(queued_log)
+        self.assertIn('record in queued mode', content)
+        self.assertIn('error in queued mode', content)
+
+    # pylint: disable=W0212
+    def test_queued_logging_in_forked_child(self):
+        queued_log = log_tools.log_tools.get_logger(
+            log_name='forked-test-logger',
+            directory_for_logs=log_tools.get_file_of_logger(log).parent,
+            queued_files=True,
+        )
+        pid = os.fork()
+        if pid == 0:
+            queued_log.info('record of child')
+            os._exit(0 if log_tools.log_tools.flush_logger(queued_log)
+                     else 1)
+        _, status = os.waitpid(pid, 0)
+        self.assertEqual(os.waitstatus_to_exitcode(status), 0)
+        content = log_tools.get_content_of_log_file_of_logger(queued_log)
+        self.assertIn('record of child', content)
+
+    def test_logging_with_timing_and_sampling(self):
+        log_tools.clean_file_for_logger(log)
+
+        @log_tools.logged(logger=log, with_timing=True)
+        def timed(a):
+            return a
+
+        @log_tools.logged(logger=log, sample_rate=0.0)
+        def never_logged(a):
+            return a
+
+        self.assertEqual(timed(1), 1)
+        self.assertEqual(never_logged(2), 2)
+        log_content = log_tools.get_content_of_log_file_of_logger(log)
+        self.assertIn(' ms)', log_content)
+        self.assertNotIn('never_logged', log_content)
+
+    def test_logging_of_disabled_level_formats_nothing(self):
+        rendered = []
+
+        class Argument:
+            def __repr__(self):
+                rendered.append(self)
+                return 'argument'
+
+        @log_tools.logged(logger=log, level='DEBUG')
+        def call(a):
+            return a
+
+        level = log.level
+        log.setLevel('INFO')
+        try:
+            call(Argument())
+        finally:
+            log.setLevel(level)
+        self.assertEqual(rendered, [])
+        # records keep rendered strings, not the arguments themselves
+        call(Argument())
+        self.assertEqual(len(rendered), 2)
+
+    def test_rotation_of_log_files(self):
+        rotation = LogRotation(max_bytes=2000, backups=2, compress=True)
+        with tempfile.TemporaryDirectory() as directory:
+            for queued_files in (False, True):
+                rotated_log = log_tools.log_tools.get_logger(
+                    log_name=f'rotated-{queued_files}',
+                    directory_for_logs=Path(directory),
+                    queued_files=queued_files,
+                    rotation=rotation,
+                )
+                for i in range(100):
+                    rotated_log.info('record %s', i)
+                rotated_log.error('the last one\nwith second line')
+                records = log_tools.get_last_records_of_logger(
+                    rotated_log, 3)
+                self.assertEqual(len(records), 3)
+                self.assertIn('record 99', records[1])
+                self.assertTrue(records[2].endswith('with second line'))
+                log_file = log_tools.get_file_of_logger(rotated_log)
+                self.assertLessEqual(log_file.stat().st_size, 2000)
+                segments = sorted(
+                    _.name for _ in Path(directory).glob(
+                        f'{log_file.name}.*'))
+                self.assertEqual(segments, [f'{log_file.name}.1.gz',
+                                            f'{log_file.name}.2.gz'])
+
+    def test_json_log_format(self):
+        with tempfile.TemporaryDirectory() as directory:
+            json_log = log_tools.log_tools.get_logger(
+                log_name='json-test-logger',
+                directory_for_logs=Path(directory),
+                log_format='json',
+                static_fields={'app': 'test-app'},
+            )
+            json_log.info('record with %s', 'argument')
+            try:
+                raise ValueError('broken')
+            except ValueError:
+                json_log.exception('failed')
+            records = list(log_tools.get_json_records_of_logger(json_log))
+            self.assertEqual(len(records), 2)
+            self.assertEqual(records[0]['app'], 'test-app')
+            self.assertEqual(records[0]['message'], 'record with argument')
+            self.assertEqual(records[1]['level'], 'ERROR')
+            self.assertIn('ValueError', records[1]['exception'])
+            last = log_tools.get_last_records_of_logger(json_log, 1)
+            self.assertIn('"failed"', last[0])
+            with self.assertRaises(ValueError):
+                log_tools.log_tools.get_logger(
+                    log_name='xml-test-logger',
+                    directory_for_logs=Path(directory),
+                    log_format='xml',
+                )
+
+    def test_indented_logging(self):
+        with tempfile.TemporaryDirectory() as directory:
+            indented_log = log_tools.log_tools.get_logger(
+                log_name='indented-test-logger',
+                directory_for_logs=Path(directory),
+                indented=True,
+            )
+
+            @log_tools.logged(logger=indented_log)
+            def inner():
+                indented_log.info('inside')
+                return 1
+
+            @log_tools.logged(logger=indented_log)
+            def outer():
+                return inner()
+
+            outer()
+            content = log_tools.get_content_of_log_file_of_logger(
+                indented_log)
+            self.assertIn('- outer() starts', content)
+            self.assertIn('-   inner() starts', content)
+            self.assertIn('-     inside', content)
+            self.assertIn('- outer ➞ 1', content)
@@ -0,0 +1,101 @@
+"""
+Tests.
+"""
+
+import threading
+import time
+from unittest import TestCase
+
+from pyservice.manager.notifications import TelegramNotifier
+
+
+class FlakyClient:
+    """Client of telegram service failing the first sendings."""
+
+    def __init__(self, failures: int):
+        self.failures = failures
+        self.texts = []
+
+    # pylint: disable=W0613
+    def send_text_message(self, app_phone, receiver, text):
+        if self.failures:
+            self.failures -= 1
+            raise ConnectionError('telegram service is unavailable')
+        self.texts.append((receiver, text))
+
+
+class BlockedChatClient(FlakyClient):
+    """Client of telegram service failing sendings to one chat."""
+
+    def __init__(self, blocked: str):
+        super().__init__(failures=0)
+        self.blocked = blocked
+
+    def send_text_message(self, app_phone, receiver, text):
+        if receiver == self.blocked:
+            raise ConnectionError('chat is unavailable')
+        super().send_text_message(app_phone, receiver, text)
+
+
+class TelegramNotifierTestCase(TestCase):
+    """Sending of digests by notifier."""
+
+    def test_failed_digest_is_sent_again(self):
+        client = FlakyClient(failures=1)
+        notifier = TelegramNotifier(
+            lambda: client, '+100', digest_interval=0.01, max_backoff=0.05)
+        notifier.notify('disk is full', chat_id='1')
+        notifier.notify('disk is full', chat_id='1')
+        self.assertTrue(notifier.flush(timeout=10))
+        notifier.close(timeout=10)
+        self.assertEqual((notifier.failed, notifier.sent), (1, 1))
+        self.assertEqual(client.texts, [
+            ('1', 'disk is full\n(repeated 2 times)')])
+
+    def test_digest_is_dropped_after_attempts(self):
+        client = FlakyClient(failures=100)
+        notifier = TelegramNotifier(
+            lambda: client, '+100', digest_interval=0.01, max_backoff=0.05,
+            max_attempts=2)
+        notifier.notify('first', chat_id='1')
+        notifier.notify('second', chat_id='1')
+        self.assertTrue(notifier.flush(timeout=10))
+        notifier.close(timeout=10)
+        self.assertEqual(notifier.failed, 2)
+        self.assertEqual(notifier.dropped, 2)
+        self.assertEqual(client.texts, [])
+
+    def test_backoff_of_chat_is_kept_while_other_chats_get_digests(self):
+        client = BlockedChatClient(blocked='1')
+        notifier = TelegramNotifier(
+            lambda: client, '+100', digest_interval=0.05, max_backoff=10,
+            max_attempts=10)
+        notifier.notify('disk is full', chat_id='1')
+        deadline = time.monotonic() + 0.8
+        while time.monotonic() < deadline:
+            notifier.notify('all is fine', chat_id='2')
+            time.sleep(0.01)
+        # backoffs of chat 1 are 0.05, 0.1, 0.2, 0.4 ... seconds
+        self.assertLessEqual(notifier.failed, 5)
+        self.assertGreater(len(client.texts), 5)
+        notifier.close(timeout=10)
+
+    def test_counters_of_concurrent_callers(self):
+        client = FlakyClient(failures=0)
+        notifier = TelegramNotifier(
+            lambda: client, '+100', queue_size=10, digest_interval=60)
+        accepted = []
+
+        def notify_many():
+            for i in range(1000):
+                if notifier.notify(f'message {i}', chat_id='1'):
+                    accepted.append(i)
+
+        callers = [threading.Thread(target=notify_many) for _ in range(4)]
+        for caller in callers:
+            caller.start()
+        for caller in callers:
+            caller.join()
+        notifier.close(timeout=10)
+        self.assertGreater(notifier.dropped, 0)
+        self.assertEqual(notifier.dropped + len(accepted), 4000)
@@ -8,7 +8,9 @@ import json
 from unittest import TestCase
 from pathlib import Path
 
-from pyservice.pyconfig.pyconfig import AppConfig
+from pydantic import ValidationError
+
+from pyservice.pyconfig.pyconfig import AppConfig, BackuperConfig
 from pyservice.pyconfig.pyconfig import default_app_config
 from pyservice.pyconfig.pyconfig import default_microservice_config
 
@@ -52,6 +54,11 @@ class AppConfigTestCase(TestCase):
         restored = AppConfig(**as_dict)
         self.assertEqual(cfg, restored)
 
+    def test_log_format(self):
+        self.assertEqual(AppConfig(log_format='json').log_format, 'json')
+        with self.assertRaises(ValidationError):
+            AppConfig(log_format='xml')
+
 
 class MicroserviceTestCase(TestCase):
     """Microservice config tests."""
@@ -65,3 +72,16 @@ class MicroserviceTestCase(TestCase):
         as_yaml = cfg.as_yaml()
         self.assertIsInstance(as_yaml, str)
 
+
+class BackuperConfigTestCase(TestCase):
+    """Backuper config tests."""
+
+    def test_archive_extension(self):
+        self.assertEqual(BackuperConfig().archive_extension, 'tar.gz')
+        self.assertEqual(
+            BackuperConfig(archive_codec='xz').archive_extension, 'tar.xz')
+        # settings of older nodes are still accepted
+        cfg = BackuperConfig(archive_extension='tar.gz')
+        self.assertEqual(BackuperConfig(**cfg.as_dict()), cfg)
+        with self.assertRaises(ValidationError):
+            BackuperConfig(archive_codec='xz', archive_extension='tar.gz')
@@ -0,0 +1,203 @@
+"""
+Tests.
+"""
+
+import gzip
+import os
+import json
+import logging
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import TestCase
+
+from pyservice.log_tools import seq_shipping
+from pyservice.log_tools.seq_spool import SeqSpool
+
+
+class FakeSeq(BaseHTTPRequestHandler):
+    """Accept raw events like SEQ does."""
+
+    events: list = []
+    status = 201
+
+    def do_POST(self):  # pylint: disable=C0103
+        body = self.rfile.read(int(self.headers['Content-Length']))
+        if self.headers.get('Content-Encoding') == 'gzip':
+            body = gzip.decompress(body)
+        if self.status < 300:
+            type(self).events.extend(json.loads(body)['Events'])
+        self.send_response(self.status)
+        self.end_headers()
+
+    def log_message(self, *args):  # pylint: disable=W0221
+        pass
+
+
+class SeqShippingTestCase(TestCase):
+    """Shipping of records to a local fake SEQ."""
+
+    def setUp(self) -> None:
+        FakeSeq.events = []
+        FakeSeq.status = 201
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), FakeSeq)
+        threading.Thread(target=self.server.serve_forever,
+                         daemon=True).start()
+        self.url = f'http://127.0.0.1:{self.server.server_port}'
+
+    def tearDown(self) -> None:
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_records_are_sent_in_batches(self):
+        handler = seq_shipping.BoundedSeqHandler(
+            self.url, api_key='key', max_batch_bytes=1000)
+        logger = logging.getLogger('seq-shipping-test')
+        logger.addHandler(handler)
+        logger.setLevel('DEBUG')
+        for i in range(50):
+            logger.info('record %s', i)
+        shipper = handler.shipper
+        self.assertTrue(shipper.flush(timeout=10))
+        logger.removeHandler(handler)
+        self.assertEqual(shipper.sent, 50)
+        self.assertEqual(len(FakeSeq.events), 50)
+        self.assertEqual(FakeSeq.events[-1]['MessageTemplate'], 'record 49')
+        self.assertEqual(FakeSeq.events[-1]['Properties']['0'], 49)
+
+    def test_overflow_of_buffer(self):
+        FakeSeq.status = 503
+        spilled = []
+        shipper = seq_shipping.SeqShipper(
+            self.url, capacity=10, overflow=seq_shipping.SPILL,
+            spill=spilled.extend)
+        for i in range(25):
+            shipper.put(json.dumps({'n': i}).encode())
+        self.assertEqual(shipper.queued, 10)
+        self.assertEqual(shipper.spilled, 15)
+        self.assertEqual(json.loads(spilled[0]), {'n': 0})
+
+        dropping = seq_shipping.SeqShipper(
+            self.url, capacity=10, overflow=seq_shipping.DROP_NEWEST)
+        for i in range(25):
+            dropping.put(json.dumps({'n': i}).encode())
+        self.assertEqual(dropping.queued, 10)
+        self.assertEqual(dropping.dropped, 15)
+
+    def test_counters_of_concurrent_callers(self):
+        shipper = seq_shipping.SeqShipper(
+            self.url, capacity=10, overflow=seq_shipping.DROP_OLDEST)
+
+        def put_many():
+            for i in range(1000):
+                shipper.put(json.dumps({'n': i}).encode())
+
+        callers = [threading.Thread(target=put_many) for _ in range(4)]
+        for caller in callers:
+            caller.start()
+        for caller in callers:
+            caller.join()
+        self.assertEqual(shipper.queued, 10)
+        self.assertEqual(shipper.dropped, 3990)
+
+    def test_failed_batches_are_sent_again(self):
+        FakeSeq.status = 503
+        shipper = seq_shipping.SeqShipper(
+            self.url, flush_interval=0.05, max_backoff=0.1)
+        shipper.start()
+        shipper.put(b'{"MessageTemplate": "after outage"}')
+        self.assertFalse(shipper.flush(timeout=0.5))
+        self.assertGreater(shipper.failed, 0)
+        FakeSeq.status = 201
+        self.assertTrue(shipper.flush(timeout=10))
+        shipper.close()
+        self.assertEqual(shipper.sent, 1)
+        self.assertEqual(FakeSeq.events[0]['MessageTemplate'],
+                         'after outage')
+
+    def test_flush_of_handler_does_not_wait_for_unavailable_seq(self):
+        FakeSeq.status = 503
+        spilled = []
+        handler = seq_shipping.BoundedSeqHandler(
+            self.url, flush_interval=0.05, max_backoff=60,
+            overflow=seq_shipping.SPILL, spill=spilled.extend)
+        shipper = handler.shipper
+        shipper.put(b'{"MessageTemplate": "first"}')
+        for _ in range(100):
+            if shipper.is_backing_off:
+                break
+            threading.Event().wait(0.05)
+        self.assertTrue(shipper.is_backing_off)
+        shipper.put(b'{"MessageTemplate": "second"}')
+        started_at = time.monotonic()
+        handler.flush()
+        self.assertLess(time.monotonic() - started_at, 0.5)
+        self.assertEqual(shipper.queued, 0)
+        self.assertEqual(len(spilled), 2)
+        shipper.close(timeout=1)
+
+    def test_spooled_events_are_replayed(self):
+        FakeSeq.status = 503
+        with tempfile.TemporaryDirectory() as directory:
+            shipper = seq_shipping.SeqShipper(
+                self.url, flush_interval=0.05, max_backoff=0.1,
+                overflow=seq_shipping.SPILL, spool_directory=directory)
+            shipper.start()
+            for i in range(20):
+                shipper.put(json.dumps({'n': i}).encode())
+            self.assertTrue(shipper.flush(timeout=10))
+            self.assertEqual(shipper.spilled, 20)
+            self.assertGreater(shipper.spool.size, 0)
+
+            FakeSeq.status = 201
+            shipper.replay_soon()
+            shipper.put(json.dumps({'n': 20}).encode())
+            self.assertTrue(shipper.flush(timeout=10))
+            for _ in range(100):
+                if not shipper.spool.size:
+                    break
+                threading.Event().wait(0.05)
+            shipper.close()
+            self.assertEqual(shipper.spool.size, 0)
+            self.assertEqual(sorted(_['n'] for _ in FakeSeq.events),
+                             list(range(21)))
+
+    def test_disk_cap_of_spool(self):
+        with tempfile.TemporaryDirectory() as directory:
+            spool = SeqSpool(directory, segment_bytes=100, max_bytes=300)
+            for i in range(100):
+                spool.append([json.dumps({'n': i}).encode()])
+            self.assertLessEqual(spool.size, 300)
+            self.assertGreater(spool.discarded, 0)
+            replayed = []
+            self.assertTrue(spool.replay(
+                lambda batch: replayed.extend(batch) or True))
+            spool.close()
+            self.assertEqual(json.loads(replayed[-1]), {'n': 99})
+            self.assertEqual(len(replayed) + spool.discarded, 100)
+            self.assertEqual(SeqSpool(directory).size, 0)
+
+    def test_spools_of_processes_sharing_directory(self):
+        with tempfile.TemporaryDirectory() as directory:
+            first = SeqSpool(directory, segment_bytes=100)
+            second = SeqSpool(directory, segment_bytes=100)
+            self.assertNotEqual(first.directory, second.directory)
+            for i in range(10):
+                first.append([json.dumps({'n': i}).encode()])
+                second.append([json.dumps({'n': 10 + i}).encode()])
+            # segments of a running process are never replayed by others
+            replayed = []
+            self.assertTrue(second.replay(
+                lambda batch: replayed.extend(batch) or True))
+            self.assertEqual(len(replayed), 10)
+            self.assertGreater(first.size, 0)
+
+            first.close()
+            self.assertTrue(second.replay(
+                lambda batch: replayed.extend(batch) or True))
+            second.close()
+            self.assertEqual(sorted(json.loads(_)['n'] for _ in replayed),
+                             list(range(20)))
+            self.assertEqual(os.listdir(directory), [])
+
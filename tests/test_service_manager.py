@@ -12,6 +12,7 @@ from pyservice.pyconfig.pyconfig import default_microservice_config
 from pyservice.manager.manager import get_default_microservice_manager
 from pyservice.manager.manager import get_default_app_manager
 from pyservice.domain import cluster
+from pyservice.manager.publishing import CeleryTaskCall
 
 
 class MicroserviceDomainTestCase(TestCase):
@@ -59,7 +60,23 @@ class MicroserviceManagerTestCase(IsolatedAsyncioTestCase):
         await self.mng.check_connection_to_telegram_server()
 
     async def test_preflight_checks(self):
-        await self.mng.preflight_checks()
+        report = await self.mng.preflight_checks()
+        self.assertTrue(report.is_ok)
+        self.assertEqual(
+            {_.name for _ in report.results},
+            set(self.mng._dependency_checks()))  # pylint: disable=W0212
+
+    async def test_check_dependencies_within_deadline(self):
+        report = await self.mng.check_dependencies(deadline=0.001)
+        self.assertFalse(report.is_ok)
+        self.assertLess(report.duration, 1)
+
+    def test_self_check_engine(self):
+        snapshot = self.mng.self_check_engine.run()
+        self.assertTrue(snapshot.is_ok, str(snapshot))
+        self.assertIs(snapshot, self.mng.last_health_snapshot)
+        self.assertEqual(
+            self.mng.service_info()['health'], snapshot.as_dict())
 
     def test_get_celery_app(self):
         app = self.mng.get_celery_app()
@@ -81,6 +98,17 @@ class MicroserviceManagerTestCase(IsolatedAsyncioTestCase):
         # for config in tests folder (not in src)
         # TODO: detect root module for tests configs
 
+    def test_layout_is_resolved_once(self) -> None:
+        manager = get_default_app_manager()
+        layout = manager.layout
+        self.assertIs(layout, manager.layout)
+        self.assertEqual(manager.app_ref, layout.app_ref)
+        self.assertEqual(manager.base_project_directories, layout.as_tuple())
+
+        manager.invalidate_layout()
+        self.assertIsNot(layout, manager.layout)
+        self.assertEqual(layout, manager.layout)
+
     def test_artefacts_directories(self) -> None:
         data = self.mng.directory_for_data
         tmp = self.mng.directory_for_tmp
@@ -89,6 +117,20 @@ class MicroserviceManagerTestCase(IsolatedAsyncioTestCase):
         self.assertTrue(tmp.is_dir())
         self.assertTrue(logs.is_dir())
 
+    def test_microservice_descriptor_is_cached(self):
+        descriptor = self.mng.microservice_descriptor
+        self.assertIs(descriptor, self.mng.microservice_descriptor)
+        self.assertIs(self.mng.microservice, self.mng.microservice)
+        self.assertEqual(
+            descriptor.as_dict()['ref'], self.mng.microservice.ref)
+
+        self.mng.config = self.mng.config.model_copy(
+            update={'instance_tag': 'another-tag'})
+        rebuilt = self.mng.microservice_descriptor
+        self.assertIsNot(descriptor, rebuilt)
+        self.assertTrue(rebuilt.microservice.ref.endswith(':another-tag'))
+        self.assertIn(rebuilt.microservice.ref, self.mng.all_queues())
+
     def test_test_rabbit_by_pika(self):
         self.mng.test_rabbit_by_pika()
 
@@ -96,6 +138,55 @@ class MicroserviceManagerTestCase(IsolatedAsyncioTestCase):
         all_microservices = self.mng.get_all_cluster_microservices()
         self.assertIsInstance(all_microservices, set)
 
+    def test_get_cluster(self):
+        my_cluster = self.mng.get_cluster()
+        self.assertIsInstance(my_cluster, cluster.Cluster)
+        self.assertIs(my_cluster, self.mng.get_cluster(block=False))
+
+    def test_send_tasks_bulk(self):
+        calls = [
+            CeleryTaskCall(
+                task_name='service_info',
+                task_args=(self.mng.microservice.ref, ),
+                queue=self.mng.config.default_celery_queue,
+            )
+            for _ in range(5)
+        ]
+        results = self.mng.send_tasks_bulk(calls)
+        self.assertEqual(len(results), len(calls))
+        for result in results:
+            self.assertIsInstance(result.get(timeout=20), dict)
+
+    def test_execute_celery_tasks_concurrently(self):
+        calls = [
+            CeleryTaskCall(
+                task_name='service_info',
+                task_args=(self.mng.microservice.ref, ),
+                queue=self.mng.config.default_celery_queue,
+            ),
+            CeleryTaskCall(
+                task_name='service_info',
+                task_args=(self.mng.microservice.ref, ),
+                queue='unreal-queue',
+                timeout=1,
+            ),
+        ]
+        outcomes = self.mng.execute_celery_tasks_concurrently(
+            calls, timeout=20)
+        found, lost = outcomes
+        self.assertTrue(found.is_ok)
+        self.assertIsInstance(found.result, dict)
+        self.assertFalse(lost.is_ok)
+
+    async def test_aexecute_celery_task(self):
+        result = await self.mng.aexecute_celery_task(
+            task_name='service_info',
+            task_args=(self.mng.microservice.ref, ),
+            queue=self.mng.config.default_celery_queue,
+            timeout=20,
+        )
+        self.assertIsInstance(result, dict)
+
     def test_get_microservice_bad_path(self):
         result = self.mng.get_microservice_from_cluster(
             queue='unreal-queue'
@@ -118,6 +209,10 @@ class MicroserviceManagerTestCase(IsolatedAsyncioTestCase):
     def test_send_system_notification_to_telegram_chat(self):
         msg = 'TEST: system notification'
         self.mng.system_notification(msg)
+        self.mng.system_notification(msg)
+        self.assertTrue(self.mng.notifier.flush(timeout=30))
+        self.assertEqual(self.mng.notifier.failed, 0)
+        self.assertEqual(self.mng.notifier.sent, 1)
 
     def test_get_installed_packages(self):
         installed_packages = self.mng.get_installed_packages()